@@ -10,11 +10,84 @@ Run from project root: python scripts/migrate_media_to_tenant_dirs.py
 Skips if target dir already has content or source is empty. Safe to run multiple times.
 """
 
+import errno
+import os
 import shutil
+import sys
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
 from pathlib import Path
 
 BASE = Path(__file__).resolve().parent.parent
 MEDIA = BASE / "media"
+PROGRESS_EVERY = 1000  # one progress line per this many moves instead of one per file
+
+
+def _same_device(src_root, target):
+    """True when src_root and target live on the same filesystem (os.rename is safe)."""
+    return os.stat(src_root).st_dev == os.stat(target).st_dev
+
+
+def _progress(kind, moved):
+    """Emit a single progress line every PROGRESS_EVERY moves."""
+    if moved % PROGRESS_EVERY == 0:
+        sys.stdout.write(f"  {kind}: {moved} moved...\n")
+        sys.stdout.flush()
+
+
+def _fastcopy(src, dst):
+    """copy_function for shutil.move: kernel-side os.sendfile copy, then copy metadata."""
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        size = os.fstat(s.fileno()).st_size
+        offset = 0
+        while offset < size:
+            sent = os.sendfile(d.fileno(), s.fileno(), offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+    shutil.copystat(src, dst)
+    return dst
+
+
+def _move(src, dest, same_dev):
+    """Move src to dest with a single rename when possible; sendfile copy across devices."""
+    if same_dev:
+        try:
+            os.rename(src, dest)
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+    copy_function = _fastcopy if hasattr(os, "sendfile") else shutil.copy2
+    shutil.move(src, dest, copy_function=copy_function)
+
+
+def _move_files(kind, entries, target_str, same_dev):
+    """
+    Move scanned file entries into target_str, skipping names already there.
+    With MIGRATE_PARALLEL=1 the renames are issued from a thread pool in chunks of
+    PROGRESS_EVERY; leave it unset on single-spindle disks where seeks serialise anyway.
+    """
+    jobs = []
+    for f in entries:
+        dest = os.path.join(target_str, f.name)
+        if not os.path.lexists(dest):
+            jobs.append((f.path, dest))
+    if os.getenv("MIGRATE_PARALLEL") != "1":
+        for moved, (src, dest) in enumerate(jobs, 1):
+            _move(src, dest, same_dev)
+            _progress(kind, moved)
+        return
+    workers = min(32, (os.cpu_count() or 1) * 4)
+    moved = 0
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        for i in range(0, len(jobs), PROGRESS_EVERY):
+            futures = [ex.submit(_move, src, dest, same_dev) for src, dest in jobs[i:i + PROGRESS_EVERY]]
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            for fut in done:
+                fut.result()  # re-raise the first move error
+            wait(futures)
+            moved += len(futures)
+            _progress(kind, moved)
 
 
 def migrate_audio():
@@ -22,33 +95,45 @@ def migrate_audio():
     target = MEDIA / "audio" / "1"
     if not audio_root.exists():
         return
-    files = [f for f in audio_root.iterdir() if f.is_file()]
+    with os.scandir(audio_root) as it:
+        files = [e for e in it if e.is_file(follow_symlinks=False)]
     if not files:
         return
     target.mkdir(parents=True, exist_ok=True)
-    for f in files:
-        dest = target / f.name
-        if not dest.exists():
-            shutil.move(str(f), str(dest))
-            print(f"  audio: {f.name} -> audio/1/")
+    same_dev = _same_device(audio_root, target)
+    target_str = os.fspath(target)
+    _move_files("audio", files, target_str, same_dev)
     print(f"  Migrated {len(files)} audio file(s) to media/audio/1/")
 
 
+def _event_subdirs(events_root):
+    """Yield event folders under events_root lazily, skipping the tenant dir "1"."""
+    with os.scandir(events_root) as it:
+        for e in it:
+            if e.name != "1" and e.is_dir(follow_symlinks=False):
+                yield e
+
+
 def migrate_events():
     events_root = MEDIA / "events"
     target_dir = MEDIA / "events" / "1"
     if not events_root.exists():
         return
-    subdirs = [d for d in events_root.iterdir() if d.is_dir() and d.name != "1"]
-    if not subdirs:
-        return
-    target_dir.mkdir(parents=True, exist_ok=True)
-    for d in subdirs:
-        dest = target_dir / d.name
-        if not dest.exists():
-            shutil.move(str(d), str(dest))
-            print(f"  events: {d.name} -> events/1/")
-    print(f"  Migrated {len(subdirs)} event folder(s) to media/events/1/")
+    count = 0
+    moved = 0
+    for d in _event_subdirs(events_root):
+        if count == 0:
+            target_dir.mkdir(parents=True, exist_ok=True)
+            same_dev = _same_device(events_root, target_dir)
+            target_str = os.fspath(target_dir)
+        count += 1
+        dest = os.path.join(target_str, d.name)
+        if not os.path.lexists(dest):
+            _move(d.path, dest, same_dev)
+            moved += 1
+            _progress("events", moved)
+    if count:
+        print(f"  Migrated {count} event folder(s) to media/events/1/")
 
 
 def migrate_photos():
@@ -56,15 +141,14 @@ def migrate_photos():
     target = MEDIA / "photos" / "1"
     if not photos_root.exists():
         return
-    files = [f for f in photos_root.iterdir() if f.is_file()]
+    with os.scandir(photos_root) as it:
+        files = [e for e in it if e.is_file(follow_symlinks=False)]
     if not files:
         return
     target.mkdir(parents=True, exist_ok=True)
-    for f in files:
-        dest = target / f.name
-        if not dest.exists():
-            shutil.move(str(f), str(dest))
-            print(f"  photos: {f.name} -> photos/1/")
+    same_dev = _same_device(photos_root, target)
+    target_str = os.fspath(target)
+    _move_files("photos", files, target_str, same_dev)
     print(f"  Migrated {len(files)} photo(s) to media/photos/1/")
 
 
@@ -7,11 +7,15 @@ Run from repo root: python scripts/seed_first_teacher.py
 With custom data dir: DATA_DIR=/data python scripts/seed_first_teacher.py
 """
 import os
-import hashlib
 import sqlite3
+import sys
 from pathlib import Path
 
 BASE = Path(__file__).resolve().parent.parent
+# Hash the password exactly as the app does (src/ modules import each other by plain name)
+sys.path.insert(0, str(BASE / "src"))
+from auth import hash_password
+
 DATA_DIR = Path(os.getenv("DATA_DIR", str(BASE / "data")))
 DB_PATH = DATA_DIR / "music_class.db"
 
@@ -23,49 +27,34 @@ DISPLAY_NAME = "Vaishnavi Kondapalli"
 def main():
     DATA_DIR.mkdir(parents=True, exist_ok=True)
     conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
 
-    # Ensure teachers table exists (match db.py schema)
-    conn.executescript("""
-        CREATE TABLE IF NOT EXISTS teachers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT NOT NULL UNIQUE,
-            password_hash TEXT NOT NULL,
-            display_name TEXT
-        );
-    """)
-    conn.commit()
+    password_hash = hash_password(PASSWORD)
 
-    password_hash = hashlib.sha256(PASSWORD.encode("utf-8")).hexdigest()
+    # One transaction for schema + upsert: a single commit instead of one per statement
+    with conn:
+        # Ensure teachers table exists (match db.py schema)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS teachers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT NOT NULL UNIQUE,
+                password_hash TEXT NOT NULL,
+                display_name TEXT
+            )
+        """)
 
-    row = conn.execute("SELECT id, email FROM teachers WHERE id = 1").fetchone()
-    if row:
+        # Explicit id=1 so this teacher owns data under key "1" in JSON files
         conn.execute(
-            "UPDATE teachers SET email = ?, password_hash = ?, display_name = ? WHERE id = 1",
+            """INSERT INTO teachers (id, email, password_hash, display_name) VALUES (1, ?, ?, ?)
+               ON CONFLICT(id) DO UPDATE SET
+                   email = excluded.email,
+                   password_hash = excluded.password_hash,
+                   display_name = excluded.display_name""",
             (EMAIL, password_hash, DISPLAY_NAME),
         )
-        conn.commit()
-        print(f"Updated teacher id=1: email={EMAIL}, password=({len(PASSWORD)} chars)")
-    else:
-        # Insert with explicit id=1 so this teacher owns data under key "1" in JSON files
-        try:
-            conn.execute(
-                "INSERT INTO teachers (id, email, password_hash, display_name) VALUES (1, ?, ?, ?)",
-                (EMAIL, password_hash, DISPLAY_NAME),
-            )
-            conn.commit()
-            print(f"Created teacher id=1: email={EMAIL}, password=({len(PASSWORD)} chars)")
-        except sqlite3.IntegrityError as e:
-            if "UNIQUE" in str(e):
-                # id=1 taken by another insert race; try update again
-                conn.execute(
-                    "UPDATE teachers SET email = ?, password_hash = ?, display_name = ? WHERE id = 1",
-                    (EMAIL, password_hash, DISPLAY_NAME),
-                )
-                conn.commit()
-                print(f"Updated teacher id=1: email={EMAIL}, password=({len(PASSWORD)} chars)")
-            else:
-                raise
+    print(f"Seeded teacher id=1: email={EMAIL}, password=({len(PASSWORD)} chars)")
 
     conn.close()
     print("Done. Log in at /login with the email and password above.")
@@ -19,12 +19,8 @@ def main():
         print("DB not found:", DB_PATH)
         return
     conn = sqlite3.connect(DB_PATH)
-    conn.execute(
-        "UPDATE teachers SET email = ? WHERE email = ?",
-        (NEW_EMAIL, OLD_EMAIL),
-    )
-    conn.commit()
-    n = conn.total_changes
+    with conn:
+        n = conn.execute("UPDATE teachers SET email = ? WHERE email = ?", (NEW_EMAIL, OLD_EMAIL)).rowcount
     conn.close()
     print(f"Updated {n} row(s). Email {OLD_EMAIL} -> {NEW_EMAIL}")
 
@@ -1,28 +1,48 @@
 """
 One-off: add a teacher to the DB for login testing.
 Usage: python src/add_teacher.py <email> <password> [display_name]
-Password is stored as SHA-256 hash (same as verify_teacher).
+Password is stored as a salted scrypt hash (auth.hash_password, checked by verify_teacher).
 """
 import sys
-import hashlib
 
+from auth import hash_password
 from db import get_connection
 
 
+def add_teachers(rows, conn=None) -> int:
+    """
+    Insert (email, password, display_name) rows in one transaction with a single prepared statement.
+    Pass conn to reuse an open connection across batches; otherwise one is borrowed from the pool here.
+    Returns the number of rows inserted.
+    """
+    params = [
+        (email.strip().lower(), hash_password(password), (display_name or "").strip())
+        for email, password, display_name in rows
+    ]
+    if conn is None:
+        with get_connection() as conn:
+            _insert_teachers(conn, params)
+    else:
+        with conn:
+            _insert_teachers(conn, params)
+    return len(params)
+
+
+def _insert_teachers(conn, params):
+    conn.executemany(
+        "INSERT INTO teachers (email, password_hash, display_name) VALUES (?, ?, ?)",
+        params,
+    )
+
+
 def main():
     if len(sys.argv) < 3:
         print("Usage: python src/add_teacher.py <email> <password> [display_name]")
         sys.exit(1)
     email = sys.argv[1].strip().lower()
     password = sys.argv[2]
-    display_name = sys.argv[3].strip() if len(sys.argv) > 3 else None
-    password_hash = hashlib.sha256(password.encode("utf-8")).hexdigest()
-    with get_connection() as conn:
-        conn.execute(
-            "INSERT INTO teachers (email, password_hash, display_name) VALUES (?, ?, ?)",
-            (email, password_hash, display_name or ""),
-        )
-        conn.commit()
+    display_name = sys.argv[3] if len(sys.argv) > 3 else None
+    add_teachers([(email, password, display_name)])
     print(f"Added teacher: {email}")
 
 
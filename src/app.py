@@ -17,18 +17,29 @@ Run: python src/app.py
 Then open: http://localhost:8000
 """
 
-import hashlib
 import html
+import importlib.util
 import json
 import os
+import re
+import stat
 import sys
+import tempfile
+import threading
+import time
 import base64
+import bisect
+import functools
+import gzip
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime, date
-from http.server import HTTPServer, SimpleHTTPRequestHandler
-from urllib.parse import parse_qs, urlparse
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import SplitResult, parse_qs, unquote_plus, urlparse
 
-from auth import get_session, create_session, verify_teacher, session_cookie_header_value, resolve_student_by_pin, set_student_pin, consume_parent_token, create_parent_token, SESSION_COOKIE_NAME
+from auth import get_session, create_session, verify_teacher, hash_password, session_cookie_header_value, resolve_student_by_pin, set_student_pin, consume_parent_token, create_parent_token, SESSION_COOKIE_NAME
 import tenant_data
 from db import get_connection, teacher_count
 
@@ -38,21 +49,52 @@ try:
 except ImportError:
     pass
 
-# Optional: Gemini AI for Phase 3 features
+# Optional: orjson for faster JSON load/save (falls back to stdlib json)
 try:
-    import google.generativeai as genai
-    _api_key = os.getenv("GOOGLE_API_KEY")
-    if _api_key:
-        genai.configure(api_key=_api_key)
-        AI_AVAILABLE = True
-        AI_MODEL = "gemini-2.0-flash"
-        print(f"[AI] Gemini API ready (model: {AI_MODEL})")
-    else:
-        AI_AVAILABLE = False
-        print("[AI] GOOGLE_API_KEY not set — AI features disabled")
+    import orjson
 except ImportError:
+    orjson = None
+
+# Optional: Gemini AI for Phase 3 features. Only check that the package is installed here;
+# the (slow, heavy) import and configure happen on the first AI query via _get_genai().
+try:
+    _genai_installed = importlib.util.find_spec("google.generativeai") is not None
+except ModuleNotFoundError:
+    _genai_installed = False
+_api_key = os.getenv("GOOGLE_API_KEY")
+if not _genai_installed:
     AI_AVAILABLE = False
     print("[AI] google-generativeai not installed — AI features disabled")
+elif _api_key:
+    AI_AVAILABLE = True
+    AI_MODEL = "gemini-2.0-flash"
+    print(f"[AI] Gemini API ready (model: {AI_MODEL})")
+else:
+    AI_AVAILABLE = False
+    print("[AI] GOOGLE_API_KEY not set — AI features disabled")
+
+_genai = None
+_MODEL_CACHE = {}
+
+# AI queries hold a request worker for the whole Gemini round trip; cap how many run at once so a
+# burst of questions can't occupy the entire pool and stall page loads and saves for everyone.
+_AI_SLOTS = threading.BoundedSemaphore(int(os.getenv("AI_CONCURRENCY", "4")))
+
+def _get_genai():
+    """Import and configure google.generativeai once, on first use."""
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        genai.configure(api_key=_api_key)
+        _genai = genai
+    return _genai
+
+def _get_model(model_name):
+    """Reuse one GenerativeModel per model name."""
+    model = _MODEL_CACHE.get(model_name)
+    if model is None:
+        model = _MODEL_CACHE[model_name] = _get_genai().GenerativeModel(model_name)
+    return model
 
 # ---------------------------------------------------------------------------
 # Paths
@@ -63,68 +105,103 @@ _DATA_DIR_ENV = os.getenv("DATA_DIR")
 _MEDIA_DIR_ENV = os.getenv("MEDIA_DIR")
 DATA_DIR = Path(_DATA_DIR_ENV) if _DATA_DIR_ENV else BASE_DIR / "data"
 MEDIA_DIR = Path(_MEDIA_DIR_ENV) if _MEDIA_DIR_ENV else BASE_DIR / "media"
+# Data files are written compact; PRETTY_JSON=1 indents them for reading by hand
+PRETTY_JSON = os.getenv("PRETTY_JSON") == "1"
+# Stdlib fallback encoders, built once instead of by every json.dumps call with non-default options
+_JSON_COMPACT = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+_JSON_PRETTY = json.JSONEncoder(indent=2, ensure_ascii=False).encode
+# Plain-string forms for hot paths (os.path.join / os.scandir avoid building Path objects)
+DATA_DIR_STR = os.fspath(DATA_DIR)
+MEDIA_DIR_STR = os.fspath(MEDIA_DIR)
+STATIC_DIR_STR = os.fspath(BASE_DIR / "static")
+# Absolute media root (with trailing separator) that every normalized /media/ path must start with
+_MEDIA_ROOT_PREFIX = os.path.join(os.path.abspath(MEDIA_DIR_STR), "")
+# The same with symlinks resolved: what a media file's realpath must start with before it is opened
+_MEDIA_REAL_PREFIX = os.path.join(os.path.realpath(MEDIA_DIR_STR), "")
 
 # ---------------------------------------------------------------------------
 # Data helpers
 # ---------------------------------------------------------------------------
 
-def _load_json(filename, default=None):
-    path = DATA_DIR / filename
-    if path.exists():
-        with open(path, encoding="utf-8") as f:
-            return json.load(f)
-    return default if default is not None else {}
+# Raw bytes per data file, keyed by path -> ((mtime_ns, size), bytes). Each load parses its own
+# copy, so a caller that mutates the result (people_batch does) can't alter what others load;
+# an unchanged file still skips the read.
+_JSON_CACHE = {}
+_JSON_CACHE_LOCK = threading.RLock()  # request threads (ThreadingHTTPServer) share the cache
 
-def _save_json(filename, data):
-    path = DATA_DIR / filename
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+def _load_json(filename, default=None):
+    path = os.path.join(DATA_DIR_STR, filename)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return default if default is not None else {}
+    stamp = (st.st_mtime_ns, st.st_size)
+    hit = _JSON_CACHE.get(path)
+    if hit is not None and hit[0] == stamp:
+        raw = hit[1]
+    else:
+        with open(path, "rb") as f:
+            raw = f.read()
+        with _JSON_CACHE_LOCK:
+            _JSON_CACHE[path] = (stamp, raw)
+    # Both parsers take the raw UTF-8 bytes, so there is no separate decode-to-str pass
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+def _save_json(filename, data, sync=False):
+    """
+    Write data atomically: dump to a unique sibling .tmp file, then os.replace over the target, so a
+    crash never leaves a half-written file. sync=True fsyncs before the swap; bulk callers can
+    skip it on all but the last write of a batch.
+    """
+    path = os.path.join(DATA_DIR_STR, filename)
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if PRETTY_JSON else 0)
+        payload = orjson.dumps(data, option=option)
+    else:
+        payload = (_JSON_PRETTY if PRETTY_JSON else _JSON_COMPACT)(data).encode("utf-8")
+    fd, tmp = tempfile.mkstemp(dir=DATA_DIR_STR, prefix=filename + ".", suffix=".tmp")
+    try:
+        try:
+            os.fchmod(fd, 0o644)  # mkstemp creates 0600; keep the usual data-file mode
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+            if sync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    with _JSON_CACHE_LOCK:
+        st = os.stat(path)
+        _JSON_CACHE[path] = ((st.st_mtime_ns, st.st_size), payload)
+
+# Small pool for overlapping the independent file loads of one page render
+_IO_POOL = ThreadPoolExecutor(max_workers=4)
+
+def _submit_load(teacher_id, tenant_loader, legacy_loader=None):
+    """
+    Start a tenant (or legacy single-tenant) load on _IO_POOL; returns a Future. Kinds with no
+    legacy loader have per-tenant files only, and their tenant loader returns empty data for None.
+    """
+    if teacher_id is not None or legacy_loader is None:
+        return _IO_POOL.submit(tenant_loader, teacher_id)
+    return _IO_POOL.submit(legacy_loader)
 
 def load_audio_categories():
     return _load_json("audio_categories.json", {})
 
 def save_audio_categories(categories):
-    _save_json("audio_categories.json", categories)
+    _save_json("audio_categories.json", categories, sync=True)
 
 def load_people():
     return _load_json("people.json", {})
 
-def load_attendance():
-    return _load_json("attendance.json", {})
-
-def save_attendance(data):
-    _save_json("attendance.json", data)
-
-def load_assignments():
-    return _load_json("assignments.json", [])
-
-def save_assignments(data):
-    _save_json("assignments.json", data)
-
-def load_scheduled_events():
-    return _load_json("scheduled_events.json", [])
-
-def save_scheduled_events(data):
-    _save_json("scheduled_events.json", data)
-
-def load_practice_log():
-    """Load practice log, migrating old format if needed.
-    Old format: { "Student": ["2026-01-01", ...] }
-    New format: { "Student": [{"date": "2026-01-01", "duration": 30, "items": "Bhupali Bandish"}, ...] }
-    """
-    data = _load_json("practice_log.json", {})
-    migrated = False
-    for student, entries in data.items():
-        if entries and isinstance(entries[0], str):
-            data[student] = [{"date": d, "duration": 0, "items": ""} for d in entries]
-            migrated = True
-    if migrated:
-        _save_json("practice_log.json", data)
-    return data
-
-def save_practice_log(data):
-    _save_json("practice_log.json", data)
-
 def get_practice_dates(entries):
     """Extract just date strings from practice log entries (works with both formats)."""
     if not entries:
@@ -133,12 +210,6 @@ def get_practice_dates(entries):
         return entries
     return [e["date"] for e in entries if isinstance(e, dict)]
 
-def load_parent_profiles():
-    return _load_json("parent_profiles.json", {})
-
-def save_parent_profiles(data):
-    _save_json("parent_profiles.json", data)
-
 def get_parent_names(teacher_id=None):
     """Get list of parent names from people.json families."""
     people = tenant_data.load_people(teacher_id) if teacher_id is not None else load_people()
@@ -148,47 +219,76 @@ def get_parent_names(teacher_id=None):
 # AI Query Helper
 # ---------------------------------------------------------------------------
 
+# Composition types in summary order (alphabetical, as categorize_audio emits them)
+_COMP_ORDER = ("Alaap", "Bandish", "Taan", "Unknown")
+
+def _composition_summary(types):
+    """
+    '2 Alaap, 1 Bandish' from a Counter, in alphabetical order. A manually entered type outside
+    _COMP_ORDER falls back to a full sort, so it still lands in its alphabetical place.
+    """
+    keys = [k for k in _COMP_ORDER if types.get(k)]
+    if len(keys) != len(types):
+        keys = sorted(types)
+    return ", ".join(f"{types[k]} {k}" for k in keys)
+
+# Rendered library summary per teacher_id -> ((mtime_ns, size) of audio_categories.json, text)
+_MUSIC_CONTEXT_CACHE = {}
+
 def build_music_context(teacher_id=None):
     """Build a summary of the music library for the AI to reference."""
+    try:
+        st = os.stat(os.path.join(DATA_DIR_STR, "audio_categories.json"))
+        stamp = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        stamp = None
+    hit = _MUSIC_CONTEXT_CACHE.get(teacher_id)
+    if stamp is not None and hit is not None and hit[0] == stamp:
+        return hit[1]
+
     categories = tenant_data.load_audio_categories(teacher_id) if teacher_id is not None else load_audio_categories()
     if not categories:
         return "The music library is currently empty."
 
-    # Summarise by raga
-    by_raga = {}
-    for filename, info in categories.items():
-        raga = info.get("raga", "Unknown")
-        by_raga.setdefault(raga, []).append(info | {"filename": filename})
-
-    lines = [f"Music Library Summary — {len(categories)} recordings across {len(by_raga)} ragas:\n"]
-    for raga, items in sorted(by_raga.items()):
-        types = {}
-        taals = set()
-        paltaa_count = 0
-        for it in items:
-            ct = it.get("composition_type", "Unknown")
-            types[ct] = types.get(ct, 0) + 1
-            if it.get("taal"):
-                taals.add(it["taal"])
-            if it.get("paltaas"):
-                paltaa_count += 1
-        type_str = ", ".join(f"{v} {k}" for k, v in sorted(types.items()))
-        taal_str = ", ".join(sorted(taals)) if taals else "none identified"
-        lines.append(f"- Raga {raga}: {len(items)} recordings ({type_str}). Taals: {taal_str}. Paltaas: {paltaa_count}.")
-    return "\n".join(lines)
+    # Summarise by raga in one pass over the library
+    raga_stats = defaultdict(lambda: {"count": 0, "types": Counter(), "taals": set(), "paltaas": 0})
+    for info in categories.values():
+        stats = raga_stats[info.get("raga", "Unknown")]
+        stats["count"] += 1
+        stats["types"][info.get("composition_type", "Unknown")] += 1
+        if info.get("taal"):
+            stats["taals"].add(info["taal"])
+        if info.get("paltaas"):
+            stats["paltaas"] += 1
+
+    header = f"Music Library Summary — {len(categories)} recordings across {len(raga_stats)} ragas:\n"
+    lines = [
+        f"- Raga {raga}: {stats['count']} recordings ({_composition_summary(stats['types'])}). "
+        f"Taals: {', '.join(sorted(stats['taals'])) if stats['taals'] else 'none identified'}. "
+        f"Paltaas: {stats['paltaas']}."
+        for raga, stats in sorted(raga_stats.items())
+    ]
+    text = "\n".join([header, *lines])
+    if stamp is not None:
+        _MUSIC_CONTEXT_CACHE[teacher_id] = (stamp, text)
+    return text
 
 def build_student_context(teacher_id=None):
     """Build context about students, attendance, practice for AI."""
-    students = get_student_names(teacher_id)
-    attendance = tenant_data.load_attendance(teacher_id) if teacher_id is not None else load_attendance()
-    practice = tenant_data.load_practice_log(teacher_id) if teacher_id is not None else load_practice_log()
-    assignments = tenant_data.load_assignments(teacher_id) if teacher_id is not None else load_assignments()
+    # Independent files: load them together on _IO_POOL rather than one after another
+    fut_people = _submit_load(teacher_id, tenant_data.load_people, load_people)
+    fut_attendance = _submit_load(teacher_id, tenant_data.load_attendance)
+    fut_practice = _submit_load(teacher_id, tenant_data.load_practice_log)
+    fut_assignments = _submit_load(teacher_id, tenant_data.load_assignments)
+    students = fut_people.result().get("students", [])
+    attendance = fut_attendance.result()
+    practice = fut_practice.result()
+    assignments = fut_assignments.result()
 
     lines = [f"Students: {', '.join(students)}"]
     lines.append(f"Total class dates on record: {len(attendance)}")
     if attendance:
-        dates = sorted(attendance.keys())
-        lines.append(f"Class date range: {dates[0]} to {dates[-1]}")
+        lines.append(f"Class date range: {min(attendance)} to {max(attendance)}")
     active = [a for a in assignments if a.get("status") == "active"]
     if active:
         lines.append(f"Active practice assignments: {len(active)}")
@@ -198,8 +298,12 @@ def build_student_context(teacher_id=None):
             lines.append(f"  {s}: {len(dates)} practice days logged")
     return "\n".join(lines)
 
-def ask_ai(query, teacher_id=None):
-    """Send a natural language query to Gemini with music library context."""
+def ask_ai(query, teacher_id=None, writer=None):
+    """
+    Send a natural language query to Gemini with music library context.
+    With writer, the answer is streamed: writer(text) is called per chunk as Gemini produces it,
+    and the returned dict still carries the full answer and mentioned_ragas.
+    """
     if not AI_AVAILABLE:
         return {"answer": "AI features are not available. Please set GOOGLE_API_KEY in your .env file and install google-generativeai.", "sources": []}
 
@@ -233,114 +337,216 @@ INSTRUCTIONS:
 
     ai_models = ["gemini-2.0-flash", "gemini-2.5-flash"]
     last_error = ""
+    prompt = [{"role": "user", "parts": [system_prompt + "\n\nUser question: " + query]}]
     for model_name in ai_models:
+        streamed = []
         try:
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content([
-                {"role": "user", "parts": [system_prompt + "\n\nUser question: " + query]}
-            ])
-            answer = response.text
-
-            # Extract any raga names mentioned for resource links
-            mentioned_ragas = []
-            for filename, info in categories.items():
-                raga = info.get("raga", "Unknown")
-                if raga != "Unknown" and raga.lower() in answer.lower() and raga not in mentioned_ragas:
-                    mentioned_ragas.append(raga)
+            model = _get_model(model_name)
+            if writer is None:
+                answer = model.generate_content(prompt).text
+            else:
+                for chunk in model.generate_content(prompt, stream=True):
+                    streamed.append(chunk.text)
+                    writer(chunk.text)
+                answer = "".join(streamed)
+
+            # Extract any raga names mentioned for resource links (each distinct raga checked once)
+            answer_lower = answer.lower()
+            unique_ragas = dict.fromkeys(info.get("raga", "Unknown") for info in categories.values())
+            unique_ragas.pop("Unknown", None)
+            mentioned_ragas = [r for r in unique_ragas if r.lower() in answer_lower]
 
             return {"answer": answer, "mentioned_ragas": mentioned_ragas}
         except Exception as e:
             last_error = str(e)
+            if streamed:
+                break  # Part of the answer already reached the client; don't restart on another model
             continue  # Try next model
 
     return {"answer": f"Sorry, AI is temporarily unavailable (quota limit reached). Please try again in a minute.\n\nDetails: {last_error}", "mentioned_ragas": []}
 
+_IMAGE_EXTS = frozenset({'jpg', 'jpeg', 'png', 'gif', 'webp'})
+_VIDEO_EXTS = frozenset({'mp4', 'mov', 'avi', 'webm'})
+_AUDIO_EXTS = frozenset({'m4a', 'mp3', 'opus', 'wav', 'ogg', 'amr', 'webm'})
+
+def _ext(name):
+    """Lowercased extension without the dot ('' for no extension or dotfiles), like Path.suffix."""
+    head, _, ext = name.rpartition(".")
+    return ext.lower() if head else ""
+
+# Directory listings keyed by dir path -> (dir mtime_ns, result). A directory's mtime changes
+# whenever an entry is added, removed or renamed, so an unchanged mtime means an unchanged listing.
+_AUDIO_CACHE = {}
+_EVENTS_CACHE = {}
+_EVENT_FILES_CACHE = {}
+
+def _event_folder_files(path, mtime_ns):
+    """(photos, videos) file names in one event folder, cached on the folder's mtime."""
+    hit = _EVENT_FILES_CACHE.get(path)
+    if hit is not None and hit[0] == mtime_ns:
+        return hit[1]
+    photos, videos = [], []
+    with os.scandir(path) as it:
+        for e in it:
+            ext = _ext(e.name)
+            if ext in _IMAGE_EXTS:
+                photos.append(e.name)
+            elif ext in _VIDEO_EXTS:
+                videos.append(e.name)
+    _EVENT_FILES_CACHE[path] = (mtime_ns, (photos, videos))
+    return photos, videos
+
 def get_events(teacher_id=None):
     """Event media folders for the given teacher. When teacher_id is set, use media/events/{teacher_id}/."""
     if teacher_id is not None:
-        events_dir = MEDIA_DIR / "events" / str(teacher_id)
+        key = os.path.join(MEDIA_DIR_STR, "events", str(teacher_id))
     else:
-        events_dir = MEDIA_DIR / "events"
+        key = os.path.join(MEDIA_DIR_STR, "events")
+    try:
+        dir_mtime = os.stat(key).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    with os.scandir(key) as it:
+        subdirs = sorted((e for e in it if e.is_dir()), key=lambda e: e.name)
+    # Folder mtimes change when photos are added, so they are part of the cache stamp
+    stamp = (dir_mtime, tuple(e.stat().st_mtime_ns for e in subdirs))
+    hit = _EVENTS_CACHE.get(key)
+    if hit is not None and hit[0] == stamp:
+        return hit[1]
     events = []
-    if events_dir.exists():
-        for d in sorted(events_dir.iterdir()):
-            if d.is_dir():
-                files = list(d.iterdir())
-                photos = [f.name for f in files if f.suffix.lower() in {'.jpg', '.jpeg', '.png', '.gif', '.webp'}]
-                videos = [f.name for f in files if f.suffix.lower() in {'.mp4', '.mov', '.avi', '.webm'}]
-                events.append({
-                    "folder": d.name,
-                    "photos": photos,
-                    "videos": videos,
-                    "total": len(photos) + len(videos),
-                })
+    for d, mtime_ns in zip(subdirs, stamp[1]):
+        photos, videos = _event_folder_files(d.path, mtime_ns)
+        events.append({
+            "folder": d.name,
+            "photos": photos,
+            "videos": videos,
+            "total": len(photos) + len(videos),
+        })
+    _EVENTS_CACHE[key] = (stamp, events)
     return events
 
 def get_audio_files(teacher_id=None):
     """Audio file names for the given teacher. When teacher_id is set, use media/audio/{teacher_id}/."""
     if teacher_id is not None:
-        audio_dir = MEDIA_DIR / "audio" / str(teacher_id)
+        key = os.path.join(MEDIA_DIR_STR, "audio", str(teacher_id))
     else:
-        audio_dir = MEDIA_DIR / "audio"
-    if audio_dir.exists():
-        return sorted([
-            f.name for f in audio_dir.iterdir()
-            if f.suffix.lower() in {'.m4a', '.mp3', '.opus', '.wav', '.ogg', '.amr', '.webm'}
-        ])
-    return []
+        key = os.path.join(MEDIA_DIR_STR, "audio")
+    try:
+        mtime_ns = os.stat(key).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    hit = _AUDIO_CACHE.get(key)
+    if hit is not None and hit[0] == mtime_ns:
+        return hit[1]
+    with os.scandir(key) as it:
+        files = sorted(e.name for e in it if _ext(e.name) in _AUDIO_EXTS)
+    _AUDIO_CACHE[key] = (mtime_ns, files)
+    return files
 
 def get_student_names(teacher_id=None):
     """Get list of student names from people.json."""
     people = tenant_data.load_people(teacher_id) if teacher_id is not None else load_people()
     return people.get("students", [])
 
-def add_student(name, teacher_id=None):
-    """Add a student to people.json (tenant-scoped when teacher_id is set)."""
-    if teacher_id is not None:
-        people = tenant_data.load_people(teacher_id)
-        students = people.get("students", [])
-        if name not in students:
-            students.append(name)
-            people["students"] = students
-            tenant_data.save_people(teacher_id, people)
-            return True
-        return False
-    people = load_people()
+class PeopleBatch:
+    """people_batch's handle: edit .people in place and set .changed when an edit took effect."""
+    __slots__ = ("people", "changed")
+
+    def __init__(self, people):
+        self.people = people
+        self.changed = False
+
+
+@contextmanager
+def people_batch(teacher_id=None):
+    """
+    Load people once, yield a PeopleBatch for in-place edits, and write it once on exit if the
+    caller marked it changed. Use for bulk edits (e.g. a class roster): one file write instead of
+    one per student. The _*_inplace helpers return whether they changed anything:
+    batch.changed |= _add_student_inplace(batch.people, name).
+    """
+    batch = PeopleBatch(tenant_data.load_people(teacher_id) if teacher_id is not None else load_people())
+    yield batch
+    if batch.changed:
+        if teacher_id is not None:
+            tenant_data.save_people(teacher_id, batch.people)
+        else:
+            _save_json("people.json", batch.people, sync=True)
+
+
+def _add_student_inplace(people, name):
+    """Append name to people["students"] if missing. Returns True if added."""
     students = people.get("students", [])
-    if name not in students:
-        students.append(name)
-        people["students"] = students
-        _save_json("people.json", people)
-        return True
-    return False
+    if name in students:
+        return False
+    students.append(name)
+    people["students"] = students
+    return True
 
 
-def remove_student(name, teacher_id):
-    """Remove a student from people and their PIN. Returns True if removed."""
-    people = tenant_data.load_people(teacher_id)
+def _remove_student_inplace(people, name):
+    """Drop name from people["students"]. Returns True if it was there."""
     students = people.get("students", [])
     if name not in students:
         return False
     people["students"] = [s for s in students if s != name]
-    tenant_data.save_people(teacher_id, people)
-    pins = tenant_data.load_student_pins(teacher_id)
-    if name in pins:
-        del pins[name]
-        tenant_data.save_student_pins(teacher_id, pins)
+    return True
+
+
+def add_student(name, teacher_id=None):
+    """Add a student to people.json (tenant-scoped when teacher_id is set)."""
+    with people_batch(teacher_id) as batch:
+        batch.changed = _add_student_inplace(batch.people, name)
+    return batch.changed
+
+
+def remove_student(name, teacher_id):
+    """Remove a student from people and their PIN. Returns True if removed."""
+    # Both files are written together at the end of the batch
+    with tenant_data.batch_saves():
+        with people_batch(teacher_id) as batch:
+            batch.changed = removed = _remove_student_inplace(batch.people, name)
+        if not removed:
+            return False
+        pins = tenant_data.load_student_pins(teacher_id)
+        if name in pins:
+            del pins[name]
+            tenant_data.save_student_pins(teacher_id, pins)
     return True
 
 # ---------------------------------------------------------------------------
 # HTML builders — shared
 # ---------------------------------------------------------------------------
 
+@functools.lru_cache(maxsize=2048)
+def _esc(s):
+    """html.escape (quote=True) memoized; school and student/parent names repeat on every render."""
+    return html.escape(s)
+
+def _school_name(teacher_info):
+    """Music class name: per-tenant people.teacher.school_name, else the full default. Escape with _esc."""
+    return teacher_info.get("school_name") or "Hindustani Classical Music — " + (teacher_info.get("name") or "Teacher") + "'s Music School"
+
+@functools.lru_cache(maxsize=2048)
+def _initials(name):
+    """Up to two uppercase initials for an avatar."""
+    return "".join(w[0].upper() for w in name.split() if w)[:2]
+
+# Fixed fragments of the per-file gallery tags (joined around folder path + file name)
+_IMG_PRE = '<img src="'
+_IMG_MID = '" loading="lazy" onclick="openLightbox(this.src)" alt="'
+_IMG_POST = '">'
+_VIDEO_PRE = '<video controls preload="none" src="'
+_VIDEO_POST = '"></video>'
+
 def build_events_html(events, teacher_id=None):
     """Build event gallery HTML. When teacher_id is set, media URLs use /media/events/{teacher_id}/..."""
     prefix = f"/media/events/{teacher_id}/" if teacher_id is not None else "/media/events/"
-    html = ""
+    out = []
     for event in reversed(events):
         name = event["folder"].replace("_", " ").replace("-", " ")
         folder_path = prefix + event["folder"] + "/"
-        html += f"""
+        out.append(f"""
         <div class="card">
             <div class="card-header" onclick="this.nextElementSibling.classList.toggle('collapsed')">
                 <div class="card-header-left"><h3>{name}</h3></div>
@@ -348,19 +554,41 @@ def build_events_html(events, teacher_id=None):
             </div>
             <div class="card-body">
                 <div class="gallery">
-        """
+        """)
         for photo in event["photos"]:
-            html += f'<img src="{folder_path}{photo}" loading="lazy" onclick="openLightbox(this.src)" alt="{photo}">'
+            out.extend((_IMG_PRE, folder_path, photo, _IMG_MID, photo, _IMG_POST))
         for video in event["videos"]:
-            html += f'<video controls preload="none" src="{folder_path}{video}"></video>'
-        html += "</div></div></div>"
-    return html
+            out.extend((_VIDEO_PRE, folder_path, video, _VIDEO_POST))
+        out.append("</div></div></div>")
+    return "".join(out)
+
+def _scheduled_date(ev):
+    return ev.get("date", "")
+
+def build_scheduled_html(scheduled):
+    """Upcoming-events card for the events tab, in date order ("" when there are none)."""
+    if not scheduled:
+        return ""
+    parts = ['<div class="card"><div class="card-header"><div class="card-header-left"><h3>Upcoming Events</h3></div></div><div class="card-body"><div class="scheduled-list">']
+    for ev in sorted(scheduled, key=_scheduled_date):
+        location = ev.get("location")
+        description = ev.get("description")
+        loc_frag = " — " + _esc(str(location)) if location else ""
+        desc_frag = '<div class="se-desc">' + _esc(str(description)) + "</div>" if description else ""
+        parts.append(f"""<div class="scheduled-event">
+                <div class="se-date">{_esc(str(ev.get('date', '')))}</div>
+                <div class="se-info"><div class="se-name">{_esc(str(ev.get('name', '')))}</div>
+                <div class="se-meta">{_esc(str(ev.get('time', '')))} {loc_frag}</div>
+                {desc_frag}
+                </div></div>""")
+    parts.append('</div></div></div>')
+    return "".join(parts)
 
 def build_people_html(people, role=None, teacher_id=None):
     teacher = people.get("teacher", {})
     families = people.get("families", [])
     show_teacher_actions = role == "teacher"
-    output = f"""
+    output = [f"""
     <div class="card teacher-section">
         <div class="card-header"><div class="card-header-left"><h3>Teacher</h3></div></div>
         <div class="card-body">
@@ -369,7 +597,7 @@ def build_people_html(people, role=None, teacher_id=None):
                     <svg viewBox="0 0 24 24" fill="currentColor"><path d="M12 12c2.21 0 4-1.79 4-4s-1.79-4-4-4-4 1.79-4 4 1.79 4 4 4zm0 2c-2.67 0-8 1.34-8 4v2h16v-2c0-2.66-5.33-4-8-4z"/></svg>
                 </div>
                 <div class="person-info">
-                    <div class="person-name">{teacher.get('name', 'Unknown')}</div>
+                    <div class="person-name">{_esc(teacher.get('name', 'Unknown'))}</div>
                     <div class="person-meta">{teacher.get('messages', 0)} messages</div>
                 </div>
             </div>
@@ -379,18 +607,18 @@ def build_people_html(people, role=None, teacher_id=None):
         <div class="card-header"><div class="card-header-left"><h3>Families</h3></div>
             <span class="badge">{len(families)}</span></div>
         <div class="card-body">
-    """
+    """]
     if show_teacher_actions:
-        output += """
+        output.append("""
         <div style="margin-bottom:12px;">
             <input type="text" id="add-contact-name" class="modal-input" placeholder="Parent / contact name" style="max-width:200px; margin-right:8px;">
             <button type="button" class="save-btn btn-add-contact">Add contact</button>
-        </div>"""
-    output += "<div class=\"people-grid\">"
+        </div>""")
+    output.append("<div class=\"people-grid\">")
     for person in families:
         name = person.get("parent", "Unknown")
-        name_attr = html.escape(name, quote=True)
-        initials = "".join(w[0].upper() for w in name.split() if w)[:2]
+        name_attr = _esc(name)
+        initials = _esc(_initials(name))
         person_role = person.get("role", "parent")
         msgs = person.get("messages", 0)
         link_btn = ""
@@ -398,60 +626,24 @@ def build_people_html(people, role=None, teacher_id=None):
         if show_teacher_actions:
             link_btn = f' <button type="button" class="btn-generate-parent-link save-btn" style="margin-left:8px; padding:6px 10px; font-size:12px;" data-parent="{name_attr}" title="Generate login link for this parent">Generate login link</button>'
             remove_btn = f' <button type="button" class="btn-remove-contact save-btn" style="margin-left:6px; padding:6px 10px; font-size:12px; background:#c44; border-color:#a33;" data-parent="{name_attr}" title="Remove contact">Remove</button>'
-        output += f"""
+        output.append(f"""
             <div class="person person-contact" data-parent="{name_attr}">
                 <div class="person-avatar {'student-avatar' if person_role == 'student' else ''}">{initials}</div>
                 <div class="person-info">
-                    <div class="person-name-wrap"><span class="person-name">{html.escape(name)}</span>{link_btn}{remove_btn}</div>
+                    <div class="person-name-wrap"><span class="person-name">{name_attr}</span>{link_btn}{remove_btn}</div>
                     <div class="person-meta"><span class="role-badge {'student-badge' if person_role == 'student' else ''}">{person_role}</span> &middot; {msgs} msgs</div>
                 </div>
             </div>
-        """
-    output += "</div></div></div>"
-    return output
+        """)
+    output.append("</div></div></div>")
+    return "".join(output)
 
 # ---------------------------------------------------------------------------
 # HTML builder — Teacher Dashboard
 # ---------------------------------------------------------------------------
 
-def build_teacher_dashboard(categories, events, people, audio_files, teacher_id=None):
-    total_audio = len(audio_files)
-    categorized = len(categories)
-    total_events = len(events)
-    total_event_files = sum(e["total"] for e in events)
-    families = people.get("families", [])
-    ragas = sorted(set(v.get("raga", "Unknown") for v in categories.values() if v.get("raga") and v.get("raga") != "Unknown"))
-    attendance = tenant_data.load_attendance(teacher_id) if teacher_id is not None else load_attendance()
-    assignments = tenant_data.load_assignments(teacher_id) if teacher_id is not None else load_assignments()
-    scheduled = tenant_data.load_scheduled_events(teacher_id) if teacher_id is not None else load_scheduled_events()
-
-    today = date.today().strftime("%A, %B %d, %Y")
-
-    # Count active assignments
-    active_assignments = len([a for a in assignments if a.get("status", "active") == "active"])
-
-    # Recent attendance
-    att_dates = sorted(attendance.keys(), reverse=True)
-    last_class = att_dates[0] if att_dates else "No records yet"
-
-    teacher_info = people.get("teacher", {})
-    teacher_venmo = teacher_info.get("venmo", "@Teacher")
-    _default_class = "Hindustani Classical Music — " + (teacher_info.get("name", "Teacher") + "'s Music School")
-    teacher_school_name = teacher_info.get("school_name") or _default_class
-
-    students = people.get("students", [])
-    student_pin_rows = ""
-    for s in sorted(students):
-        safe_name = html.escape(s, quote=True)
-        student_pin_rows += f"""
-                <div class="student-pin-row" data-student-name="{safe_name}" style="display:flex; gap:8px; align-items:center; margin-bottom:8px;">
-                    <span class="student-pin-name" style="min-width:120px;">{html.escape(s)}</span>
-                    <input type="password" class="modal-input pin-input" placeholder="PIN" inputmode="numeric" maxlength="8" autocomplete="off" style="width:80px;">
-                    <button type="button" class="save-btn" onclick="setStudentPin(this)">Set PIN</button>
-                    <button type="button" class="btn-remove-student save-btn" style="padding:6px 10px; font-size:12px; background:#c44; border-color:#a33;" data-student-name="{safe_name}" title="Remove student">Remove</button>
-                </div>"""
-
-    return f"""
+# Static markup of the teacher dashboard; only the {placeholders} vary per request.
+_TEACHER_DASH_TEMPLATE = """
     <div class="teacher-welcome">
         <div class="welcome-text">
             <h2>Welcome back, Teacher</h2>
@@ -466,7 +658,7 @@ def build_teacher_dashboard(categories, events, people, audio_files, teacher_id=
             <div class="modal-row">
                 <label class="modal-label">Music class name</label>
                 <div style="display:flex; gap:8px;">
-                    <input type="text" id="school-name-input" class="modal-input" value="{html.escape(teacher_school_name)}" placeholder="e.g. Hindustani Classical Music — Vaishnavi Kondapalli's Music School">
+                    <input type="text" id="school-name-input" class="modal-input" value="{teacher_school_name}" placeholder="e.g. Hindustani Classical Music — Vaishnavi Kondapalli's Music School">
                 </div>
                 <p style="font-size:11px; color:#6a5a4a; margin-top:4px;">Shown in the header for your class</p>
             </div>
@@ -510,7 +702,7 @@ def build_teacher_dashboard(categories, events, people, audio_files, teacher_id=
             <div class="action-card-stats">
                 <span>{total_audio} recordings</span>
                 <span class="dot">&middot;</span>
-                <span>{len(ragas)} ragas</span>
+                <span>{raga_count} ragas</span>
                 <span class="dot">&middot;</span>
                 <span id="teacher-active-assignments-count">{active_assignments} assigned</span>
             </div>
@@ -546,9 +738,9 @@ def build_teacher_dashboard(categories, events, people, audio_files, teacher_id=
                 </div>
             </div>
             <div class="action-card-stats">
-                <span>{len(families)} families</span>
+                <span>{families_count} families</span>
                 <span class="dot">&middot;</span>
-                <span>{len(att_dates)} classes logged</span>
+                <span>{att_dates_count} classes logged</span>
             </div>
             <div class="action-buttons">
                 <button class="action-btn primary" onclick="openAttendance()">
@@ -578,7 +770,7 @@ def build_teacher_dashboard(categories, events, people, audio_files, teacher_id=
                 <span class="dot">&middot;</span>
                 <span>{total_event_files} photos &amp; videos</span>
                 <span class="dot">&middot;</span>
-                <span>{len(scheduled)} scheduled</span>
+                <span>{scheduled_count} scheduled</span>
             </div>
             <div class="action-buttons">
                 <button class="action-btn primary" onclick="openCreateEvent()">
@@ -605,46 +797,87 @@ def build_teacher_dashboard(categories, events, people, audio_files, teacher_id=
     </div>
     """
 
+def build_teacher_dashboard(categories, events, people, audio_files, teacher_id=None, scheduled=None):
+    total_audio = len(audio_files)
+    categorized = len(categories)
+    total_events = len(events)
+    total_event_files = sum(e["total"] for e in events)
+    families = people.get("families", [])
+    ragas = sorted(set(v.get("raga", "Unknown") for v in categories.values() if v.get("raga") and v.get("raga") != "Unknown"))
+    fut_attendance = _submit_load(teacher_id, tenant_data.load_attendance)
+    fut_assignments = _submit_load(teacher_id, tenant_data.load_assignments)
+    if scheduled is None:
+        scheduled = _submit_load(teacher_id, tenant_data.load_scheduled_events).result()
+    attendance = fut_attendance.result()
+    assignments = fut_assignments.result()
 
-# ---------------------------------------------------------------------------
-# Page builder
-# ---------------------------------------------------------------------------
+    today = date.today().strftime("%A, %B %d, %Y")
 
-def build_page(teacher_id=None, role=None, student_id=None, parent_id=None):
-    categories = tenant_data.load_audio_categories(teacher_id) if teacher_id is not None else load_audio_categories()
-    events = get_events(teacher_id)
-    people = tenant_data.load_people(teacher_id) if teacher_id is not None else load_people()
-    audio_files = get_audio_files(teacher_id)
-    student_names = get_student_names(teacher_id)
+    # Count active assignments
+    active_assignments = len([a for a in assignments if a.get("status", "active") == "active"])
+
+    # Recent attendance (ISO dates compare lexicographically, so max() is the latest)
+    last_class = max(attendance) if attendance else "No records yet"
 
-    # Music class name: per-tenant from people.teacher.school_name, else full default
     teacher_info = people.get("teacher", {})
-    _default_class = "Hindustani Classical Music — " + (teacher_info.get("name") or "Teacher") + "'s Music School"
-    school_name = teacher_info.get("school_name") or _default_class
+    teacher_venmo = teacher_info.get("venmo", "@Teacher")
+    teacher_school_name = _school_name(teacher_info)
 
-    # Cache-bust CSS so edits always show (use file mtime as version)
-    _css_path = BASE_DIR / "static" / "css" / "main.css"
-    _css_v = int(_css_path.stat().st_mtime) if _css_path.exists() else 0
-
-    teacher_dashboard_html = build_teacher_dashboard(categories, events, people, audio_files, teacher_id=teacher_id)
-    events_html = build_events_html(events, teacher_id=teacher_id)
-    people_html = build_people_html(people, role=role, teacher_id=teacher_id)
-
-    # Scheduled events for the events tab
-    scheduled = tenant_data.load_scheduled_events(teacher_id) if teacher_id is not None else load_scheduled_events()
-    scheduled_html = ""
-    if scheduled:
-        scheduled_html = '<div class="card"><div class="card-header"><div class="card-header-left"><h3>Upcoming Events</h3></div></div><div class="card-body"><div class="scheduled-list">'
-        for ev in sorted(scheduled, key=lambda x: x.get("date", "")):
-            scheduled_html += f"""<div class="scheduled-event">
-                <div class="se-date">{ev.get('date', '')}</div>
-                <div class="se-info"><div class="se-name">{ev.get('name', '')}</div>
-                <div class="se-meta">{ev.get('time', '')} {(' — ' + ev.get('location', '')) if ev.get('location') else ''}</div>
-                {('<div class="se-desc">' + ev.get('description', '') + '</div>') if ev.get('description') else ''}
-                </div></div>"""
-        scheduled_html += '</div></div></div>'
-
-    page = f"""<!DOCTYPE html>
+    students = people.get("students", [])
+    pin_rows = []
+    for s in sorted(students):
+        safe_name = _esc(s)
+        pin_rows.append(f"""
+                <div class="student-pin-row" data-student-name="{safe_name}" style="display:flex; gap:8px; align-items:center; margin-bottom:8px;">
+                    <span class="student-pin-name" style="min-width:120px;">{safe_name}</span>
+                    <input type="password" class="modal-input pin-input" placeholder="PIN" inputmode="numeric" maxlength="8" autocomplete="off" style="width:80px;">
+                    <button type="button" class="save-btn" onclick="setStudentPin(this)">Set PIN</button>
+                    <button type="button" class="btn-remove-student save-btn" style="padding:6px 10px; font-size:12px; background:#c44; border-color:#a33;" data-student-name="{safe_name}" title="Remove student">Remove</button>
+                </div>""")
+    student_pin_rows = "".join(pin_rows)
+
+    return _TEACHER_DASH_TEMPLATE.format_map({
+        "today": today,
+        "teacher_school_name": _esc(teacher_school_name),
+        "teacher_venmo": _esc(teacher_venmo),
+        "student_pin_rows": student_pin_rows,
+        "total_audio": total_audio,
+        "raga_count": len(ragas),
+        "active_assignments": active_assignments,
+        "families_count": len(families),
+        "att_dates_count": len(attendance),
+        "total_events": total_events,
+        "total_event_files": total_event_files,
+        "scheduled_count": len(scheduled),
+    })
+
+
+# ---------------------------------------------------------------------------
+# Page builder
+# ---------------------------------------------------------------------------
+
+# Static asset versions (file mtime) per path under static/: rel -> (checked_at, version).
+# Re-stat at most every _ASSET_VERSION_TTL seconds instead of on every page render.
+_ASSET_VERSIONS = {}
+_ASSET_VERSION_TTL = 5.0
+_PAGE_ASSETS = ("css/main.css", "js/core.js", "js/music-editor.js", "js/teacher.js", "js/student.js", "js/parent.js", "js/ai-chat.js")
+
+def asset_version(rel):
+    """Cache-busting ?v= value for static/<rel>: its mtime in whole seconds, 0 if missing."""
+    now = time.monotonic()
+    hit = _ASSET_VERSIONS.get(rel)
+    if hit is not None and now - hit[0] < _ASSET_VERSION_TTL:
+        return hit[1]
+    try:
+        version = int(os.stat(os.path.join(STATIC_DIR_STR, rel)).st_mtime)
+    except FileNotFoundError:
+        version = 0
+    _ASSET_VERSIONS[rel] = (now, version)
+    return version
+
+# Static page shell, filled with format_map per request (no literal braces inside).
+# The head needs no tenant data, so it is sent while the page data is still loading.
+_PAGE_HEAD_TEMPLATE = """<!DOCTYPE html>
 <html lang="en">
 <head>
 <meta charset="UTF-8">
@@ -653,7 +886,7 @@ def build_page(teacher_id=None, role=None, student_id=None, parent_id=None):
 <meta name="mobile-web-app-capable" content="yes">
 <meta name="theme-color" content="#0a0a16">
 <title>Music Class Organizer</title>
-<link rel="stylesheet" href="/static/css/main.css?v={_css_v}">
+<link rel="stylesheet" href="/static/css/main.css?v={css_v}">
 </head>
 <body>
 
@@ -685,9 +918,11 @@ def build_page(teacher_id=None, role=None, student_id=None, parent_id=None):
     Switch
 </button>
 
-<header>
+"""
+
+_PAGE_TEMPLATE = """<header>
     <h1><span>&#9835;</span> Music Class Organizer</h1>
-    <p id="header-school-name">{html.escape(school_name)}</p>
+    <p id="header-school-name">{school_name}</p>
     <a href="/logout" class="header-logout">Log out</a>
 </header>
 
@@ -1051,33 +1286,201 @@ def build_page(teacher_id=None, role=None, student_id=None, parent_id=None):
 </div> <!-- /app-container -->
 """
 
-# Bootstrap data for JS (one small inline script), then load external JS files
-    parent_names = get_parent_names(teacher_id)
+# Bootstrap data for JS (one small inline script), then the external JS files
+_BOOTSTRAP_TEMPLATE = """<script>
+window.__BOOT__ = {boot};
+const {{teacherId, sessionRole, sessionStudentId, sessionParentId, schoolName, allAudioFiles, studentNames, parentNames}} = window.__BOOT__;
+const mediaAudioBase = teacherId != null ? '/media/audio/' + teacherId + '/' : '/media/audio/';
+let categories = window.__BOOT__.categories;
+let teacherVenmo = window.__BOOT__.teacherVenmo;
+</script>
+<script src="/static/js/core.js?v={v_core}"></script>
+<script src="/static/js/music-editor.js?v={v_music_editor}"></script>
+<script src="/static/js/teacher.js?v={v_teacher}"></script>
+<script src="/static/js/student.js?v={v_student}"></script>
+<script src="/static/js/parent.js?v={v_parent}"></script>
+<script src="/static/js/ai-chat.js?v={v_ai_chat}"></script>
+</body>
+</html>"""
+
+def _compact_json(data):
+    """Compact JSON text for inlining into the page; orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(data, separators=(",", ":"))
+
+# Compact JSON of the large bootstrap payloads: (kind, teacher_id) -> (token, text).
+# token is whatever identifies the data's source state (file stamp, cached listing).
+_BOOT_JSON_CACHE = {}
+
+def _boot_json(kind, teacher_id, token, data):
+    """_compact_json(data), reused while token compares equal to the cached one."""
+    key = (kind, teacher_id)
+    hit = _BOOT_JSON_CACHE.get(key)
+    if hit is not None and hit[0] == token:
+        return hit[1]
+    text = _compact_json(data)
+    _BOOT_JSON_CACHE[key] = (token, text)
+    return text
+
+# Builder output shared across a tenant's page variants: (kind, teacher_id, role) -> (version, html)
+_FRAGMENT_CACHE = {}
+
+def _fragment(kind, teacher_id, role, version, build):
+    """build() memoized per tenant while version (see _page_version) is unchanged; None disables caching."""
+    if version is None:
+        return build()
+    key = (kind, teacher_id, role)
+    hit = _FRAGMENT_CACHE.get(key)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+    out = build()
+    _FRAGMENT_CACHE[key] = (version, out)
+    return out
+
+def iter_page(teacher_id=None, role=None, student_id=None, parent_id=None, version=None):
+    """
+    Yield the dashboard HTML in sections, the head first while the page data loads.
+    Pass the current _page_version to reuse builder output from other roles' renders.
+    """
+    # Stamp before loading: a write racing the load can only cause a miss next time, never a stale hit
+    categories_token = (_file_stamp(os.path.join(DATA_DIR_STR, "audio_categories.json")), _TENANT_VERSION.get(teacher_id, 0))
+    fut_categories = _submit_load(teacher_id, tenant_data.load_audio_categories, load_audio_categories)
+    fut_people = _submit_load(teacher_id, tenant_data.load_people, load_people)
+    fut_events = _IO_POOL.submit(get_events, teacher_id)
+    fut_audio = _IO_POOL.submit(get_audio_files, teacher_id)
+    fut_scheduled = _submit_load(teacher_id, tenant_data.load_scheduled_events)
+    # Cache-bust CSS so edits always show (use file mtime as version)
+    yield _PAGE_HEAD_TEMPLATE.format_map({"css_v": asset_version("css/main.css")})
+
+    categories = fut_categories.result()
+    people = fut_people.result()
+    events = fut_events.result()
+    audio_files = fut_audio.result()
+    scheduled = fut_scheduled.result()
+    # Same data get_student_names / get_parent_names would re-read from people.json
+    student_names = people.get("students", [])
+    parent_names = [f.get("parent", "Unknown") for f in people.get("families", [])]
+
+    school_name = _school_name(people.get("teacher", {}))
+
+    # Students and parents never see the teacher dashboard; skip building and sending it
+    teacher_dashboard_html = "" if role in ("student", "parent") else _fragment("teacher_dashboard", teacher_id, None, version, lambda: build_teacher_dashboard(categories, events, people, audio_files, teacher_id=teacher_id, scheduled=scheduled))
+    events_html = _fragment("events", teacher_id, None, version, lambda: build_events_html(events, teacher_id=teacher_id))
+    people_html = _fragment("people", teacher_id, role, version, lambda: build_people_html(people, role=role, teacher_id=teacher_id))
+
+    scheduled_html = _fragment("scheduled", teacher_id, None, version, lambda: build_scheduled_html(scheduled))
+
+    yield _PAGE_TEMPLATE.format_map({
+        "school_name": _esc(school_name),
+        "teacher_dashboard_html": teacher_dashboard_html,
+        "scheduled_html": scheduled_html,
+        "events_html": events_html,
+        "people_html": people_html,
+    })
+
     teacher_venmo = people.get("teacher", {}).get("venmo", "@Teacher")
 
-    page += "<script>\n"
-    page += "const teacherId = " + json.dumps(teacher_id) + ";\n"
-    page += "const sessionRole = " + json.dumps(role) + ";\n"
-    page += "const sessionStudentId = " + json.dumps(student_id) + ";\n"
-    page += "const sessionParentId = " + json.dumps(parent_id) + ";\n"
-    page += "const mediaAudioBase = teacherId != null ? '/media/audio/' + teacherId + '/' : '/media/audio/';\n"
-    page += "const schoolName = " + json.dumps(school_name) + ";\n"
-    page += "let categories = " + json.dumps(categories) + ";\n"
-    page += "const allAudioFiles = " + json.dumps(audio_files) + ";\n"
-    page += "const studentNames = " + json.dumps(student_names) + ";\n"
-    page += "const parentNames = " + json.dumps(parent_names) + ";\n"
-    page += "let teacherVenmo = " + json.dumps(teacher_venmo) + ";\n"
-    page += "</script>\n"
-    page += f'<script src="/static/js/core.js?v={_css_v}"></script>\n'
-    page += f'<script src="/static/js/music-editor.js?v={_css_v}"></script>\n'
-    page += f'<script src="/static/js/teacher.js?v={_css_v}"></script>\n'
-    page += f'<script src="/static/js/student.js?v={_css_v}"></script>\n'
-    page += f'<script src="/static/js/parent.js?v={_css_v}"></script>\n'
-    page += f'<script src="/static/js/ai-chat.js?v={_css_v}"></script>\n'
-    page += "</body>\n</html>"   
-
-    return page
+    yield _BOOTSTRAP_TEMPLATE.format_map({
+        "boot": "".join((
+            _compact_json({
+                "teacherId": teacher_id,
+                "sessionRole": role,
+                "sessionStudentId": student_id,
+                "sessionParentId": parent_id,
+                "schoolName": school_name,
+                "studentNames": student_names,
+                "parentNames": parent_names,
+                "teacherVenmo": teacher_venmo,
+            })[:-1],
+            ',"categories":', _boot_json("categories", teacher_id, categories_token, categories),
+            # get_audio_files hands back the same list object while the directory is unchanged
+            ',"allAudioFiles":', _boot_json("audio", teacher_id, audio_files, audio_files),
+            "}",
+        )),
+        "v_core": asset_version("js/core.js"),
+        "v_music_editor": asset_version("js/music-editor.js"),
+        "v_teacher": asset_version("js/teacher.js"),
+        "v_student": asset_version("js/student.js"),
+        "v_parent": asset_version("js/parent.js"),
+        "v_ai_chat": asset_version("js/ai-chat.js"),
+    })
 
+def build_page(teacher_id=None, role=None, student_id=None, parent_id=None):
+    return "".join(iter_page(teacher_id=teacher_id, role=role, student_id=student_id, parent_id=parent_id))
+
+
+# Rendered pages as UTF-8 bytes: (teacher_id, role, student_id, parent_id) -> (version, bytes, gzip bytes or None).
+# LRU-capped; version covers every input of build_page so a stale hit is impossible.
+_PAGE_CACHE = OrderedDict()
+_PAGE_CACHE_LOCK = threading.Lock()
+_PAGE_CACHE_MAX = 64
+# Bumped after every POST for a tenant, so writes invalidate even within one mtime tick
+_TENANT_VERSION = {}
+
+_PAGE_DATA_FILES = ("audio_categories.json", "people.json", "attendance.json", "attendance.ndjson", "assignments.json", "scheduled_events.json")
+
+def bump_tenant_version(teacher_id):
+    """Invalidate cached pages for teacher_id (call after writing its data)."""
+    with _PAGE_CACHE_LOCK:
+        _TENANT_VERSION[teacher_id] = _TENANT_VERSION.get(teacher_id, 0) + 1
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+def _page_version(teacher_id):
+    """Everything build_page depends on: data files, media listings, asset versions, today's date, POST counter."""
+    get_audio_files(teacher_id)  # refresh the listing caches, then read their stamps
+    get_events(teacher_id)
+    sub = (str(teacher_id),) if teacher_id is not None else ()
+    audio_hit = _AUDIO_CACHE.get(os.path.join(MEDIA_DIR_STR, "audio", *sub))
+    events_hit = _EVENTS_CACHE.get(os.path.join(MEDIA_DIR_STR, "events", *sub))
+    return (
+        tuple(_file_stamp(tenant_data.data_path(f, teacher_id)) for f in _PAGE_DATA_FILES),
+        audio_hit[0] if audio_hit else None,
+        events_hit[0] if events_hit else None,
+        tuple(asset_version(rel) for rel in _PAGE_ASSETS),
+        date.today(),
+        _TENANT_VERSION.get(teacher_id, 0),
+    )
+
+def cached_page(key, version, gzipped=False):
+    """
+    Cached page bytes for key (teacher_id, role, student_id, parent_id) at version, or None.
+    With gzipped=True the gzip-compressed body is returned, compressed once per cached page.
+    """
+    with _PAGE_CACHE_LOCK:
+        hit = _PAGE_CACHE.get(key)
+        if hit is None or hit[0] != version:
+            return None
+        _PAGE_CACHE.move_to_end(key)
+        if not gzipped:
+            return hit[1]
+        if hit[2] is not None:
+            return hit[2]
+    body = gzip.compress(hit[1], 9)
+    with _PAGE_CACHE_LOCK:
+        if _PAGE_CACHE.get(key) is hit:
+            _PAGE_CACHE[key] = (hit[0], hit[1], body)
+    return body
+
+def iter_page_bytes(key, version):
+    """iter_page(*key) encoded as UTF-8, section by section as it renders; cached once complete."""
+    parts = []
+    for section in iter_page(*key, version=version):
+        chunk = section.encode("utf-8")
+        parts.append(chunk)
+        yield chunk
+    page = b"".join(parts)
+    with _PAGE_CACHE_LOCK:
+        _PAGE_CACHE[key] = (version, page, None)
+        _PAGE_CACHE.move_to_end(key)
+        while len(_PAGE_CACHE) > _PAGE_CACHE_MAX:
+            _PAGE_CACHE.popitem(last=False)
 
 def _login_wrapper(inner_html: str, title: str = "Login") -> str:
     """Wrap login content with app styles and layout."""
@@ -1150,11 +1553,175 @@ def _parent_link_error_page() -> str:
     )
 
 
+# The login GET pages only ever render with these messages, so they are built once as bytes
+_LOGIN_PAGE = {False: _login_page("").encode("utf-8"), True: _login_page("Invalid email or password.").encode("utf-8")}
+_STUDENT_LOGIN_PAGE = {False: _student_login_page("").encode("utf-8"), True: _student_login_page("Invalid name or PIN.").encode("utf-8")}
+_SIGNUP_PAGE = _first_teacher_signup_page().encode("utf-8")
+_PARENT_LINK_ERROR_PAGE = _parent_link_error_page().encode("utf-8")
+
+# Teachers are never removed, so once one exists the DB need not be asked again
+_HAS_TEACHER = False
+
+def _has_teacher():
+    """True if at least one teacher account exists."""
+    global _HAS_TEACHER
+    if not _HAS_TEACHER:
+        _HAS_TEACHER = teacher_count() > 0
+    return _HAS_TEACHER
+
+
 # ---------------------------------------------------------------------------
 # HTTP Handler
 # ---------------------------------------------------------------------------
 
+# Assignment id -> list position per tenant. Unlike an identity-keyed cache this still works now that
+# loads return copies: each hit is checked against the list it is used on (the id at that position),
+# and any mismatch rebuilds. It holds no reference to the list itself.
+_ASSIGNMENT_INDEX = {}
+
+def _has_family(families, parent):
+    """Whether any entry in families has this parent name."""
+    return any(p.get("parent") == parent for p in families)
+
+def _find_assignment(teacher_id, assignments, aid):
+    """The first assignment with id aid, or None."""
+    index = _ASSIGNMENT_INDEX.get(teacher_id)
+    pos = index.get(aid) if index is not None else None
+    if pos is None or pos >= len(assignments) or assignments[pos].get("id") != aid:
+        index = {}
+        for i, a in enumerate(assignments):
+            index.setdefault(a.get("id"), i)
+        _ASSIGNMENT_INDEX[teacher_id] = index
+        pos = index.get(aid)
+        if pos is None:
+            return None
+    return assignments[pos]
+
+# Base64 characters decoded per step by _write_b64 (a multiple of 4, so steps split on whole groups)
+_B64_CHUNK = 256 * 1024
+
+def _write_b64(f, b64text):
+    """Decode base64 upload text into binary file f piece by piece instead of holding the whole decoded file."""
+    if any(c in b64text for c in "\r\n \t"):
+        # Whitespace would shift the 4-character groups across chunk edges; decode in one go
+        pieces = (base64.b64decode(b64text),)
+    else:
+        pieces = (base64.b64decode(b64text[i:i + _B64_CHUNK]) for i in range(0, len(b64text), _B64_CHUNK))
+    for piece in pieces:
+        f.write(piece)
+
+def _save_b64_unique(directory, base, ext, b64text):
+    """Decode base64 upload text into a new file base+ext in directory, else base_2+ext, base_3+ext, ...
+
+    Decodes into a sibling temp file first, so invalid base64 (ValueError) leaves nothing behind;
+    os.link then claims the final name atomically, so concurrent uploads never pick the same file.
+    Returns the filename.
+    """
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=base + ".", suffix=".tmp")
+    try:
+        os.fchmod(fd, 0o644)  # mkstemp creates 0600; keep the usual media-file mode
+        with os.fdopen(fd, "wb") as f:
+            _write_b64(f, b64text)
+        filename = base + ext
+        counter = 2
+        while True:
+            try:
+                os.link(tmp, os.path.join(directory, filename))
+                return filename
+            except FileExistsError:
+                filename = f"{base}_{counter}{ext}"
+                counter += 1
+    finally:
+        os.unlink(tmp)
+
+def _practice_date(entry):
+    """Sort key for a practice log entry."""
+    return entry.get("date", "")
+
+def _stat_regular(path):
+    """os.stat(path) if path is a regular file, else None: one syscall instead of exists/is_file/stat."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st if stat.S_ISREG(st.st_mode) else None
+
+# Constant API response bodies, encoded once instead of per response
+_OK_JSON = b'{"ok":true}'
+
+@functools.lru_cache(maxsize=None)
+def _error_json(message):
+    """Encoded {"ok": false, "error": message}; callers only pass literal messages."""
+    return json.dumps({"ok": False, "error": message}, separators=(",", ":")).encode("utf-8")
+
+def _one_qs(query, key):
+    """First value of key in a query string ("" if absent), without building parse_qs's dict."""
+    for pair in query.split("&"):
+        k, _, v = pair.partition("=")
+        if k == key:
+            return unquote_plus(v)
+    return ""
+
+# Characters dropped from a recording's display name when it becomes a filename.
+# \w is exactly str.isalnum() plus "_", so non-ASCII names keep their letters.
+_SAFE_NAME_RE = re.compile(r"[^\w -]+")
+# Same for an uploaded photo's filename, which keeps its dots (extension)
+_SAFE_FILENAME_RE = re.compile(r"[^\w. -]+")
+
+# Single "bytes=START-END" range (either bound may be empty); anything else gets the full file
+_RANGE_RE = re.compile(r"\s*bytes=(\d*)-(\d*)\s*$")
+
+# Read size when streaming a file body without os.sendfile
+_SEND_CHUNK = 256 * 1024
+
+# Content types by file suffix for /static/ (exact) and /media/ (lowercased) responses
+_STATIC_CT = {
+    ".css": "text/css; charset=utf-8",
+    ".js": "application/javascript; charset=utf-8",
+}
+_MEDIA_CT = {
+    '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png',
+    '.gif': 'image/gif', '.webp': 'image/webp',
+    '.mp4': 'video/mp4', '.mov': 'video/quicktime', '.webm': 'video/webm',
+    '.m4a': 'audio/mp4', '.mp3': 'audio/mpeg', '.opus': 'audio/opus',
+    '.wav': 'audio/wav', '.ogg': 'audio/ogg', '.amr': 'audio/amr',
+}
+
 class AppHandler(SimpleHTTPRequestHandler):
+    # HTTP/1.1 so the browser can reuse one connection for the page, its assets and API calls.
+    # Each connection has its own server thread (ThreadingHTTPServer), so an idle kept-alive one
+    # blocks nobody else; it is still dropped after this many seconds to free the thread.
+    protocol_version = "HTTP/1.1"
+    timeout = 10
+
+    def send_response(self, code, message=None):
+        # Responses that never carry a body are delimited without Content-Length
+        self._framed = code < 200 or code in (204, 304)
+        self._status = code
+        super().send_response(code, message)
+
+    def send_header(self, keyword, value):
+        if keyword.lower() in ("content-length", "transfer-encoding"):
+            self._framed = True
+        super().send_header(keyword, value)
+
+    def end_headers(self, body=b""):
+        """Finish the headers; a small in-memory body passed here goes out in the same write."""
+        if not getattr(self, "_framed", True):
+            # No length and no chunking (e.g. the AI event stream): the body ends when the connection closes
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        elif not self.close_connection:
+            self.send_header("Connection", "keep-alive")
+        if self.request_version == "HTTP/0.9":  # no headers at all
+            super().end_headers()
+            if body:
+                self.wfile.write(body)
+            return
+        self._headers_buffer.append(b"\r\n")
+        if body:
+            self._headers_buffer.append(body)
+        self.flush_headers()
 
     def require_session(self, api: bool = False):
         """Return session dict if valid (has teacher_id); else send 401 (api) or 302 to /login and return None."""
@@ -1163,823 +1730,990 @@ class AppHandler(SimpleHTTPRequestHandler):
             if api:
                 self._send_json({"error": "Unauthorized"}, 401)
             else:
-                self.send_response(302)
-                self.send_header("Location", "/login")
-                self.end_headers()
+                self._redirect("/login")
             return None
         return session
 
-    def do_GET(self):
-        parsed = urlparse(self.path)
+    def _load(self, resource, teacher_id):
+        """tenant_data.load_<resource>(teacher_id), read at most once per request."""
+        key = (resource, teacher_id)
+        cache = self._tenant_cache
+        if key not in cache:
+            cache[key] = getattr(tenant_data, "load_" + resource)(teacher_id)
+        return cache[key]
 
-        # Require teacher or student session for dashboard
-        if parsed.path in ("/", "/index.html"):
-            session = self.require_session()
-            if session is None:
-                return
-            role = session.get("role", "teacher")
-            teacher_id = session.get("teacher_id")
-            student_id = session.get("student_id") if role == "student" else None
-            parent_id = session.get("parent_id") if role == "parent" else None
-            if not teacher_id:
-                self.send_response(302)
-                self.send_header("Location", "/login")
-                self.end_headers()
-                return
-            if role == "student" and not student_id:
-                self.send_response(302)
-                self.send_header("Location", "/login/student")
-                self.end_headers()
-                return
-            if role == "parent" and not parent_id:
-                self.send_response(302)
-                self.send_header("Location", "/login")
-                self.end_headers()
-                return
-            html = build_page(teacher_id=teacher_id, role=role, student_id=student_id, parent_id=parent_id)
-            self.send_response(200)
-            self.send_header("Content-Type", "text/html; charset=utf-8")
-            self.send_header("Cache-Control", "no-cache, no-store, must-revalidate")
-            self.send_header("Pragma", "no-cache")
-            self.end_headers()
-            self.wfile.write(html.encode("utf-8"))
-            return
+    def _save(self, resource, teacher_id, data):
+        """tenant_data.save_<resource>(teacher_id, data); later _load calls in this request reuse data."""
+        getattr(tenant_data, "save_" + resource)(teacher_id, data)
+        self._tenant_cache[(resource, teacher_id)] = data
 
-        if parsed.path == "/logout":
-            clear_cookie = f"{SESSION_COOKIE_NAME}=; Path=/; HttpOnly; SameSite=Lax; Max-Age=0"
-            self.send_response(302)
-            self.send_header("Location", "/login")
-            self.send_header("Set-Cookie", clear_cookie)
+    def do_GET(self):
+        if self.path.startswith(("/static/", "/media/")):
+            # Asset and media requests are plain "path?query"; the busiest routes skip urlparse
+            path, _, query = self.path.partition("?")
+            parsed = SplitResult("", "", path, query, "")
+        else:
+            parsed = urlparse(self.path)
+        self._tenant_cache = {}
+        handler = _GET_ROUTES.get(parsed.path)
+        if handler is None:
+            segment, slash, _ = parsed.path[1:].partition("/")
+            if slash:
+                handler = _GET_PREFIX_ROUTES.get(segment)
+        if handler is None:
+            self.send_response(404)
             self.end_headers()
             return
+        with tenant_data.request_scope():
+            handler(self, parsed)
 
-        if parsed.path == "/login/parent":
-            qs = parse_qs(parsed.query)
-            token = (qs.get("token") or [""])[0].strip()
-            result = consume_parent_token(token) if token else None
-            if result is not None:
-                teacher_id, parent_id = result
-                session = create_session("parent", teacher_id=teacher_id, parent_id=parent_id)
-                self.send_response(302)
-                self.send_header("Location", "/")
-                self.send_header("Set-Cookie", session_cookie_header_value(session))
-                self.end_headers()
-                return
-            html = _parent_link_error_page()
-            self.send_response(200)
-            self.send_header("Content-Type", "text/html; charset=utf-8")
-            self.send_header("Cache-Control", "no-cache")
-            self.end_headers()
-            self.wfile.write(html.encode("utf-8"))
+    def do_POST(self):
+        with tenant_data.request_scope():
+            self._do_post()
+
+    def _do_post(self):
+        self._status = None  # set by send_response; the handler instance outlives one kept-alive request
+        parsed = urlparse(self.path)
+        self._tenant_cache = {}
+        content_length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(content_length)
+
+        # Form POSTs (login pages) take the raw body; everything else is a JSON API
+        handler = _POST_FORM_ROUTES.get(parsed.path)
+        if handler is not None:
+            handler(self, parsed, body)
             return
 
-        if parsed.path == "/login/student":
-            err = "Invalid name or PIN." if parse_qs(parsed.query).get("error") else ""
-            html = _student_login_page(err)
-            self.send_response(200)
-            self.send_header("Content-Type", "text/html; charset=utf-8")
-            self.send_header("Cache-Control", "no-cache")
-            self.end_headers()
-            self.wfile.write(html.encode("utf-8"))
+        try:
+            data = orjson.loads(body) if orjson is not None else json.loads(body)
+        except ValueError:  # json.JSONDecodeError / orjson.JSONDecodeError
+            self._send_raw(_error_json("Invalid JSON"), 400)
             return
 
-        if parsed.path == "/login":
-            err = "Invalid email or password." if parse_qs(parsed.query).get("error") else ""
-            if teacher_count() == 0:
-                html = _first_teacher_signup_page()
+        handler = _POST_ROUTES.get(parsed.path)
+        if handler is None:
+            self._send_raw(_error_json("Not found"), 404)
+            return
+        if parsed.path in _POST_READ_ONLY:
+            handler(self, parsed, data)
+            return
+        # JSON APIs load, modify and save whole files: one write request per tenant at a time so
+        # concurrent edits aren't lost, plus the shared-files lock unless the route only touches
+        # that tenant's own files (so different tenants' attendance, events, ... save in parallel)
+        session = get_session(self)
+        teacher_id = session.get("teacher_id") if session else None
+        with _tenant_write_lock(teacher_id):
+            if parsed.path in _POST_TENANT_FILES_ONLY:
+                handler(self, parsed, data)
             else:
-                html = _login_page(err)
-            self.send_response(200)
-            self.send_header("Content-Type", "text/html; charset=utf-8")
-            self.send_header("Cache-Control", "no-cache")
+                with _SHARED_WRITE_LOCK:
+                    handler(self, parsed, data)
+            # The tenant's cached pages and fragments go stale only when a write went through
+            if teacher_id and self._status is not None and self._status < 400:
+                bump_tenant_version(teacher_id)
+
+    # Require teacher or student session for dashboard
+    def _get_index(self, parsed):
+        session = self.require_session()
+        if session is None:
+            return
+        role = session.get("role", "teacher")
+        teacher_id = session.get("teacher_id")
+        student_id = session.get("student_id") if role == "student" else None
+        parent_id = session.get("parent_id") if role == "parent" else None
+        if not teacher_id:
+            self._redirect("/login")
+            return
+        if role == "student" and not student_id:
+            self._redirect("/login/student")
+            return
+        if role == "parent" and not parent_id:
+            self._redirect("/login")
+            return
+        key = (teacher_id, role, student_id, parent_id)
+        version = _page_version(teacher_id)
+        gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+        body = cached_page(key, version, gzipped=gzipped)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache, no-store, must-revalidate")
+        self.send_header("Pragma", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if body is not None:
+            if gzipped:
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers(body)
+            return
+        if self.request_version != "HTTP/1.1":
+            # Chunked encoding is HTTP/1.1 only; end_headers makes this a close-delimited body instead
             self.end_headers()
-            self.wfile.write(html.encode("utf-8"))
+            for chunk in iter_page_bytes(key, version):
+                self.wfile.write(chunk)
+            return
+        # Rendered pages stream before their length is known, so send them chunked
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in iter_page_bytes(key, version):
+            if chunk:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _get_logout(self, parsed):
+        clear_cookie = f"{SESSION_COOKIE_NAME}=; Path=/; HttpOnly; SameSite=Lax; Max-Age=0"
+        self._redirect("/login", clear_cookie)
+
+    def _get_login_parent(self, parsed):
+        token = _one_qs(parsed.query, "token").strip()
+        result = consume_parent_token(token) if token else None
+        if result is not None:
+            teacher_id, parent_id = result
+            session = create_session("parent", teacher_id=teacher_id, parent_id=parent_id)
+            self._redirect("/", session_cookie_header_value(session))
             return
+        self._send_html(_PARENT_LINK_ERROR_PAGE)
 
-        # Serve static files (CSS, JS) from project folder (not current working directory)
-        if parsed.path.startswith("/static/"):
-            try:
-                rel = parsed.path.lstrip("/")
-                file_path = BASE_DIR / rel
-                if file_path.exists() and file_path.is_file():
-                    self.send_response(200)
-                    # Set content type based on file extension
-                    if file_path.suffix == ".css":
-                        self.send_header("Content-Type", "text/css; charset=utf-8")
-                        self.send_header("Cache-Control", "no-cache, must-revalidate")
-                    elif file_path.suffix == ".js":
-                        self.send_header("Content-Type", "application/javascript; charset=utf-8")
-                        self.send_header("Cache-Control", "no-cache, must-revalidate")
-                    else:
-                        self.send_header("Content-Type", "application/octet-stream")
-                    self.end_headers()
-                    self.wfile.write(file_path.read_bytes())
-                    return
-                else:
-                    self.send_error(404, "File not found")
-                    return
-            except Exception as e:
-                self.send_error(500, f"Error serving static file: {str(e)}")
-                return
+    def _get_login_student(self, parsed):
+        self._send_html(_STUDENT_LOGIN_PAGE[bool(_one_qs(parsed.query, "error"))])
 
-        if parsed.path == "/api/categories":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            self._send_json(tenant_data.load_audio_categories(session["teacher_id"]))
+    def _get_login(self, parsed):
+        if not _has_teacher():
+            self._send_html(_SIGNUP_PAGE)
             return
+        self._send_html(_LOGIN_PAGE[bool(_one_qs(parsed.query, "error"))])
 
-        if parsed.path == "/api/attendance":
-            session = self.require_session(api=True)
-            if session is None:
+    # Serve static files (CSS, JS) from project folder (not current working directory)
+    def _get_static(self, parsed):
+        try:
+            rel = parsed.path.lstrip("/")
+            file_path = BASE_DIR / rel
+            st = None if ".." in Path(rel).parts else _stat_regular(file_path)
+            if st is None:
+                self.send_error(404, "File not found")
+                return
+            # Weak validator from mtime + size; ?v= URLs change whenever the file does, so they never go stale
+            etag = f'W/"{st.st_mtime_ns:x}-{st.st_size:x}"'
+            if _one_qs(parsed.query, "v"):
+                cache_control = "public, max-age=31536000, immutable"
+            else:
+                cache_control = "no-cache, must-revalidate"
+            if_none_match = self.headers.get("If-None-Match", "")
+            if if_none_match and etag in (t.strip() for t in if_none_match.split(",")):
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", cache_control)
+                self.end_headers()
                 return
-            self._send_json(tenant_data.load_attendance(session["teacher_id"]))
+            self.send_response(200)
+            self.send_header("Content-Type", _STATIC_CT.get(file_path.suffix, "application/octet-stream"))
+            self.send_header("Content-Length", str(st.st_size))
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            self._send_file(file_path, 0, st.st_size)
+            return
+        except Exception as e:
+            self.send_error(500, f"Error serving static file: {str(e)}")
             return
 
-        if parsed.path == "/api/assignments":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            self._send_json(tenant_data.load_assignments(session["teacher_id"]))
+    def _get_categories(self, parsed):
+        session = self.require_session(api=True)
+        if session is None:
             return
+        self._send_json(self._load("audio_categories", session["teacher_id"]))
 
-        if parsed.path == "/api/events/scheduled":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            self._send_json(tenant_data.load_scheduled_events(session["teacher_id"]))
+    def _get_attendance(self, parsed):
+        session = self.require_session(api=True)
+        if session is None:
             return
+        self._send_json(self._load("attendance", session["teacher_id"]))
 
-        if parsed.path == "/api/practice-log":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            self._send_json(tenant_data.load_practice_log(session["teacher_id"]))
+    def _get_assignments(self, parsed):
+        session = self.require_session(api=True)
+        if session is None:
             return
+        self._send_json(self._load("assignments", session["teacher_id"]))
 
-        if parsed.path == "/api/ai-status":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            self._send_json({"available": AI_AVAILABLE, "model": AI_MODEL if AI_AVAILABLE else None})
+    def _get_events_scheduled(self, parsed):
+        session = self.require_session(api=True)
+        if session is None:
             return
+        self._send_json(self._load("scheduled_events", session["teacher_id"]))
 
-        if parsed.path == "/api/parent-profiles":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            profiles = tenant_data.load_parent_profiles(session["teacher_id"])
-            if session.get("role") == "parent":
-                parent_id = session.get("parent_id")
-                profiles = {parent_id: profiles.get(parent_id, {"children": [], "payments": []})} if parent_id else {}
-            self._send_json(profiles)
+    def _get_practice_log(self, parsed):
+        session = self.require_session(api=True)
+        if session is None:
             return
+        self._send_json(self._load("practice_log", session["teacher_id"]))
 
-        if parsed.path == "/api/parent-names":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            self._send_json(get_parent_names(session["teacher_id"]))
+    def _get_ai_status(self, parsed):
+        session = self.require_session(api=True)
+        if session is None:
             return
+        self._send_json({"available": AI_AVAILABLE, "model": AI_MODEL if AI_AVAILABLE else None})
 
-        if parsed.path == "/api/parent-login-link":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            qs = parse_qs(parsed.query)
-            parent_id = (qs.get("parent_id") or [""])[0].strip()
-            if not parent_id:
-                self._send_json({"error": "Missing parent_id"}, 400)
-                return
-            people = tenant_data.load_people(session["teacher_id"])
-            families = people.get("families", [])
-            if not any(p.get("parent") == parent_id for p in families):
-                self._send_json({"error": "Parent not found"}, 404)
-                return
-            token = create_parent_token(session["teacher_id"], parent_id)
-            host = self.headers.get("Host", "localhost:8000")
-            base_url = f"http://{host}"
-            url = f"{base_url}/login/parent?token={token}"
-            self._send_json({"url": url})
+    def _get_parent_profiles(self, parsed):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        profiles = self._load("parent_profiles", session["teacher_id"])
+        if session.get("role") == "parent":
+            parent_id = session.get("parent_id")
+            profiles = {parent_id: profiles.get(parent_id, {"children": [], "payments": []})} if parent_id else {}
+        self._send_json(profiles)
+
+    def _get_parent_names(self, parsed):
+        session = self.require_session(api=True)
+        if session is None:
             return
+        self._send_json(get_parent_names(session["teacher_id"]))
 
-        # Serve media files (resolve under MEDIA_DIR so disk path works on Render)
-        if parsed.path.startswith("/media/"):
-            rel = parsed.path[7:].lstrip("/")  # path after "/media/"
-            if not rel or ".." in rel:
+    def _get_parent_login_link(self, parsed):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        parent_id = _one_qs(parsed.query, "parent_id").strip()
+        if not parent_id:
+            self._send_json({"error": "Missing parent_id"}, 400)
+            return
+        people = self._load("people", session["teacher_id"])
+        families = people.get("families", [])
+        if not _has_family(families, parent_id):
+            self._send_json({"error": "Parent not found"}, 404)
+            return
+        token = create_parent_token(session["teacher_id"], parent_id)
+        host = self.headers.get("Host", "localhost:8000")
+        base_url = f"http://{host}"
+        url = f"{base_url}/login/parent?token={token}"
+        self._send_json({"url": url})
+
+    # Serve media files (resolve under MEDIA_DIR so disk path works on Render)
+    def _get_media(self, parsed):
+        rel = parsed.path[7:].lstrip("/")  # path after "/media/"
+        if not rel or ".." in rel:
+            self.send_response(403)
+            self.end_headers()
+            return
+        # Cheap lexical check first, so obvious escapes are refused without touching the disk
+        file_path = os.path.normpath(_MEDIA_ROOT_PREFIX + rel)
+        if not file_path.startswith(_MEDIA_ROOT_PREFIX):
+            self.send_response(403)
+            self.end_headers()
+            return
+        try:
+            # A symlink inside the media dir could still point outside it: check where it resolves
+            file_path = os.path.realpath(file_path)
+            if not file_path.startswith(_MEDIA_REAL_PREFIX):
                 self.send_response(403)
                 self.end_headers()
                 return
-            file_path = (MEDIA_DIR / rel).resolve()
-            try:
-                med = MEDIA_DIR.resolve()
-                if not str(file_path).startswith(str(med)):
-                    self.send_response(403)
+            st = _stat_regular(file_path)
+        except ValueError:  # e.g. an embedded NUL byte
+            self.send_response(400)
+            self.end_headers()
+            return
+
+        if st is not None:
+            ct = _MEDIA_CT.get(os.path.splitext(file_path)[1].lower(), "application/octet-stream")
+            file_size = st.st_size
+
+            # --- Range request support (required for iOS Safari audio) ---
+            range_match = _RANGE_RE.match(self.headers.get("Range") or "")
+            if range_match and (range_match[1] or range_match[2]):
+                if range_match[1]:
+                    start = int(range_match[1])
+                    end = min(int(range_match[2]), file_size - 1) if range_match[2] else file_size - 1
+                else:  # "bytes=-N": the last N bytes
+                    start = max(file_size - int(range_match[2]), 0)
+                    end = file_size - 1
+                length = end - start + 1
+                if length > 0:  # otherwise fall through to the full response
+                    self.send_response(206)
+                    self.send_header("Content-Type", ct)
+                    self.send_header("Content-Length", str(length))
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{file_size}")
+                    self.send_header("Accept-Ranges", "bytes")
+                    self.send_header("Cache-Control", "public, max-age=3600")
                     self.end_headers()
+
+                    self._send_file(file_path, start, length)
                     return
-            except (ValueError, OSError):
-                self.send_response(400)
-                self.end_headers()
-                return
 
-            if file_path.exists() and file_path.is_file():
-                ext = file_path.suffix.lower()
-                ct = {
-                    '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png',
-                    '.gif': 'image/gif', '.webp': 'image/webp',
-                    '.mp4': 'video/mp4', '.mov': 'video/quicktime', '.webm': 'video/webm',
-                    '.m4a': 'audio/mp4', '.mp3': 'audio/mpeg', '.opus': 'audio/opus',
-                    '.wav': 'audio/wav', '.ogg': 'audio/ogg', '.amr': 'audio/amr',
-                }.get(ext, "application/octet-stream")
-                file_size = file_path.stat().st_size
-
-                # --- Range request support (required for iOS Safari audio) ---
-                range_header = self.headers.get("Range")
-                if range_header:
-                    try:
-                        # Parse "bytes=START-END"
-                        range_spec = range_header.replace("bytes=", "").strip()
-                        parts = range_spec.split("-")
-                        start = int(parts[0]) if parts[0] else 0
-                        end = int(parts[1]) if parts[1] else file_size - 1
-                        end = min(end, file_size - 1)
-                        length = end - start + 1
-
-                        self.send_response(206)
-                        self.send_header("Content-Type", ct)
-                        self.send_header("Content-Length", str(length))
-                        self.send_header("Content-Range", f"bytes {start}-{end}/{file_size}")
-                        self.send_header("Accept-Ranges", "bytes")
-                        self.send_header("Cache-Control", "public, max-age=3600")
-                        self.end_headers()
-
-                        with open(file_path, "rb") as f:
-                            f.seek(start)
-                            self.wfile.write(f.read(length))
-                        return
-                    except (ValueError, IndexError):
-                        pass  # Fall through to normal response
-
-                # --- Normal full-file response ---
-                self.send_response(200)
-                self.send_header("Content-Type", ct)
-                self.send_header("Content-Length", str(file_size))
-                self.send_header("Accept-Ranges", "bytes")
-                self.send_header("Cache-Control", "public, max-age=3600")
-                self.end_headers()
-                self.wfile.write(file_path.read_bytes())
-                return
+            # --- Normal full-file response ---
+            self.send_response(200)
+            self.send_header("Content-Type", ct)
+            self.send_header("Content-Length", str(file_size))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Cache-Control", "public, max-age=3600")
+            self.end_headers()
+            self._send_file(file_path, 0, file_size)
+            return
 
         self.send_response(404)
         self.end_headers()
 
-    def do_POST(self):
-        parsed = urlparse(self.path)
-        content_length = int(self.headers.get('Content-Length', 0))
-        body = self.rfile.read(content_length)
-
-        # --- Login (form POST) ---
-        if parsed.path == "/login":
-            form = parse_qs(body.decode("utf-8", errors="replace"))
-            email = (form.get("email") or [""])[0]
-            password = (form.get("password") or [""])[0]
-            teacher_id = verify_teacher(email, password)
-            if teacher_id is not None:
-                session = create_session("teacher", teacher_id=teacher_id)
-                self.send_response(302)
-                self.send_header("Location", "/")
-                self.send_header("Set-Cookie", session_cookie_header_value(session))
-                self.end_headers()
-                return
-            self.send_response(302)
-            self.send_header("Location", "/login?error=1")
-            self.end_headers()
-            return
-
-        # --- First-teacher signup (form POST) ---
-        if parsed.path == "/signup":
-            form = parse_qs(body.decode("utf-8", errors="replace"))
-            email = (form.get("email") or [""])[0].strip().lower()
-            password = (form.get("password") or [""])[0]
-            display_name = (form.get("display_name") or [""])[0].strip() or ""
-            if not email or not password:
-                html = _first_teacher_signup_page("Email and password are required.")
-                self.send_response(200)
-                self.send_header("Content-Type", "text/html; charset=utf-8")
-                self.end_headers()
-                self.wfile.write(html.encode("utf-8"))
-                return
-            if len(password) < 6:
-                html = _first_teacher_signup_page("Password must be at least 6 characters.")
-                self.send_response(200)
-                self.send_header("Content-Type", "text/html; charset=utf-8")
-                self.end_headers()
-                self.wfile.write(html.encode("utf-8"))
-                return
-            if teacher_count() != 0:
-                self.send_response(302)
-                self.send_header("Location", "/login")
-                self.end_headers()
-                return
-            password_hash = hashlib.sha256(password.encode("utf-8")).hexdigest()
-            try:
-                with get_connection() as conn:
-                    conn.execute(
-                        "INSERT INTO teachers (email, password_hash, display_name) VALUES (?, ?, ?)",
-                        (email, password_hash, display_name),
-                    )
-                    conn.commit()
-                    teacher_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
-            except Exception:
-                html = _first_teacher_signup_page("That email may already be in use. Try logging in.")
-                self.send_response(200)
-                self.send_header("Content-Type", "text/html; charset=utf-8")
-                self.end_headers()
-                self.wfile.write(html.encode("utf-8"))
-                return
+    # --- Login (form POST) ---
+    def _post_login(self, parsed, body):
+        form = parse_qs(body.decode("utf-8", errors="replace"))
+        email = (form.get("email") or [""])[0]
+        password = (form.get("password") or [""])[0]
+        teacher_id = verify_teacher(email, password)
+        if teacher_id is not None:
             session = create_session("teacher", teacher_id=teacher_id)
-            self.send_response(302)
-            self.send_header("Location", "/")
-            self.send_header("Set-Cookie", session_cookie_header_value(session))
-            self.end_headers()
+            self._redirect("/", session_cookie_header_value(session))
             return
-
-        if parsed.path == "/login/student":
-            form = parse_qs(body.decode("utf-8", errors="replace"))
-            pin = (form.get("pin") or [""])[0].strip()
-            student_name = (form.get("student_name") or [""])[0].strip()
-            resolved = resolve_student_by_pin(pin)
-            if resolved is not None:
-                teacher_id, student_id = resolved
-                if student_id.strip().lower() == student_name.strip().lower():
-                    session = create_session("student", teacher_id=teacher_id, student_id=student_id)
-                    self.send_response(302)
-                    self.send_header("Location", "/")
-                    self.send_header("Set-Cookie", session_cookie_header_value(session))
-                    self.end_headers()
-                    return
-            self.send_response(302)
-            self.send_header("Location", "/login/student?error=1")
-            self.end_headers()
+        self._redirect("/login?error=1")
+
+    # --- First-teacher signup (form POST) ---
+    def _post_signup(self, parsed, body):
+        form = parse_qs(body.decode("utf-8", errors="replace"))
+        email = (form.get("email") or [""])[0].strip().lower()
+        password = (form.get("password") or [""])[0]
+        display_name = (form.get("display_name") or [""])[0].strip() or ""
+        if not email or not password:
+            html = _first_teacher_signup_page("Email and password are required.")
+            self._send_html(html.encode("utf-8"))
             return
-
+        if len(password) < 6:
+            html = _first_teacher_signup_page("Password must be at least 6 characters.")
+            self._send_html(html.encode("utf-8"))
+            return
+        if _has_teacher():
+            self._redirect("/login")
+            return
+        password_hash = hash_password(password)
         try:
-            data = json.loads(body)
-        except json.JSONDecodeError:
-            self._send_json({"ok": False, "error": "Invalid JSON"}, 400)
+            with get_connection() as conn:
+                conn.execute(
+                    "INSERT INTO teachers (email, password_hash, display_name) VALUES (?, ?, ?)",
+                    (email, password_hash, display_name),
+                )
+                conn.commit()
+                teacher_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        except Exception:
+            html = _first_teacher_signup_page("That email may already be in use. Try logging in.")
+            self._send_html(html.encode("utf-8"))
+            return
+        session = create_session("teacher", teacher_id=teacher_id)
+        self._redirect("/", session_cookie_header_value(session))
+
+    def _post_login_student(self, parsed, body):
+        form = parse_qs(body.decode("utf-8", errors="replace"))
+        pin = (form.get("pin") or [""])[0].strip()
+        student_name = (form.get("student_name") or [""])[0].strip()
+        resolved = resolve_student_by_pin(pin)
+        if resolved is not None:
+            teacher_id, student_id = resolved
+            if student_id.strip().lower() == student_name.strip().lower():
+                session = create_session("student", teacher_id=teacher_id, student_id=student_id)
+                self._redirect("/", session_cookie_header_value(session))
+                return
+        self._redirect("/login/student?error=1")
+
+    # --- Music editing endpoints ---
+    def _post_update_file(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
             return
+        teacher_id = session["teacher_id"]
+        categories = self._load("audio_categories", teacher_id)
+        filename = data.get("filename")
+        updates = data.get("updates", {})
+        if not filename:
+            self._send_raw(_error_json("Missing filename"), 400)
+            return
+        if filename not in categories:
+            categories[filename] = {"raga": "Unknown", "composition_type": "Unknown", "paltaas": False, "taal": "Unknown", "explanation": "Manually categorized"}
+        categories[filename].update(updates)
+        self._save("audio_categories", teacher_id, categories)
+        self._send_raw(_OK_JSON)
+
+    def _post_restore(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        self._save("audio_categories", session["teacher_id"], data)
+        self._send_json({"ok": True, "restored": len(data)})
 
-        # --- Music editing endpoints ---
-        if parsed.path == "/api/update-file":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            teacher_id = session["teacher_id"]
-            categories = tenant_data.load_audio_categories(teacher_id)
-            filename = data.get("filename")
-            updates = data.get("updates", {})
-            if not filename:
-                self._send_json({"ok": False, "error": "Missing filename"}, 400)
-                return
-            if filename not in categories:
-                categories[filename] = {"raga": "Unknown", "composition_type": "Unknown", "paltaas": False, "taal": "Unknown", "explanation": "Manually categorized"}
-            categories[filename].update(updates)
-            tenant_data.save_audio_categories(teacher_id, categories)
-            self._send_json({"ok": True})
-
-        elif parsed.path == "/api/restore":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            tenant_data.save_audio_categories(session["teacher_id"], data)
-            self._send_json({"ok": True, "restored": len(data)})
+    def _post_rename_raga(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        teacher_id = session["teacher_id"]
+        categories = self._load("audio_categories", teacher_id)
+        old_name, new_name = data.get("old_name"), data.get("new_name")
+        if not old_name or not new_name:
+            self._send_raw(_error_json("Missing names"), 400)
+            return
+        count = 0
+        for info in categories.values():
+            if info.get("raga") == old_name:
+                info["raga"] = new_name
+                count += 1
+        self._save("audio_categories", teacher_id, categories)
+        self._send_json({"ok": True, "updated": count})
+
+    # --- Recording upload ---
+    def _post_upload_recording(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        teacher_id = session["teacher_id"]
+        name = data.get("name", "Recording").strip() or "Recording"
+        ext = data.get("extension", ".webm")
+        safe_name = _SAFE_NAME_RE.sub("", name).strip().replace(' ', '-')
+        today = datetime.now().strftime("%Y-%m-%d")
+        audio_dir = MEDIA_DIR / "audio" / str(teacher_id)
+        audio_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            filename = _save_b64_unique(audio_dir, f"{today}_{safe_name}", ext, data.get("audio_data", ""))
+        except ValueError:  # binascii.Error
+            self._send_raw(_error_json("Invalid audio data"), 400)
+            return
+        self._send_json({"ok": True, "filename": filename})
 
-        elif parsed.path == "/api/rename-raga":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            teacher_id = session["teacher_id"]
-            categories = tenant_data.load_audio_categories(teacher_id)
-            old_name, new_name = data.get("old_name"), data.get("new_name")
-            if not old_name or not new_name:
-                self._send_json({"ok": False, "error": "Missing names"}, 400)
-                return
-            count = 0
-            for info in categories.values():
-                if info.get("raga") == old_name:
-                    info["raga"] = new_name
-                    count += 1
-            tenant_data.save_audio_categories(teacher_id, categories)
-            self._send_json({"ok": True, "updated": count})
-
-        # --- Recording upload ---
-        elif parsed.path == "/api/upload-recording":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            teacher_id = session["teacher_id"]
-            name = data.get("name", "Recording").strip() or "Recording"
-            audio_data = base64.b64decode(data.get("audio_data", ""))
-            ext = data.get("extension", ".webm")
-            safe_name = "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).strip().replace(' ', '-')
-            today = datetime.now().strftime("%Y-%m-%d")
-            filename = f"{today}_{safe_name}{ext}"
-            audio_dir = MEDIA_DIR / "audio" / str(teacher_id)
-            audio_dir.mkdir(parents=True, exist_ok=True)
-            filepath = audio_dir / filename
-            counter = 2
-            while filepath.exists():
-                filename = f"{today}_{safe_name}_{counter}{ext}"
-                filepath = audio_dir / filename
-                counter += 1
-            filepath.write_bytes(audio_data)
-            self._send_json({"ok": True, "filename": filename})
+    # --- Audio file upload (from device) ---
+    def _post_upload_audio_file(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        teacher_id = session["teacher_id"]
+        # Only the name part of the client's filename; never a path outside the tenant's audio dir
+        filename = os.path.basename(data.get("filename", "")) or "recording.mp3"
+        audio_dir = MEDIA_DIR / "audio" / str(teacher_id)
+        audio_dir.mkdir(parents=True, exist_ok=True)
+        base, dot, ext = filename.rpartition('.')
+        if not dot:
+            base, ext = filename, ""
+        try:
+            filename = _save_b64_unique(audio_dir, base, dot + ext, data.get("data", ""))
+        except ValueError:  # binascii.Error
+            self._send_raw(_error_json("Invalid audio data"), 400)
+            return
+        self._send_json({"ok": True, "filename": filename})
 
-        # --- Audio file upload (from device) ---
-        elif parsed.path == "/api/upload-audio-file":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            teacher_id = session["teacher_id"]
-            filename = data.get("filename", "recording.mp3")
-            audio_data = base64.b64decode(data.get("data", ""))
-            audio_dir = MEDIA_DIR / "audio" / str(teacher_id)
-            audio_dir.mkdir(parents=True, exist_ok=True)
-            filepath = audio_dir / filename
-            counter = 2
-            base, ext = filename.rsplit('.', 1) if '.' in filename else (filename, 'mp3')
-            while filepath.exists():
-                filepath = audio_dir / f"{base}_{counter}.{ext}"
-                counter += 1
-            filepath.write_bytes(audio_data)
-            self._send_json({"ok": True, "filename": filepath.name})
+    # --- Attendance ---
+    def _post_attendance_save(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        teacher_id = session["teacher_id"]
+        date_str = data.get("date")
+        students = data.get("students", [])
+        notes = data.get("notes", "")
+        if not date_str:
+            self._send_raw(_error_json("Missing date"), 400)
+            return
+        # Appends one line to the teacher's attendance log rather than rewriting every date
+        tenant_data.record_attendance(teacher_id, date_str, {"students": students, "notes": notes})
+        self._tenant_cache.pop(("attendance", teacher_id), None)
+        self._send_json({"ok": True, "date": date_str, "count": len(students)})
+
+    # --- Assignments ---
+    def _post_assignments_create(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        if session.get("role") != "teacher":
+            self._send_raw(_error_json("Forbidden"), 403)
+            return
+        teacher_id = session["teacher_id"]
+        audio_file = data.get("audio_file")
+        assigned_to = data.get("assigned_to", [])
+        notes = data.get("notes", "")
+        due_date = data.get("due_date", "")
+        if not audio_file:
+            self._send_raw(_error_json("Missing audio_file"), 400)
+            return
+        assignment = {
+            "audio_file": audio_file,
+            "assigned_to": assigned_to,
+            "notes": notes,
+            "due_date": due_date,
+            "created": datetime.now().isoformat(),
+            "status": "active"
+        }
+        pos = tenant_data.add_assignment(teacher_id, assignment)
+        index = _ASSIGNMENT_INDEX.get(teacher_id)
+        if index is not None:
+            index.setdefault(assignment["id"], pos)
+        self._send_json({"ok": True, "id": assignment["id"]})
+
+    def _post_assignments_update(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        if session.get("role") != "teacher":
+            self._send_raw(_error_json("Forbidden"), 403)
+            return
+        teacher_id = session["teacher_id"]
+        assignments = self._load("assignments", teacher_id)
+        aid = data.get("id")
+        if not aid:
+            self._send_raw(_error_json("Missing id"), 400)
+            return
+        found = _find_assignment(teacher_id, assignments, aid)
+        if not found:
+            self._send_raw(_error_json("Assignment not found"), 404)
+            return
+        for key in ("audio_file", "assigned_to", "notes", "due_date", "status"):
+            if key in data:
+                found[key] = data[key] if key != "assigned_to" else (data[key] if isinstance(data[key], list) else [])
+        self._save("assignments", teacher_id, assignments)
+        self._send_raw(_OK_JSON)
+
+    def _post_assignments_remove(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        if session.get("role") != "teacher":
+            self._send_raw(_error_json("Forbidden"), 403)
+            return
+        teacher_id = session["teacher_id"]
+        assignments = self._load("assignments", teacher_id)
+        aid = data.get("id")
+        if not aid:
+            self._send_raw(_error_json("Missing id"), 400)
+            return
+        found = _find_assignment(teacher_id, assignments, aid)
+        if not found:
+            self._send_raw(_error_json("Assignment not found"), 404)
+            return
+        found["status"] = "removed"
+        self._save("assignments", teacher_id, assignments)
+        self._send_raw(_OK_JSON)
+
+    # --- Events ---
+    def _post_events_create(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        teacher_id = session["teacher_id"]
+        events = self._load("scheduled_events", teacher_id)
+        name = data.get("name", "").strip()
+        event_date = data.get("date", "")
+        time = data.get("time", "")
+        location = data.get("location", "")
+        description = data.get("description", "")
+        if not name or not event_date:
+            self._send_raw(_error_json("Missing name or date"), 400)
+            return
+        event = {
+            "id": f"e{len(events)+1}_{datetime.now().strftime('%Y%m%d%H%M%S')}",
+            "name": name,
+            "date": event_date,
+            "time": time,
+            "location": location,
+            "description": description,
+            "created": datetime.now().isoformat(),
+            "status": "upcoming"
+        }
+        events.append(event)
+        # Keep the stored list in date order so the page render's sort is a linear pass
+        events.sort(key=_scheduled_date)
+        self._save("scheduled_events", teacher_id, events)
+        self._send_json({"ok": True, "id": event["id"]})
+
+    # --- Practice log ---
+    def _post_practice_log_mark(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        teacher_id = session["teacher_id"]
+        log = self._load("practice_log", teacher_id)
+        student = data.get("student", "")
+        date_str = data.get("date", "")
+        duration = data.get("duration", 0)
+        items = data.get("items", "")
+        if not student or not date_str:
+            self._send_raw(_error_json("Missing student or date"), 400)
+            return
+        if student not in log:
+            log[student] = []
+        # Entries are kept in date order, so a new date goes straight into its slot
+        if not any(isinstance(e, dict) and e.get("date") == date_str for e in log[student]):
+            bisect.insort(log[student], {"date": date_str, "duration": duration, "items": items}, key=_practice_date)
+            self._save("practice_log", teacher_id, log)
+        self._send_json({"ok": True, "student": student, "date": date_str, "total_days": len(log[student])})
+
+    def _post_practice_log_unmark(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        teacher_id = session["teacher_id"]
+        log = self._load("practice_log", teacher_id)
+        student = data.get("student", "")
+        date_str = data.get("date", "")
+        if student in log:
+            log[student] = [e for e in log[student] if not (isinstance(e, dict) and e.get("date") == date_str)]
+            self._save("practice_log", teacher_id, log)
+        self._send_raw(_OK_JSON)
+
+    # --- Parent profile ---
+    def _post_parent_profile_save(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        if session.get("role") == "parent" and data.get("parent", "") != session.get("parent_id"):
+            self._send_raw(_error_json("Forbidden"), 403)
+            return
+        teacher_id = session["teacher_id"]
+        profiles = self._load("parent_profiles", teacher_id)
+        parent_name = data.get("parent", "")
+        children = data.get("children", [])
+        if not parent_name:
+            self._send_raw(_error_json("Missing parent name"), 400)
+            return
+        if parent_name not in profiles:
+            profiles[parent_name] = {"children": [], "payments": []}
+        profiles[parent_name]["children"] = children
+        self._save("parent_profiles", teacher_id, profiles)
+        self._send_raw(_OK_JSON)
+
+    def _post_parent_profile_mark_payment(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        if session.get("role") == "parent" and data.get("parent", "") != session.get("parent_id"):
+            self._send_raw(_error_json("Forbidden"), 403)
+            return
+        teacher_id = session["teacher_id"]
+        profiles = self._load("parent_profiles", teacher_id)
+        parent_name = data.get("parent", "")
+        amount = data.get("amount", "")
+        note = data.get("note", "")
+        if not parent_name:
+            self._send_raw(_error_json("Missing parent name"), 400)
+            return
+        if parent_name not in profiles:
+            profiles[parent_name] = {"children": [], "payments": []}
+        payment = {
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "amount": amount,
+            "note": note,
+            "timestamp": datetime.now().isoformat()
+        }
+        profiles[parent_name].setdefault("payments", []).append(payment)
+        self._save("parent_profiles", teacher_id, profiles)
+        self._send_json({"ok": True, "payment": payment})
+
+    # --- Add student ---
+    def _post_students_add(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        name = data.get("name", "").strip()
+        if not name:
+            self._send_raw(_error_json("Missing name"), 400)
+            return
+        added = add_student(name, session["teacher_id"])
+        self._send_json({"ok": True, "added": added, "name": name})
 
-        # --- Attendance ---
-        elif parsed.path == "/api/attendance/save":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            teacher_id = session["teacher_id"]
-            attendance = tenant_data.load_attendance(teacher_id)
-            date_str = data.get("date")
-            students = data.get("students", [])
-            notes = data.get("notes", "")
-            if not date_str:
-                self._send_json({"ok": False, "error": "Missing date"}, 400)
-                return
-            attendance[date_str] = {"students": students, "notes": notes}
-            tenant_data.save_attendance(teacher_id, attendance)
-            self._send_json({"ok": True, "date": date_str, "count": len(students)})
-
-        # --- Assignments ---
-        elif parsed.path == "/api/assignments/create":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            if session.get("role") != "teacher":
-                self._send_json({"ok": False, "error": "Forbidden"}, 403)
-                return
-            teacher_id = session["teacher_id"]
-            assignments = tenant_data.load_assignments(teacher_id)
-            audio_file = data.get("audio_file")
-            assigned_to = data.get("assigned_to", [])
-            notes = data.get("notes", "")
-            due_date = data.get("due_date", "")
-            if not audio_file:
-                self._send_json({"ok": False, "error": "Missing audio_file"}, 400)
-                return
-            assignment = {
-                "id": f"a{len(assignments)+1}_{datetime.now().strftime('%Y%m%d%H%M%S')}",
-                "audio_file": audio_file,
-                "assigned_to": assigned_to,
-                "notes": notes,
-                "due_date": due_date,
-                "created": datetime.now().isoformat(),
-                "status": "active"
-            }
-            assignments.append(assignment)
-            tenant_data.save_assignments(teacher_id, assignments)
-            self._send_json({"ok": True, "id": assignment["id"]})
-
-        elif parsed.path == "/api/assignments/update":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            if session.get("role") != "teacher":
-                self._send_json({"ok": False, "error": "Forbidden"}, 403)
-                return
-            teacher_id = session["teacher_id"]
-            assignments = tenant_data.load_assignments(teacher_id)
-            aid = data.get("id")
-            if not aid:
-                self._send_json({"ok": False, "error": "Missing id"}, 400)
-                return
-            found = next((a for a in assignments if a.get("id") == aid), None)
-            if not found:
-                self._send_json({"ok": False, "error": "Assignment not found"}, 404)
-                return
-            for key in ("audio_file", "assigned_to", "notes", "due_date", "status"):
-                if key in data:
-                    found[key] = data[key] if key != "assigned_to" else (data[key] if isinstance(data[key], list) else [])
-            tenant_data.save_assignments(teacher_id, assignments)
-            self._send_json({"ok": True})
-
-        elif parsed.path == "/api/assignments/remove":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            if session.get("role") != "teacher":
-                self._send_json({"ok": False, "error": "Forbidden"}, 403)
-                return
-            teacher_id = session["teacher_id"]
-            assignments = tenant_data.load_assignments(teacher_id)
-            aid = data.get("id")
-            if not aid:
-                self._send_json({"ok": False, "error": "Missing id"}, 400)
-                return
-            found = next((a for a in assignments if a.get("id") == aid), None)
-            if not found:
-                self._send_json({"ok": False, "error": "Assignment not found"}, 404)
-                return
-            found["status"] = "removed"
-            tenant_data.save_assignments(teacher_id, assignments)
-            self._send_json({"ok": True})
-
-        # --- Events ---
-        elif parsed.path == "/api/events/create":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            teacher_id = session["teacher_id"]
-            events = tenant_data.load_scheduled_events(teacher_id)
-            name = data.get("name", "").strip()
-            event_date = data.get("date", "")
-            time = data.get("time", "")
-            location = data.get("location", "")
-            description = data.get("description", "")
-            if not name or not event_date:
-                self._send_json({"ok": False, "error": "Missing name or date"}, 400)
-                return
-            event = {
-                "id": f"e{len(events)+1}_{datetime.now().strftime('%Y%m%d%H%M%S')}",
-                "name": name,
-                "date": event_date,
-                "time": time,
-                "location": location,
-                "description": description,
-                "created": datetime.now().isoformat(),
-                "status": "upcoming"
-            }
-            events.append(event)
-            tenant_data.save_scheduled_events(teacher_id, events)
-            self._send_json({"ok": True, "id": event["id"]})
-
-        # --- Practice log ---
-        elif parsed.path == "/api/practice-log/mark":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            teacher_id = session["teacher_id"]
-            log = tenant_data.load_practice_log(teacher_id)
-            student = data.get("student", "")
-            date_str = data.get("date", "")
-            duration = data.get("duration", 0)
-            items = data.get("items", "")
-            if not student or not date_str:
-                self._send_json({"ok": False, "error": "Missing student or date"}, 400)
-                return
-            if student not in log:
-                log[student] = []
-            # Check if already logged for this date
-            existing_dates = [e["date"] for e in log[student] if isinstance(e, dict)]
-            if date_str not in existing_dates:
-                log[student].append({"date": date_str, "duration": duration, "items": items})
-                log[student].sort(key=lambda e: e.get("date", ""))
-            tenant_data.save_practice_log(teacher_id, log)
-            self._send_json({"ok": True, "student": student, "date": date_str, "total_days": len(log[student])})
-
-        elif parsed.path == "/api/practice-log/unmark":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            teacher_id = session["teacher_id"]
-            log = tenant_data.load_practice_log(teacher_id)
-            student = data.get("student", "")
-            date_str = data.get("date", "")
-            if student in log:
-                log[student] = [e for e in log[student] if not (isinstance(e, dict) and e.get("date") == date_str)]
-                tenant_data.save_practice_log(teacher_id, log)
-            self._send_json({"ok": True})
-
-        # --- Parent profile ---
-        elif parsed.path == "/api/parent-profile/save":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            if session.get("role") == "parent" and data.get("parent", "") != session.get("parent_id"):
-                self._send_json({"ok": False, "error": "Forbidden"}, 403)
-                return
-            teacher_id = session["teacher_id"]
-            profiles = tenant_data.load_parent_profiles(teacher_id)
-            parent_name = data.get("parent", "")
-            children = data.get("children", [])
-            if not parent_name:
-                self._send_json({"ok": False, "error": "Missing parent name"}, 400)
-                return
-            if parent_name not in profiles:
-                profiles[parent_name] = {"children": [], "payments": []}
-            profiles[parent_name]["children"] = children
-            tenant_data.save_parent_profiles(teacher_id, profiles)
-            self._send_json({"ok": True})
-
-        elif parsed.path == "/api/parent-profile/mark-payment":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            if session.get("role") == "parent" and data.get("parent", "") != session.get("parent_id"):
-                self._send_json({"ok": False, "error": "Forbidden"}, 403)
-                return
-            teacher_id = session["teacher_id"]
-            profiles = tenant_data.load_parent_profiles(teacher_id)
-            parent_name = data.get("parent", "")
-            amount = data.get("amount", "")
-            note = data.get("note", "")
-            if not parent_name:
-                self._send_json({"ok": False, "error": "Missing parent name"}, 400)
-                return
-            if parent_name not in profiles:
-                profiles[parent_name] = {"children": [], "payments": []}
-            payment = {
-                "date": datetime.now().strftime("%Y-%m-%d"),
-                "amount": amount,
-                "note": note,
-                "timestamp": datetime.now().isoformat()
-            }
-            profiles[parent_name].setdefault("payments", []).append(payment)
-            tenant_data.save_parent_profiles(teacher_id, profiles)
-            self._send_json({"ok": True, "payment": payment})
-
-        # --- Add student ---
-        elif parsed.path == "/api/students/add":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            name = data.get("name", "").strip()
-            if not name:
-                self._send_json({"ok": False, "error": "Missing name"}, 400)
-                return
-            added = add_student(name, session["teacher_id"])
-            self._send_json({"ok": True, "added": added, "name": name})
+    def _post_students_remove(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        name = (data.get("student_id") or data.get("name") or "").strip()
+        if not name:
+            self._send_raw(_error_json("Missing student_id"), 400)
+            return
+        removed = remove_student(name, session["teacher_id"])
+        self._send_json({"ok": removed, "removed": removed})
 
-        elif parsed.path == "/api/students/remove":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            name = (data.get("student_id") or data.get("name") or "").strip()
-            if not name:
-                self._send_json({"ok": False, "error": "Missing student_id"}, 400)
-                return
-            removed = remove_student(name, session["teacher_id"])
-            self._send_json({"ok": removed, "removed": removed})
+    def _post_families_add(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        parent = (data.get("parent") or data.get("name") or "").strip()
+        if not parent:
+            self._send_raw(_error_json("Missing parent name"), 400)
+            return
+        teacher_id = session["teacher_id"]
+        people = self._load("people", teacher_id)
+        families = people.get("families", [])
+        if _has_family(families, parent):
+            self._send_raw(_error_json("Already exists"), 400)
+            return
+        families.append({"parent": parent, "role": "parent", "messages": 0})
+        people["families"] = families
+        self._save("people", teacher_id, people)
+        self._send_json({"ok": True, "added": parent})
+
+    def _post_families_remove(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        parent = (data.get("parent") or data.get("name") or "").strip()
+        if not parent:
+            self._send_raw(_error_json("Missing parent name"), 400)
+            return
+        people = self._load("people", session["teacher_id"])
+        families = people.get("families", [])
+        if not _has_family(families, parent):
+            self._send_raw(_error_json("Not found"), 404)
+            return
+        people["families"] = [p for p in families if p.get("parent") != parent]
+        self._save("people", session["teacher_id"], people)
+        self._send_json({"ok": True, "removed": parent})
 
-        elif parsed.path == "/api/families/add":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            parent = (data.get("parent") or data.get("name") or "").strip()
-            if not parent:
-                self._send_json({"ok": False, "error": "Missing parent name"}, 400)
-                return
-            people = tenant_data.load_people(session["teacher_id"])
-            families = people.get("families", [])
-            if any(p.get("parent") == parent for p in families):
-                self._send_json({"ok": False, "error": "Already exists"}, 400)
-                return
-            families.append({"parent": parent, "role": "parent", "messages": 0})
-            people["families"] = families
-            tenant_data.save_people(session["teacher_id"], people)
-            self._send_json({"ok": True, "added": parent})
-
-        elif parsed.path == "/api/families/remove":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            parent = (data.get("parent") or data.get("name") or "").strip()
-            if not parent:
-                self._send_json({"ok": False, "error": "Missing parent name"}, 400)
-                return
-            people = tenant_data.load_people(session["teacher_id"])
-            families = people.get("families", [])
-            new_families = [p for p in families if p.get("parent") != parent]
-            if len(new_families) == len(families):
-                self._send_json({"ok": False, "error": "Not found"}, 404)
-                return
-            people["families"] = new_families
-            tenant_data.save_people(session["teacher_id"], people)
-            self._send_json({"ok": True, "removed": parent})
+    def _post_student_set_pin(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        teacher_id = session["teacher_id"]
+        student_id = (data.get("student_id") or "").strip()
+        pin = (data.get("pin") or "").strip()
+        if not student_id:
+            self._send_raw(_error_json("Missing student_id"), 400)
+            return
+        people = self._load("people", teacher_id)
+        students = people.get("students", [])
+        if student_id not in students:
+            self._send_raw(_error_json("Student not found"), 400)
+            return
+        set_student_pin(teacher_id, student_id, pin)
+        self._send_raw(_OK_JSON)
 
-        elif parsed.path == "/api/student/set-pin":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            teacher_id = session["teacher_id"]
-            student_id = (data.get("student_id") or "").strip()
-            pin = (data.get("pin") or "").strip()
-            if not student_id:
-                self._send_json({"ok": False, "error": "Missing student_id"}, 400)
-                return
-            people = tenant_data.load_people(teacher_id)
-            students = people.get("students", [])
-            if student_id not in students:
-                self._send_json({"ok": False, "error": "Student not found"}, 400)
-                return
-            set_student_pin(teacher_id, student_id, pin)
-            self._send_json({"ok": True})
+    # --- Teacher update settings (Venmo + school name) ---
+    def _post_teacher_update_venmo(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        teacher_id = session["teacher_id"]
+        venmo = (data.get("venmo") or "").strip()
+        school_name = (data.get("school_name") or "").strip()
+        if not venmo:
+            self._send_raw(_error_json("Missing venmo"), 400)
+            return
+        people = self._load("people", teacher_id)
+        if "teacher" not in people:
+            people["teacher"] = {}
+        people["teacher"]["venmo"] = venmo
+        if school_name:
+            people["teacher"]["school_name"] = school_name
+        self._save("people", teacher_id, people)
+        self._send_raw(_OK_JSON)
+
+    # --- Delete recording ---
+    def _post_delete_recording(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        teacher_id = session["teacher_id"]
+        filename = data.get("filename", "").strip()
+        if not filename:
+            self._send_raw(_error_json("Missing filename"), 400)
+            return
+        # Remove from categories
+        cats = self._load("audio_categories", teacher_id)
+        if filename in cats:
+            del cats[filename]
+            self._save("audio_categories", teacher_id, cats)
+        # Remove actual file from tenant's audio dir (name part only, never a path outside it)
+        name = os.path.basename(filename)
+        if name not in ("", ".", ".."):
+            (MEDIA_DIR / "audio" / str(teacher_id) / name).unlink(missing_ok=True)
+        self._send_raw(_OK_JSON)
+
+    # --- AI query ---
+    def _post_ai_query(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        teacher_id = session["teacher_id"]
+        query = data.get("query", "").strip()
+        if not query:
+            self._send_raw(_error_json("Empty query"), 400)
+            return
+        if not _AI_SLOTS.acquire(blocking=False):
+            self._send_raw(_error_json("The AI assistant is busy; please try again in a moment."), 503)
+            return
+        try:
+            self._ai_query(teacher_id, query)
+        finally:
+            _AI_SLOTS.release()
 
-        # --- Teacher update settings (Venmo + school name) ---
-        elif parsed.path == "/api/teacher/update-venmo":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            teacher_id = session["teacher_id"]
-            venmo = (data.get("venmo") or "").strip()
-            school_name = (data.get("school_name") or "").strip()
-            if not venmo:
-                self._send_json({"ok": False, "error": "Missing venmo"}, 400)
-                return
-            people = tenant_data.load_people(teacher_id)
-            if "teacher" not in people:
-                people["teacher"] = {}
-            people["teacher"]["venmo"] = venmo
-            if school_name:
-                people["teacher"]["school_name"] = school_name
-            tenant_data.save_people(teacher_id, people)
-            self._send_json({"ok": True})
-
-        # --- Delete recording ---
-        elif parsed.path == "/api/delete-recording":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            teacher_id = session["teacher_id"]
-            filename = data.get("filename", "").strip()
-            if not filename:
-                self._send_json({"ok": False, "error": "Missing filename"}, 400)
-                return
-            # Remove from categories
-            cats = tenant_data.load_audio_categories(teacher_id)
-            if filename in cats:
-                del cats[filename]
-                tenant_data.save_audio_categories(teacher_id, cats)
-            # Remove actual file from tenant's audio dir
-            audio_path = MEDIA_DIR / "audio" / str(teacher_id) / filename
-            if audio_path.exists():
-                audio_path.unlink()
-            self._send_json({"ok": True})
-
-        # --- AI query ---
-        elif parsed.path == "/api/ai-query":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            teacher_id = session["teacher_id"]
-            query = data.get("query", "").strip()
-            if not query:
-                self._send_json({"ok": False, "error": "Empty query"}, 400)
-                return
+    def _ai_query(self, teacher_id, query):
+        if "text/event-stream" not in (self.headers.get("Accept") or ""):
             result = ask_ai(query, teacher_id=teacher_id)
             self._send_json({"ok": True, **result})
+            return
+        # Server-sent events: one "data:" frame per answer chunk, then an "event: meta" frame
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        sent = []
+
+        def write_chunk(text):
+            sent.append(text)
+            self.wfile.write(b"data: " + json.dumps(text).encode("utf-8") + b"\n\n")
+            self.wfile.flush()
+
+        result = ask_ai(query, teacher_id=teacher_id, writer=write_chunk)
+        if not sent:
+            write_chunk(result["answer"])  # unavailable / error message
+        meta = {"ok": True, "mentioned_ragas": result.get("mentioned_ragas", [])}
+        self.wfile.write(b"event: meta\ndata: " + json.dumps(meta).encode("utf-8") + b"\n\n")
+
+    # --- Photo upload ---
+    def _post_upload_photo(self, parsed, data):
+        session = self.require_session(api=True)
+        if session is None:
+            return
+        teacher_id = session["teacher_id"]
+        name = data.get("name", "photo.jpg")
+        photos_dir = MEDIA_DIR / "photos" / str(teacher_id)
+        photos_dir.mkdir(parents=True, exist_ok=True)
+        today = datetime.now().strftime("%Y-%m-%d")
+        safe_name = _SAFE_FILENAME_RE.sub("", name).strip().replace(' ', '-')
+        filepath = photos_dir / f"{today}_{safe_name}"
+        # Decode into a sibling temp file and swap it in, so a failed upload never leaves half a photo
+        fd, tmp = tempfile.mkstemp(dir=photos_dir, prefix=filepath.name + ".", suffix=".tmp")
+        try:
+            os.fchmod(fd, 0o644)  # mkstemp creates 0600; keep the usual media-file mode
+            with os.fdopen(fd, "wb") as f:
+                _write_b64(f, data.get("data", ""))
+            os.replace(tmp, filepath)
+        except ValueError:  # binascii.Error
+            os.unlink(tmp)
+            self._send_raw(_error_json("Invalid photo data"), 400)
+            return
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self._send_json({"ok": True, "filename": filepath.name})
+
+
+    def _send_file(self, path, offset, count):
+        """Write count bytes of path from offset to the client; zero-copy via os.sendfile where the OS supports it."""
+        self.wfile.flush()
+        with open(path, "rb") as f:
+            if hasattr(os, "sendfile"):
+                self.connection.sendfile(f, offset, count)
+                return
+            # No sendfile (e.g. Windows): stream in fixed chunks rather than reading the whole file
+            f.seek(offset)
+            while count > 0:
+                chunk = f.read(min(_SEND_CHUNK, count))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                count -= len(chunk)
+
+    def _redirect(self, location, cookie=None):
+        """302 to location, optionally setting a cookie."""
+        self.send_response(302)
+        self.send_header("Location", location)
+        if cookie is not None:
+            self.send_header("Set-Cookie", cookie)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
 
-        # --- Photo upload ---
-        elif parsed.path == "/api/upload-photo":
-            session = self.require_session(api=True)
-            if session is None:
-                return
-            teacher_id = session["teacher_id"]
-            name = data.get("name", "photo.jpg")
-            photo_data = base64.b64decode(data.get("data", ""))
-            photos_dir = MEDIA_DIR / "photos" / str(teacher_id)
-            photos_dir.mkdir(parents=True, exist_ok=True)
-            today = datetime.now().strftime("%Y-%m-%d")
-            safe_name = "".join(c for c in name if c.isalnum() or c in ('.', '-', '_', ' ')).strip().replace(' ', '-')
-            filepath = photos_dir / f"{today}_{safe_name}"
-            filepath.write_bytes(photo_data)
-            self._send_json({"ok": True, "filename": filepath.name})
-
-        else:
-            self._send_json({"ok": False, "error": "Not found"}, 404)
+    def _send_html(self, body):
+        """200 response with an already-encoded HTML page."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers(body)
 
     def _send_json(self, data, status=200):
+        # orjson produces the UTF-8 bytes directly, without an intermediate str
+        body = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS) if orjson is not None else json.dumps(data).encode("utf-8")
+        self._send_raw(body, status)
+
+    def _send_raw(self, body, status=200):
+        """Send already-encoded JSON bytes (e.g. _OK_JSON, _error_json(...))."""
         self.send_response(status)
         self.send_header("Content-Type", "application/json")
         self.send_header("Cache-Control", "no-cache")
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode("utf-8"))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers(body)
 
     def log_message(self, format, *args):
         if args and str(args[0]).startswith(("4", "5")):
             super().log_message(format, *args)
 
+# Request routing: exact paths are one dict lookup; on a miss, subtrees are one more lookup by first segment.
+_GET_ROUTES = {
+    "/": AppHandler._get_index,
+    "/index.html": AppHandler._get_index,
+    "/logout": AppHandler._get_logout,
+    "/login/parent": AppHandler._get_login_parent,
+    "/login/student": AppHandler._get_login_student,
+    "/login": AppHandler._get_login,
+    "/api/categories": AppHandler._get_categories,
+    "/api/attendance": AppHandler._get_attendance,
+    "/api/assignments": AppHandler._get_assignments,
+    "/api/events/scheduled": AppHandler._get_events_scheduled,
+    "/api/practice-log": AppHandler._get_practice_log,
+    "/api/ai-status": AppHandler._get_ai_status,
+    "/api/parent-profiles": AppHandler._get_parent_profiles,
+    "/api/parent-names": AppHandler._get_parent_names,
+    "/api/parent-login-link": AppHandler._get_parent_login_link,
+}
+# Subtree routes keyed on the first path segment: "/static/css/main.css" -> "static"
+_GET_PREFIX_ROUTES = {
+    "static": AppHandler._get_static,
+    "media": AppHandler._get_media,
+}
+_POST_FORM_ROUTES = {
+    "/login": AppHandler._post_login,
+    "/signup": AppHandler._post_signup,
+    "/login/student": AppHandler._post_login_student,
+}
+# POST APIs that never write tenant data (and may be slow), so they skip the write locks
+_POST_READ_ONLY = frozenset(("/api/ai-query",))
+# POST APIs that only write tenant_data's per-tenant files, so they skip _SHARED_WRITE_LOCK
+_POST_TENANT_FILES_ONLY = frozenset((
+    "/api/attendance/save",
+    "/api/assignments/create",
+    "/api/assignments/update",
+    "/api/assignments/remove",
+    "/api/events/create",
+    "/api/practice-log/mark",
+    "/api/practice-log/unmark",
+    "/api/parent-profile/save",
+    "/api/parent-profile/mark-payment",
+))
+# Held by write requests that may edit the files all tenants share (people, PINs, categories, media)
+_SHARED_WRITE_LOCK = threading.Lock()
+_TENANT_WRITE_LOCKS = {}
+
+def _tenant_write_lock(teacher_id):
+    """The lock serializing write requests for teacher_id (None for requests without a session)."""
+    lock = _TENANT_WRITE_LOCKS.get(teacher_id)
+    if lock is None:
+        lock = _TENANT_WRITE_LOCKS.setdefault(teacher_id, threading.Lock())
+    return lock
+
+_POST_ROUTES = {
+    "/api/update-file": AppHandler._post_update_file,
+    "/api/restore": AppHandler._post_restore,
+    "/api/rename-raga": AppHandler._post_rename_raga,
+    "/api/upload-recording": AppHandler._post_upload_recording,
+    "/api/upload-audio-file": AppHandler._post_upload_audio_file,
+    "/api/attendance/save": AppHandler._post_attendance_save,
+    "/api/assignments/create": AppHandler._post_assignments_create,
+    "/api/assignments/update": AppHandler._post_assignments_update,
+    "/api/assignments/remove": AppHandler._post_assignments_remove,
+    "/api/events/create": AppHandler._post_events_create,
+    "/api/practice-log/mark": AppHandler._post_practice_log_mark,
+    "/api/practice-log/unmark": AppHandler._post_practice_log_unmark,
+    "/api/parent-profile/save": AppHandler._post_parent_profile_save,
+    "/api/parent-profile/mark-payment": AppHandler._post_parent_profile_mark_payment,
+    "/api/students/add": AppHandler._post_students_add,
+    "/api/students/remove": AppHandler._post_students_remove,
+    "/api/families/add": AppHandler._post_families_add,
+    "/api/families/remove": AppHandler._post_families_remove,
+    "/api/student/set-pin": AppHandler._post_student_set_pin,
+    "/api/teacher/update-venmo": AppHandler._post_teacher_update_venmo,
+    "/api/delete-recording": AppHandler._post_delete_recording,
+    "/api/ai-query": AppHandler._post_ai_query,
+    "/api/upload-photo": AppHandler._post_upload_photo,
+}
+
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
@@ -2008,7 +2742,16 @@ def main():
             "\n  Warning: Running on Render with default SESSION_SECRET. Set SESSION_SECRET in Render Environment for production.\n",
             file=sys.stderr,
         )
-    server = HTTPServer((host, port), AppHandler)
+    if is_non_localhost and not os.getenv("PIN_PEPPER"):
+        print(
+            "\n  Warning: PIN_PEPPER not set; student PINs are hashed with the default key. Set PIN_PEPPER in .env.\n",
+            file=sys.stderr,
+        )
+    # Thread per connection: keep-alive sockets sit idle between requests, so they must not hold
+    # slots of a bounded pool. The expensive work is bounded instead (_AI_SLOTS for AI queries).
+    # One-time move of old all-tenant data files into per-tenant files, before anything serves them
+    tenant_data.split_legacy_files()
+    server = ThreadingHTTPServer((host, port), AppHandler)
     print(f"\n  Music Class Organizer (Phase 2)")
     print(f"  http://{host}:{port}")
     print(f"\n  {len(get_audio_files())} audio files")
@@ -1,8 +1,8 @@
 """
 Session helpers for Music Class Organizer.
-get_session(environ) returns the current session dict or None.
+get_session(environ) returns the current session (read-only mapping) or None.
 create_session(...) builds a session payload; session persisted via signed cookie.
-verify_teacher(email, password) -> teacher_id | None using teachers table.
+verify_teacher(email, password) -> teacher_id | None using teachers table; hash_password(password) for storing.
 verify_student_pin(teacher_id, pin) -> student_id | None; resolve_student_by_pin(pin) -> (teacher_id, student_id) | None.
 create_parent_token(teacher_id, parent_id) -> token; consume_parent_token(token) -> (teacher_id, parent_id) | None.
 """
@@ -10,35 +10,53 @@ create_parent_token(teacher_id, parent_id) -> token; consume_parent_token(token)
 import os
 import json
 import base64
+import functools
 import hmac
 import hashlib
 import secrets
+from collections.abc import Mapping
 from datetime import datetime, timezone, timedelta
+from types import MappingProxyType
 
 # Session cookie (signed)
 SESSION_COOKIE_NAME = "mco_sid"
 
 
+# Read on first use rather than at import: app.py loads .env after importing this module
+@functools.lru_cache(maxsize=None)
 def _secret() -> bytes:
     raw = os.environ.get("SESSION_SECRET", "dev-secret-change-in-production")
     return raw.encode("utf-8")
 
 
+@functools.lru_cache(maxsize=None)
+def _session_hmac():
+    """HMAC-SHA256 keyed with the secret; copy() it per message instead of re-deriving the key pads."""
+    return hmac.new(_secret(), digestmod="sha256")
+
+
+def _sign(payload: str) -> str:
+    mac = _session_hmac().copy()
+    mac.update(payload.encode())
+    return mac.hexdigest()[:16]
+
+
 def _encode_session(session: dict) -> str:
     payload = base64.urlsafe_b64encode(json.dumps(session, sort_keys=True).encode()).decode()
-    sig = hmac.new(_secret(), payload.encode(), "sha256").hexdigest()[:16]
-    return f"{payload}.{sig}"
+    return f"{payload}.{_sign(payload)}"
 
 
-def _decode_session(cookie_value: str) -> dict | None:
+# A cookie value always decodes to the same session, so browsers sending it again skip the HMAC,
+# base64 and JSON work. Sessions are returned read-only so no caller can alter the cached copy.
+@functools.lru_cache(maxsize=4096)
+def _decode_session(cookie_value: str) -> Mapping | None:
     if not cookie_value or "." not in cookie_value:
         return None
     payload, sig = cookie_value.rsplit(".", 1)
-    expected = hmac.new(_secret(), payload.encode(), "sha256").hexdigest()[:16]
-    if not hmac.compare_digest(sig, expected):
+    if not hmac.compare_digest(sig, _sign(payload)):
         return None
     try:
-        return json.loads(base64.urlsafe_b64decode(payload.encode()).decode())
+        return MappingProxyType(json.loads(base64.urlsafe_b64decode(payload.encode()).decode()))
     except Exception:
         return None
 
@@ -53,11 +71,11 @@ def _get_cookie(handler, name: str) -> str | None:
     return None
 
 
-def get_session(environ) -> dict | None:
+def get_session(environ) -> Mapping | None:
     """
     Resolve current session from request (signed cookie).
     environ: request handler (BaseHTTPRequestHandler) with .headers.
-    Returns session dict or None if no valid session.
+    Returns the session as a read-only mapping, or None if no valid session.
     """
     cookie_value = _get_cookie(environ, SESSION_COOKIE_NAME)
     if not cookie_value:
@@ -82,55 +100,143 @@ def session_cookie_header_value(session: dict) -> str:
     return f"{SESSION_COOKIE_NAME}={value}; Path=/; HttpOnly; SameSite=Lax"
 
 
+# Teacher password hashes are "scrypt$N$r$p$<salt b64>$<key b64>" (salted, memory-hard, OpenSSL-backed).
+# Older rows hold a bare SHA-256 hex digest; those still verify and are rehashed on the next login.
+_SCRYPT_N, _SCRYPT_R, _SCRYPT_P = 2 ** 14, 8, 1
+
+
+def hash_password(password: str) -> str:
+    """Salted scrypt hash of password in the format stored in teachers.password_hash."""
+    salt = secrets.token_bytes(16)
+    key = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=_SCRYPT_N, r=_SCRYPT_R, p=_SCRYPT_P, dklen=32)
+    return "$".join(("scrypt", str(_SCRYPT_N), str(_SCRYPT_R), str(_SCRYPT_P),
+                     base64.b64encode(salt).decode(), base64.b64encode(key).decode()))
+
+
+def _check_password(password: str, stored: str) -> bool:
+    if not stored.startswith("scrypt$"):
+        try:
+            stored_digest = bytes.fromhex(stored)
+        except ValueError:
+            return False
+        return hmac.compare_digest(stored_digest, hashlib.sha256(password.encode("utf-8")).digest())
+    try:
+        _, n, r, p, salt, key = stored.split("$")
+        expected = base64.b64decode(key)
+        actual = hashlib.scrypt(password.encode("utf-8"), salt=base64.b64decode(salt),
+                                n=int(n), r=int(r), p=int(p), dklen=len(expected))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
 def verify_teacher(email: str, password: str) -> int | None:
     """
     Check teachers table: if email exists and password matches, return teacher id else None.
-    Passwords stored as SHA-256 hash (no salt) for minimal setup; upgrade to bcrypt later.
+    A matching legacy SHA-256 hash is replaced with a scrypt hash.
     """
     from db import get_connection
 
     email = (email or "").strip().lower()
     if not email or not password:
         return None
-    password_hash = hashlib.sha256(password.encode("utf-8")).hexdigest()
     with get_connection() as conn:
         row = conn.execute(
             "SELECT id, password_hash FROM teachers WHERE email = ?", (email,)
         ).fetchone()
-        if not row or not hmac.compare_digest(row["password_hash"], password_hash):
+        if not row or not _check_password(password, row["password_hash"]):
             return None
+        if not row["password_hash"].startswith("scrypt$"):
+            conn.execute("UPDATE teachers SET password_hash = ? WHERE id = ?", (hash_password(password), row["id"]))
+            conn.commit()
         return row["id"]
 
 
+# Student PIN hashes are BLAKE2b of the PIN (hex) keyed with PIN_PEPPER. A 4-digit PIN space is tiny,
+# so the key is what keeps a leaked student_pins.json from being brute-forced. It is its own secret,
+# not SESSION_SECRET, so rotating the cookie secret leaves every PIN valid.
+# Older entries hold a bare SHA-256 hex digest; those still verify and are rehashed with the
+# pepper on the next login.
+_PIN_DIGEST_SIZE = 16
+_DEV_PIN_PEPPER = "dev-pin-pepper-change-in-production"
+
+
+@functools.lru_cache(maxsize=None)
+def _pin_pepper() -> bytes:
+    # Read on first use, like _secret(); BLAKE2b keys are at most 64 bytes
+    return os.environ.get("PIN_PEPPER", _DEV_PIN_PEPPER).encode("utf-8")[:64]
+
+
+def _keyed_pin_hash(pin: str, key: bytes) -> str:
+    return hashlib.blake2b((pin or "").encode("utf-8"), key=key, digest_size=_PIN_DIGEST_SIZE).hexdigest()
+
+
 def _pin_hash(pin: str) -> str:
-    """SHA-256 hash of PIN for storage/comparison (no salt for minimal setup)."""
+    """Keyed BLAKE2b hash of PIN for storage/comparison."""
+    return _keyed_pin_hash(pin, _pin_pepper())
+
+
+def _legacy_pin_hash(pin: str) -> str:
+    """What older versions stored for pin: its bare SHA-256 hex digest."""
     return hashlib.sha256((pin or "").encode("utf-8")).hexdigest()
 
 
+# (student_pins.json stamp, { pin_hash: [(teacher_id, student_id), ...] }) for O(1) PIN lookup
+_pin_index = (None, {})
+
+
+def _pins_stamp():
+    import tenant_data
+    try:
+        st = os.stat(tenant_data.DATA_DIR / "student_pins.json")
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _pin_matches(pin: str) -> list:
+    """(teacher_id, student_id, is_legacy) for every stored hash of pin; keyed matches first, then legacy."""
+    global _pin_index
+    import tenant_data
+    stamp = _pins_stamp()
+    cached_stamp, index = _pin_index
+    if stamp is None or stamp != cached_stamp:
+        index = {}
+        for tid, pins in tenant_data.load_all_student_pins().items():
+            for student_id, stored in pins.items():
+                if stored:
+                    index.setdefault(stored, []).append((int(tid), student_id))
+        _pin_index = (stamp, index)
+    current = _pin_hash(pin)
+    matches = [(tid, sid, False) for tid, sid in index.get(current, ())]
+    matches += [(tid, sid, True) for tid, sid in index.get(_legacy_pin_hash(pin), ())]
+    return matches
+
+
 def verify_student_pin(teacher_id: int, pin: str) -> str | None:
     """
-    Load PINs for teacher_id; if pin (hashed) matches any student's stored hash, return that student_id (name) else None.
+    If pin matches a stored PIN hash of one of teacher_id's students, return that student_id (name) else None.
     """
-    import tenant_data
-    pins = tenant_data.load_student_pins(teacher_id)
-    if not pin or not pins:
+    if not pin:
         return None
-    h = _pin_hash(pin)
-    for student_id, stored in pins.items():
-        if stored and hmac.compare_digest(stored, h):
+    for tid, student_id, legacy in _pin_matches(pin):
+        if tid == teacher_id:
+            if legacy:
+                set_student_pin(tid, student_id, pin)
             return student_id
     return None
 
 
 def resolve_student_by_pin(pin: str) -> tuple[int, str] | None:
     """
-    Resolve PIN to (teacher_id, student_id) by trying all tenants. Returns first match or None.
+    Resolve PIN to (teacher_id, student_id) across all tenants. Returns first match or None.
     """
-    import tenant_data
-    for tid in tenant_data.get_teacher_ids():
-        sid = verify_student_pin(tid, pin)
-        if sid is not None:
-            return (tid, sid)
+    if not pin:
+        return None
+    for tid, student_id, legacy in _pin_matches(pin):
+        if legacy:
+            set_student_pin(tid, student_id, pin)
+        return (tid, student_id)
     return None
 
 
@@ -139,12 +245,14 @@ def set_student_pin(teacher_id: int, student_id: str, pin: str) -> bool:
     Store hashed PIN for the given teacher and student. Returns True if saved.
     student_id is the student's name. Does not validate that student exists; caller should.
     """
+    global _pin_index
     import tenant_data
     if not pin or not student_id:
         return False
     pins = tenant_data.load_student_pins(teacher_id)
     pins[student_id] = _pin_hash(pin)
     tenant_data.save_student_pins(teacher_id, pins)
+    _pin_index = (None, {})  # don't rely on the file stamp alone: two quick saves can share one
     return True
 
 
@@ -167,6 +275,13 @@ def create_parent_token(teacher_id: int, parent_id: str) -> str:
     return token
 
 
+# Recently validated parent tokens: token -> (cached until, epoch seconds; (teacher_id, parent_id)).
+# Links are reused for a year and never revoked, so repeat clicks within the TTL skip SQLite.
+_PARENT_TOKEN_TTL = 60.0
+_PARENT_TOKEN_CACHE_MAX = 1024
+_parent_token_cache = {}
+
+
 def consume_parent_token(token: str) -> tuple[int, str] | None:
     """
     Validate a parent magic-link token (reusable). If valid and not expired,
@@ -176,12 +291,22 @@ def consume_parent_token(token: str) -> tuple[int, str] | None:
 
     if not token or not token.strip():
         return None
-    now = datetime.now(timezone.utc).isoformat()
+    token = token.strip()
+    now = datetime.now(timezone.utc)
+    hit = _parent_token_cache.get(token)
+    if hit is not None and hit[0] > now.timestamp():
+        return hit[1]
     with get_connection() as conn:
         row = conn.execute(
-            "SELECT teacher_id, parent_id FROM parent_login_tokens WHERE token = ? AND expires_at > ?",
-            (token.strip(), now),
+            "SELECT teacher_id, parent_id, expires_at FROM parent_login_tokens WHERE token = ? AND expires_at > ?",
+            (token, now.isoformat()),
         ).fetchone()
-        if not row:
-            return None
-        return (row["teacher_id"], row["parent_id"])
+    if not row:
+        return None
+    result = (row["teacher_id"], row["parent_id"])
+    # Never serve a token from the cache past its own expiry
+    until = min(now.timestamp() + _PARENT_TOKEN_TTL, datetime.fromisoformat(row["expires_at"]).timestamp())
+    if len(_parent_token_cache) >= _PARENT_TOKEN_CACHE_MAX:
+        _parent_token_cache.clear()
+    _parent_token_cache[token] = (until, result)
+    return result
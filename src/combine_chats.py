@@ -7,6 +7,7 @@ Usage:
 """
 
 import sys
+from operator import attrgetter
 from pathlib import Path
 from parse_whatsapp import parse_messages, Message
 from extract_classes import extract_classes, strip_special_chars
@@ -40,7 +41,7 @@ def combine_messages(paths: list[Path]) -> list[Message]:
             print(f"  Error: {e}")
     
     # Sort by datetime
-    all_messages.sort(key=lambda m: m.datetime)
+    all_messages.sort(key=attrgetter('datetime'))
     return all_messages
 
 
@@ -1,10 +1,14 @@
 """
 SQLite DB for Music Class Organizer.
 Initializes DB and teachers table (id, email, password_hash, display_name).
+get_connection() hands out pooled connections (WAL mode) as a context manager.
 """
 
 import os
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
 BASE_DIR = Path(__file__).parent.parent
@@ -13,15 +17,54 @@ DATA_DIR = Path(_DATA_DIR_ENV) if _DATA_DIR_ENV else BASE_DIR / "data"
 DB_PATH = DATA_DIR / "music_class.db"
 
 
-def get_connection():
-    """Return a connection to the SQLite DB, creating file and schema if needed."""
+# Idle connections kept for reuse; more can be open at once, the extras are closed when returned
+_POOL_SIZE = 8
+_POOL = queue.LifoQueue(maxsize=_POOL_SIZE)
+_SCHEMA_LOCK = threading.Lock()
+_schema_ready = False
+
+
+def _connect() -> sqlite3.Connection:
+    """Open a new connection (schema created on the first one in this process)."""
+    global _schema_ready
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     conn.row_factory = sqlite3.Row
-    init_schema(conn)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    if not _schema_ready:
+        with _SCHEMA_LOCK:
+            if not _schema_ready:
+                init_schema(conn)
+                _schema_ready = True
     return conn
 
 
+@contextmanager
+def get_connection():
+    """
+    Borrow a pooled connection to the SQLite DB, creating file and schema if needed.
+    Use as `with get_connection() as conn:`; like sqlite3's own context manager it commits on
+    success and rolls back on error, then returns the connection to the pool.
+    """
+    try:
+        conn = _POOL.get_nowait()
+    except queue.Empty:
+        conn = _connect()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            _POOL.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
 def teacher_count() -> int:
     """Return the number of teachers in the DB (for first-teacher signup)."""
     with get_connection() as conn:
@@ -29,8 +72,9 @@ def teacher_count() -> int:
 
 
 def init_schema(conn: sqlite3.Connection) -> None:
-    """Create tables if they do not exist."""
+    """Create tables if they do not exist (one transaction, so a fresh DB is synced once)."""
     conn.executescript("""
+        BEGIN;
         CREATE TABLE IF NOT EXISTS teachers (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             email TEXT NOT NULL UNIQUE,
@@ -43,5 +87,5 @@ def init_schema(conn: sqlite3.Connection) -> None:
             parent_id TEXT NOT NULL,
             expires_at TEXT NOT NULL
         );
+        COMMIT;
     """)
-    conn.commit()
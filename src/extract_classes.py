@@ -16,7 +16,8 @@ import re
 from pathlib import Path
 from dataclasses import dataclass
 from datetime import datetime
-from parse_whatsapp import parse_messages, Message
+from operator import attrgetter
+from parse_whatsapp import parse_messages_cached, Message
 
 
 # Patterns that indicate a class or event is happening
@@ -62,13 +63,25 @@ class ClassDate:
 
 def _compile_patterns(patterns: list[str]) -> re.Pattern:
     """Combine patterns into one regex (case-insensitive)."""
-    combined = "|".join(f"({p})" for p in patterns)
+    # Callers only test whether it matches, so skip capturing: (?:...) searches about twice as fast
+    combined = "|".join(f"(?:{p})" for p in patterns)
     return re.compile(combined, re.IGNORECASE)
 
 
 CLASS_REGEX = _compile_patterns(CLASS_INDICATORS)
 RESCHEDULE_REGEX = _compile_patterns(RESCHEDULE_PATTERNS)
 EVENT_REGEX = _compile_patterns(EVENT_PATTERNS)
+# Either kind of indicator, in one search (extract_classes only needs to know whether any matched)
+CLASS_OR_EVENT_REGEX = _compile_patterns(CLASS_INDICATORS + EVENT_PATTERNS)
+
+# detect_class_type's checks as one scan; the first named group that matches anywhere wins
+CLASS_TYPE_REGEX = re.compile(
+    "(?P<rescheduled>" + "|".join(RESCHEDULE_PATTERNS) + ")"
+    r"|(?P<online>online|facetime|meet\.google)"
+    "|(?P<performance>" + "|".join(EVENT_PATTERNS) + ")",
+    re.IGNORECASE,
+)
+_CLASS_TYPE_RANK = {"rescheduled": 0, "online": 1, "performance": 2}
 
 # Extract time like "12:15", "2:30", "3 pm"
 TIME_REGEX = re.compile(r"\b(\d{1,2}(?::\d{2})?\s*(?:am|pm)?)\b", re.IGNORECASE)
@@ -82,22 +95,44 @@ def extract_time_from_text(text: str) -> str | None:
 
 def detect_class_type(body: str) -> str:
     """Determine what kind of class/event this is."""
-    body_lower = body.lower()
-    
-    if RESCHEDULE_REGEX.search(body):
-        if "cancel" in body_lower:
-            return "cancelled"
-        return "rescheduled"
-    
-    if "online" in body_lower or "facetime" in body_lower or "meet.google" in body_lower:
-        return "online"
-    
-    if EVENT_REGEX.search(body):
-        return "performance"
+    found = None
+    for m in CLASS_TYPE_REGEX.finditer(body):
+        if found is None or _CLASS_TYPE_RANK[m.lastgroup] < _CLASS_TYPE_RANK[found]:
+            found = m.lastgroup
+            if found == "rescheduled":
+                return "cancelled" if "cancel" in body.lower() else "rescheduled"
+    if found is not None:
+        return found
     
     return "class"
 
 
+# CLASS_TYPE_REGEX plus TIME_REGEX, so a message is classified and its time found in one scan
+_CLASSIFY_REGEX = re.compile(
+    CLASS_TYPE_REGEX.pattern + r"|\b(?P<time>\d{1,2}(?::\d{2})?\s*(?:am|pm)?)\b",
+    re.IGNORECASE,
+)
+
+
+def classify_message(body: str) -> tuple[str, str | None]:
+    """detect_class_type(body) and extract_time_from_text(body), from a single pass over body."""
+    found = None
+    time_mentioned = None
+    for m in _CLASSIFY_REGEX.finditer(body):
+        kind = m.lastgroup
+        if kind == "time":
+            if time_mentioned is None:
+                time_mentioned = m["time"]
+        elif kind == "rescheduled":
+            # A reschedule match can run on over a later time mention, so search for that separately
+            if time_mentioned is None:
+                time_mentioned = extract_time_from_text(body)
+            return ("cancelled" if "cancel" in body.lower() else "rescheduled"), time_mentioned
+        elif found is None or _CLASS_TYPE_RANK[kind] < _CLASS_TYPE_RANK[found]:
+            found = kind
+    return found or "class", time_mentioned
+
+
 def extract_classes(messages: list[Message], teacher_name: str = "Vaishnavi") -> list[ClassDate]:
     """
     Extract class dates from messages.
@@ -108,28 +143,27 @@ def extract_classes(messages: list[Message], teacher_name: str = "Vaishnavi") ->
     classes: list[ClassDate] = []
     seen_dates: set[str] = set()  # Avoid duplicates for same date
     
-    for msg in messages:
-        # Only look at teacher messages
-        if not msg.is_from_teacher(teacher_name):
-            continue
-        
+    # Only look at teacher messages
+    teacher_msgs = [m for m in messages if m.is_from_teacher(teacher_name)]
+    
+    for msg in teacher_msgs:
         body = msg.body
         
         # Check if this message indicates a class
-        if not CLASS_REGEX.search(body) and not EVENT_REGEX.search(body):
+        if not CLASS_OR_EVENT_REGEX.search(body):
             continue
         
-        class_type = detect_class_type(body)
-        time_mentioned = extract_time_from_text(body)
-        
         # Use the message date as the class date
         # (Teacher usually sends these on the day of or day before class)
         class_date = msg.date
         
-        # Skip if we already have this date (keep first mention)
-        if class_date in seen_dates and class_type not in ("cancelled", "rescheduled"):
+        # Skip if we already have this date (keep first mention), unless it's a cancellation or
+        # reschedule -- exactly when RESCHEDULE_REGEX matches, so decide that before classifying
+        if class_date in seen_dates and not RESCHEDULE_REGEX.search(body):
             continue
         
+        class_type, time_mentioned = classify_message(body)
+        
         seen_dates.add(class_date)
         
         classes.append(ClassDate(
@@ -141,7 +175,7 @@ def extract_classes(messages: list[Message], teacher_name: str = "Vaishnavi") ->
         ))
     
     # Sort by date
-    classes.sort(key=lambda c: c.message_datetime)
+    classes.sort(key=attrgetter("message_datetime"))
     return classes
 
 
@@ -160,7 +194,7 @@ def main():
     
     # Import and use the parser
     try:
-        messages = parse_messages(path)
+        messages = parse_messages_cached(path)
     except Exception as e:
         print(f"Error parsing: {e}")
         sys.exit(1)
@@ -8,7 +8,7 @@ Creates folders:
   - ... etc.
 """
 
-import shutil
+import os
 from pathlib import Path
 
 # Mapping of specific dates to event names
@@ -39,6 +39,10 @@ def organize_events():
     events_dir = base_media / 'events'
     events_dir.mkdir(exist_ok=True)
     
+    # Event folder per date, created the first time a file for that date turns up
+    event_folders = {date: events_dir / f"{date}_{name}" for date, name in EVENTS.items()}
+    created: set[str] = set()
+    
     # Check all media subfolders
     for category in ['photos', 'video', 'audio']:
         cat_dir = base_media / category
@@ -52,16 +56,18 @@ def organize_events():
             if not parts: continue
             file_date = parts[0]
             
-            if file_date in EVENTS:
-                event_name = EVENTS[file_date]
-                event_folder = events_dir / f"{file_date}_{event_name}"
-                event_folder.mkdir(exist_ok=True)
+            event_folder = event_folders.get(file_date)
+            if event_folder is not None:
+                if file_date not in created:
+                    event_folder.mkdir(exist_ok=True)
+                    created.add(file_date)
                 
                 # Copy or move? Let's copy for now to keep the categorized folders intact
                 # but maybe moving is better for clean "Event" grouping.
                 # User asked to "group by event", so let's move them to be definitive.
+                # Everything is under media/, so a plain rename works (no cross-device copy)
                 target_path = event_folder / file.name
-                shutil.move(file, target_path)
+                os.replace(file, target_path)
                 print(f"Moved {file.name} to {event_folder.name}")
 
 if __name__ == "__main__":
@@ -12,88 +12,97 @@ Usage:
   python organize_media.py file1.zip file2.zip ...
 """
 
+import os
 import sys
 import re
+import bisect
+import shutil
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from operator import attrgetter
 from pathlib import Path
 from datetime import datetime, timedelta
-from parse_whatsapp import parse_messages, Message
+from parse_whatsapp import parse_messages_cached, Message
 
 
 # File extensions by type
 AUDIO_EXTS = {'.m4a', '.opus', '.mp3', '.aac', '.ogg', '.wav'}
 VIDEO_EXTS = {'.mp4', '.mov', '.avi', '.webm', '.3gp'}
 PHOTO_EXTS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+_EXT_TYPES = {
+    **dict.fromkeys(AUDIO_EXTS, 'audio'),
+    **dict.fromkeys(VIDEO_EXTS, 'video'),
+    **dict.fromkeys(PHOTO_EXTS, 'photos'),
+}
 
-# Pattern to extract date from WhatsApp media filenames
-# Example: 00000009-AUDIO-2024-05-12-13-12-04.m4a
-FILENAME_PATTERN = re.compile(
-    r'\d+-(?:AUDIO|VIDEO|PHOTO)-(\d{4})-(\d{2})-(\d{2})-(\d{2})-(\d{2})-(\d{2})'
-)
+# WhatsApp media filenames are positional, e.g. 00000009-AUDIO-2024-05-12-13-12-04.m4a
+MEDIA_KINDS = {'AUDIO', 'VIDEO', 'PHOTO'}
+
+# Context clues in priority order; group n of CONTEXT_REGEX maps to CONTEXT_LABELS[n - 1]
+CONTEXT_REGEX = re.compile(r'(recording|practice)|(sargam)|(bandish)|(alaap)|(concert|performance)|(class)')
+CONTEXT_LABELS = ('Practice-Recording', 'Sargam-Practice', 'Bandish', 'Alaap', 'Performance', 'Class')
 
 
 def get_file_type(filename: str) -> str | None:
     """Determine if file is audio, video, or photo."""
-    ext = Path(filename).suffix.lower()
-    if ext in AUDIO_EXTS:
-        return 'audio'
-    if ext in VIDEO_EXTS:
-        return 'video'
-    if ext in PHOTO_EXTS:
-        return 'photos'
-    return None
+    dot = filename.rfind('.')
+    # Same suffix Path() would give: the dot must be in the last path component and not lead it
+    if dot <= 0 or filename[dot - 1] == '/' or '/' in filename[dot:]:
+        return None
+    return _EXT_TYPES.get(filename[dot:].lower())
 
 
 def parse_media_datetime(filename: str) -> datetime | None:
     """Extract datetime from WhatsApp media filename."""
-    match = FILENAME_PATTERN.search(filename)
-    if match:
-        year, month, day, hour, minute, second = match.groups()
-        return datetime(int(year), int(month), int(day), 
-                       int(hour), int(minute), int(second))
-    return None
+    parts = Path(filename).stem.split('-')
+    if len(parts) < 8 or parts[-7] not in MEDIA_KINDS or not parts[-8].isdigit():
+        return None
+    # Only the first two characters are seconds; exports may append e.g. " (1)" to duplicates
+    fields = parts[-6:-1] + [parts[-1][:2]]
+    if not all(f.isdigit() for f in fields):
+        return None
+    try:
+        return datetime(*map(int, fields))
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _context_label(body_lower: str) -> str | None:
+    """Context clue for one message body; memoized since media files sent together share messages."""
+    # Earlier groups outrank later ones regardless of where they occur in the text
+    best = None
+    for m in CONTEXT_REGEX.finditer(body_lower):
+        if best is None or m.lastindex < best:
+            best = m.lastindex
+            if best == 1:
+                break
+    return CONTEXT_LABELS[best - 1] if best is not None else None
 
 
-def find_context(media_dt: datetime, messages: list[Message], 
+def find_context(media_dt: datetime, messages: list[Message], msg_dts: list[datetime],
                  teacher_name: str = "Vaishnavi") -> str | None:
     """
     Try to find context for a media file from nearby messages.
     Looks for teacher messages within 30 minutes before/after the file timestamp.
+    messages must be sorted by datetime, with msg_dts[i] == messages[i].datetime.
     """
     if not media_dt:
         return None
     
     window = timedelta(minutes=30)
+    lo = bisect.bisect_left(msg_dts, media_dt - window)
+    hi = bisect.bisect_right(msg_dts, media_dt + window, lo)
     
-    for msg in messages:
-        try:
-            msg_dt = msg.datetime
-        except:
-            continue
-        
-        # Check if message is within time window
-        if abs(msg_dt - media_dt) > window:
-            continue
-        
+    for msg in messages[lo:hi]:
         # Prefer teacher messages
         if not msg.is_from_teacher(teacher_name):
             continue
         
-        body_lower = msg.body.lower()
-        
-        # Look for context clues
-        if 'recording' in body_lower or 'practice' in body_lower:
-            return 'Practice-Recording'
-        if 'sargam' in body_lower:
-            return 'Sargam-Practice'
-        if 'bandish' in body_lower:
-            return 'Bandish'
-        if 'alaap' in body_lower:
-            return 'Alaap'
-        if 'concert' in body_lower or 'performance' in body_lower:
-            return 'Performance'
-        if 'class' in body_lower:
-            return 'Class'
+        label = _context_label(msg.body_lower)
+        if label is not None:
+            return label
     
     return None
 
@@ -134,6 +143,15 @@ def generate_filename(original: str, media_dt: datetime | None,
     return f"{base}{ext}"
 
 
+def _extract_entries(zip_path: Path, jobs: list[tuple[str, Path]]) -> None:
+    """Extract (entry name, target path) pairs using this thread's own ZipFile handle."""
+    with zipfile.ZipFile(zip_path, 'r') as z:
+        for filename, target_path in jobs:
+            # Stream from zip to target in 1 MiB chunks rather than reading whole videos into memory
+            with z.open(filename) as src, open(target_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, length=1024 * 1024)
+
+
 def organize_media(zip_paths: list[Path], output_dir: Path, 
                    messages: list[Message]) -> dict:
     """
@@ -142,6 +160,8 @@ def organize_media(zip_paths: list[Path], output_dir: Path,
     """
     stats = {'audio': 0, 'video': 0, 'photos': 0, 'skipped': 0}
     counter: dict[str, int] = {}
+    # messages arrive sorted by datetime; find_context binary-searches these
+    msg_dts = [m.datetime for m in messages]
     
     # Create output directories
     for subdir in ['audio', 'video', 'photos']:
@@ -150,34 +170,44 @@ def organize_media(zip_paths: list[Path], output_dir: Path,
     for zip_path in zip_paths:
         print(f"\nProcessing: {zip_path.name}")
         
+        # Plan every entry first: naming (counter, find_context) stays sequential and deterministic
+        jobs: list[tuple[str, Path]] = []
         with zipfile.ZipFile(zip_path, 'r') as z:
-            for filename in z.namelist():
-                file_type = get_file_type(filename)
-                if not file_type:
-                    continue
-                
-                # Parse datetime from filename
-                media_dt = parse_media_datetime(filename)
-                
-                # Try to find context from chat
-                context = find_context(media_dt, messages)
-                
-                # Generate new filename
-                new_name = generate_filename(
-                    filename, media_dt, context, file_type, counter
-                )
-                
-                # Extract to appropriate folder
-                target_path = output_dir / file_type / new_name
-                
-                # Read from zip and write to target
-                data = z.read(filename)
-                target_path.write_bytes(data)
-                
-                stats[file_type] += 1
-                
-                # Show progress
-                print(f"  {file_type}: {filename} -> {new_name}")
+            names = z.namelist()
+        for filename in names:
+            file_type = get_file_type(filename)
+            if not file_type:
+                continue
+            
+            # Parse datetime from filename
+            media_dt = parse_media_datetime(filename)
+            
+            # Try to find context from chat
+            context = find_context(media_dt, messages, msg_dts)
+            
+            # Generate new filename
+            new_name = generate_filename(
+                filename, media_dt, context, file_type, counter
+            )
+            
+            # Extract to appropriate folder
+            jobs.append((filename, output_dir / file_type / new_name))
+            
+            stats[file_type] += 1
+            
+            # Show progress
+            print(f"  {file_type}: {filename} -> {new_name}")
+        
+        # Then extract in parallel: zlib and file writes release the GIL
+        workers = min(os.cpu_count() or 1, len(jobs))
+        if workers:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(_extract_entries, zip_path, jobs[i::workers])
+                    for i in range(workers)
+                ]
+                for future in futures:
+                    future.result()
     
     return stats
 
@@ -210,14 +240,14 @@ def main():
     all_messages: list[Message] = []
     for zp in zip_paths:
         try:
-            msgs = parse_messages(zp)
+            msgs = parse_messages_cached(zp)
             all_messages.extend(msgs)
             print(f"  {zp.name}: {len(msgs)} messages")
         except Exception as e:
             print(f"  {zp.name}: Error - {e}")
     
     # Sort messages by datetime for efficient searching
-    all_messages.sort(key=lambda m: m.datetime)
+    all_messages.sort(key=attrgetter('datetime'))
     
     # Organize media
     print("\nExtracting and renaming media files...")
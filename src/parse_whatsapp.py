@@ -10,32 +10,49 @@ Handles multiple WhatsApp export formats:
   - Format B: [7/17/23, 5:54:21 PM] sender: message (date first, 2-digit year)
 """
 
+import hashlib
+import io
+import os
+import pickle
 import re
+import tempfile
 import zipfile
 from pathlib import Path
 from dataclasses import dataclass
 from datetime import datetime
+from functools import cached_property, lru_cache
 from typing import Iterator
 
 # Unicode normalization: WhatsApp uses narrow no-break space (\u202f) before AM/PM
 # and left-to-right mark (\u200e) at start of some messages
+_NORMALIZE_TABLE = str.maketrans({"\u202f": " ", "\u200e": None, "\r": None})
+
 def _normalize(text: str) -> str:
     """Replace special Unicode spaces/marks with regular chars."""
-    return text.replace("\u202f", " ").replace("\u200e", "").replace("\r", "")
-
-# Format A: [5:55 PM, 2/8/2026] sender: message
-# Time first, 4-digit year
-FORMAT_A = re.compile(
-    r"^\[(\d{1,2}:\d{2}\s*[AP]M),\s*(\d{1,2}/\d{1,2}/\d{4})\]\s*(.+?):\s*(.*)$",
+    return text.translate(_NORMALIZE_TABLE)
+
+# Format A: [5:55 PM, 2/8/2026] sender: message      (time first, 4-digit year)
+# Format B: [7/17/23, 5:54:21 PM] sender: message    (date first, 2-digit year, optional seconds)
+# Both formats in one pass: ta/da are Format A's time/date, db/tb Format B's date/time
+MESSAGE_START = re.compile(
+    r"^\[(?:(?P<ta>\d{1,2}:\d{2}\s*[AP]M),\s*(?P<da>\d{1,2}/\d{1,2}/\d{4})"
+    r"|(?P<db>\d{1,2}/\d{1,2}/\d{2,4}),\s*(?P<tb>\d{1,2}:\d{2}(?::\d{2})?\s*[AP]M))"
+    r"\]\s*(?P<sender>.+?):\s*(?P<body>.*)$",
     re.IGNORECASE,
 )
 
-# Format B: [7/17/23, 5:54:21 PM] sender: message  
-# Date first, 2-digit year, optional seconds
-FORMAT_B = re.compile(
-    r"^\[(\d{1,2}/\d{1,2}/\d{2,4}),\s*(\d{1,2}:\d{2}(?::\d{2})?\s*[AP]M)\]\s*(.+?):\s*(.*)$",
-    re.IGNORECASE,
-)
+
+# Message date/time formats for 4-digit ("2/8/2026") and 2-digit ("7/17/23") years
+_DATETIME_FMT_4 = "%m/%d/%Y %I:%M %p"
+_DATETIME_FMT_2 = "%m/%d/%y %I:%M %p"
+
+_DRIVE_URL_RE = re.compile(r"https?://drive\.google\.com/[^\s<>'\"]+", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def _is_teacher(sender: str, teacher_name: str) -> bool:
+    """Case-insensitive name match, memoized: a chat has few distinct senders but many messages."""
+    return teacher_name.lower() in sender.lower()
 
 
 @dataclass
@@ -46,36 +63,40 @@ class Message:
     sender: str     # e.g. "Vaishnavi  Kondapalli"
     body: str       # full message text (including multi-line)
 
-    @property
+    @cached_property
     def datetime(self) -> datetime:
-        """Parse to datetime for sorting/filtering."""
-        # Remove seconds if present (e.g. "5:54:21 PM" -> "5:54 PM")
-        # Pattern: hour:min:sec where :sec is right before AM/PM
-        time_clean = re.sub(r"(\d{1,2}:\d{2}):\d{2}(\s*[AP]M)", r"\1\2", self.time, flags=re.IGNORECASE)
-        
+        """Parse to datetime for sorting/filtering (parsed once per message; sorts call this often)."""
+        # Remove seconds if present (e.g. "5:54:21 PM" -> "5:54 PM"): the line formats only
+        # allow h:mm or h:mm:ss, so three ":" pieces means the last starts with two second digits
+        parts = self.time.split(":")
+        time_clean = f"{parts[0]}:{parts[1]}{parts[2][2:]}" if len(parts) == 3 else self.time
+
         s = f"{self.date} {time_clean}"
-        
-        # Try 4-digit year first, then 2-digit
-        for fmt in ("%m/%d/%Y %I:%M %p", "%m/%d/%y %I:%M %p"):
-            try:
-                return datetime.strptime(s, fmt)
-            except ValueError:
-                continue
-        raise ValueError(f"Cannot parse date/time: {s}")
+
+        # The year's digit count picks the format, so there is no failed strptime to recover from
+        fmt = _DATETIME_FMT_4 if len(self.date.rpartition("/")[2]) == 4 else _DATETIME_FMT_2
+        try:
+            return datetime.strptime(s, fmt)
+        except ValueError:
+            raise ValueError(f"Cannot parse date/time: {s}") from None
+
+    @cached_property
+    def body_lower(self) -> str:
+        """Lower-cased body, computed once (read it only after parsing has finished appending lines)."""
+        return self.body.lower()
 
     def is_from_teacher(self, teacher_name: str = "Vaishnavi") -> bool:
-        return teacher_name.lower() in self.sender.lower()
+        return _is_teacher(self.sender, teacher_name)
 
     def has_drive_link(self) -> bool:
         return "drive.google.com" in self.body
 
     def get_drive_links(self) -> list[str]:
         """Extract Google Drive URLs from message body."""
-        url_pattern = re.compile(
-            r"https?://drive\.google\.com/[^\s<>'\"]+",
-            re.IGNORECASE,
-        )
-        return url_pattern.findall(self.body)
+        # The pattern is case-insensitive, so the fast reject is too
+        if "drive.google.com" not in self.body_lower:
+            return []
+        return _DRIVE_URL_RE.findall(self.body)
 
 
 def _read_lines(path: Path) -> Iterator[str]:
@@ -85,6 +106,16 @@ def _read_lines(path: Path) -> Iterator[str]:
             yield line.rstrip("\n")
 
 
+def _read_zip_lines(z: zipfile.ZipFile, name: str) -> Iterator[str]:
+    """Stream lines of a zip member (decoded as UTF-8) without reading it all first; closes z when done."""
+    try:
+        with z.open(name) as raw, io.TextIOWrapper(raw, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                yield line.rstrip("\n")
+    finally:
+        z.close()
+
+
 def _open_export(path: Path) -> tuple[Iterator[str], Path]:
     """
     Open export from zip or .txt.
@@ -95,7 +126,9 @@ def _open_export(path: Path) -> tuple[Iterator[str], Path]:
         raise FileNotFoundError(f"Not found: {path}")
 
     if path.suffix.lower() == ".zip":
-        with zipfile.ZipFile(path, "r") as z:
+        # Left open for _read_zip_lines, which closes it once the lines are consumed
+        z = zipfile.ZipFile(path, "r")
+        try:
             # WhatsApp exports the chat as "_chat.txt"
             names = z.namelist()
             chat_file = None
@@ -114,33 +147,30 @@ def _open_export(path: Path) -> tuple[Iterator[str], Path]:
             
             if not chat_file:
                 raise ValueError("Zip has no chat .txt file inside")
-            
-            text = z.read(chat_file).decode("utf-8", errors="replace")
-            lines = (line.rstrip("\n") for line in text.splitlines())
-            return lines, path / chat_file
+        except BaseException:
+            z.close()
+            raise
+        return _read_zip_lines(z, chat_file), path / chat_file
     else:
         return _read_lines(path), path
 
 
 def _try_parse_line(line: str) -> Message | None:
     """Try to parse a line as a message start using both formats."""
-    line = _normalize(line)
-    
-    # Try Format A: [TIME, DATE] sender: message
-    m = FORMAT_A.match(line)
-    if m:
-        time_str, date_str, sender, body = m.groups()
-        return Message(time=time_str.strip(), date=date_str.strip(), 
-                       sender=sender.strip(), body=body)
-    
-    # Try Format B: [DATE, TIME] sender: message
-    m = FORMAT_B.match(line)
-    if m:
-        date_str, time_str, sender, body = m.groups()
-        return Message(time=time_str.strip(), date=date_str.strip(),
-                       sender=sender.strip(), body=body)
-    
-    return None
+    # Continuation lines (most of a long chat) can't start a message; skip the regex for them
+    if not line.lstrip("\u200e\r").startswith("["):
+        return None
+    m = MESSAGE_START.match(_normalize(line))
+    if not m:
+        return None
+    if m["ta"] is not None:
+        # Format A: [TIME, DATE] sender: message
+        time_str, date_str = m["ta"], m["da"]
+    else:
+        # Format B: [DATE, TIME] sender: message
+        time_str, date_str = m["tb"], m["db"]
+    return Message(time=time_str.strip(), date=date_str.strip(),
+                   sender=m["sender"].strip(), body=m["body"])
 
 
 def parse_messages(path: Path) -> list[Message]:
@@ -151,17 +181,62 @@ def parse_messages(path: Path) -> list[Message]:
     """
     lines_iter, _ = _open_export(path)
     messages: list[Message] = []
-    current: Message | None = None
+    # Body lines of each message, joined once at the end rather than by repeated +=
+    bodies: list[list[str]] = []
+    current: list[str] | None = None
 
     for line in lines_iter:
         msg = _try_parse_line(line)
         if msg:
-            current = msg
-            messages.append(current)
+            current = [msg.body]
+            messages.append(msg)
+            bodies.append(current)
         elif current is not None and line.strip():
             # continuation of previous message
-            current.body += "\n" + _normalize(line)
+            current.append(_normalize(line))
+
+    for msg, parts in zip(messages, bodies):
+        if len(parts) > 1:
+            msg.body = "\n".join(parts)
+    return messages
+
+
+# Parsed exports are pickled here, keyed by path + mtime + size; bump the version when Message changes
+CACHE_DIR = Path(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache") / "music-organizer"
+_CACHE_VERSION = 1
+
 
+def parse_messages_cached(path: Path) -> list[Message]:
+    """
+    parse_messages, reusing the previous parse of the same unchanged export.
+    Lets the CLIs (extract_classes, organize_media, search_events) share one parse per export.
+    """
+    path = Path(path).resolve()
+    try:
+        st = path.stat()
+    except OSError:
+        return parse_messages(path)  # raises the usual "Not found"
+    key = f"{_CACHE_VERSION}:{path}:{st.st_mtime_ns}:{st.st_size}"
+    cache_file = CACHE_DIR / (hashlib.sha1(key.encode()).hexdigest() + ".pkl")
+    try:
+        with open(cache_file, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+
+    messages = parse_messages(path)
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(messages, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache_file)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError:
+        pass  # caching is best-effort
     return messages
 
 
@@ -1,5 +1,5 @@
 from pathlib import Path
-from parse_whatsapp import parse_messages
+from parse_whatsapp import parse_messages_cached
 import re
 
 zips = [
@@ -16,12 +16,17 @@ keywords = {
     'Annual Day': r'annual day',
     'Concert/Performance': r'concert|performance'
 }
+# Compiled once; ANY_KEYWORD rejects most messages in a single scan before the per-event checks
+patterns = [(event, re.compile(pattern, re.IGNORECASE)) for event, pattern in keywords.items()]
+ANY_KEYWORD = re.compile('|'.join(keywords.values()), re.IGNORECASE)
 
 for zp in zips:
     if not zp.exists(): continue
     print(f"\nSearching {zp.name}...")
-    messages = parse_messages(zp)
+    messages = parse_messages_cached(zp)
     for msg in messages:
-        for event, pattern in keywords.items():
-            if re.search(pattern, msg.body, re.IGNORECASE):
+        if not ANY_KEYWORD.search(msg.body):
+            continue
+        for event, pattern in patterns:
+            if pattern.search(msg.body):
                 print(f"  [{msg.date}] {event}: {msg.body[:100]}...")
@@ -2,31 +2,270 @@
 Tenant-scoped data layer for Music Class Organizer (Phase 3).
 
 All load/save functions take teacher_id and operate only on that tenant's data.
-JSON files use format: { "teacher_id": data, ... } so one file holds all tenants.
+Shared JSON files use format: { "teacher_id": data, ... } so one file holds all tenants;
+per-tenant kinds (attendance, practice log, ...) have one file per teacher instead.
+Parsed files are cached until they change on disk. load_* hand out the caller's own copy and a save
+publishes a new cached object, so a cached parse is never modified in place.
 Legacy single-tenant files are treated as teacher_id 1 on first read.
 """
 
+import contextvars
 import json
 import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
 
+# Optional: orjson for faster JSON load/save (falls back to stdlib json)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional: zstandard to compress large attendance / practice log files on disk
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 BASE_DIR = Path(__file__).parent.parent
 _DATA_DIR_ENV = os.getenv("DATA_DIR")
 DATA_DIR = Path(_DATA_DIR_ENV) if _DATA_DIR_ENV else BASE_DIR / "data"
+# Data files are written compact; PRETTY_JSON=1 indents them for reading by hand
+PRETTY_JSON = os.getenv("PRETTY_JSON") == "1"
+# Stdlib fallback encoders, built once instead of by every json.dumps call with non-default options
+_JSON_COMPACT = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+_JSON_PRETTY = json.JSONEncoder(indent=2, ensure_ascii=False).encode
+
+# Per-tenant files of these kinds are zstd-compressed in place (same name) once their JSON passes
+# _COMPRESS_MIN bytes; _load_raw spots the zstd frame magic, so plain and compressed files mix freely.
+_COMPRESSED_KINDS = ("attendance", "practice_log")
+_COMPRESS_MIN = 64 * 1024
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
 
 
 def _load_raw(filename, default=None):
     path = DATA_DIR / filename
     if path.exists():
-        with open(path, encoding="utf-8") as f:
-            return json.load(f)
+        # Both parsers take the raw UTF-8 bytes, so there is no separate decode-to-str pass
+        raw = path.read_bytes()
+        if raw[:4] == _ZSTD_MAGIC:
+            if zstandard is None:
+                raise RuntimeError(f"{filename} is zstd-compressed; install zstandard to read it")
+            raw = zstandard.ZstdDecompressor().decompress(raw)
+        return _parse(raw)
     return default if default is not None else {}
 
 
-def _save_raw(filename, data):
+def _parse(raw):
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def _clone(data):
+    """A private deep copy of JSON data (a JSON round trip, which is faster than copy.deepcopy)."""
+    if orjson is not None:
+        return orjson.loads(orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
+    return json.loads(_JSON_COMPACT(data))
+
+
+def _dumps(data):
+    """data as UTF-8 JSON bytes: compact, or indented when PRETTY_JSON is set."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if PRETTY_JSON else 0)
+        return orjson.dumps(data, option=option)
+    return (_JSON_PRETTY if PRETTY_JSON else _JSON_COMPACT)(data).encode("utf-8")
+
+
+def _save_raw(filename, data, payload=None):
+    """
+    Write data atomically: dump to a unique sibling .tmp file, fsync it, then os.replace over the
+    target, so a crash or a concurrent reader never sees a half-written file.
+    payload, if given, is data already serialized. Returns the JSON bytes written (before compression).
+    """
     path = DATA_DIR / filename
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    if payload is None:
+        payload = _dumps(data)
+    written = payload
+    if (zstandard is not None and not PRETTY_JSON and len(payload) > _COMPRESS_MIN
+            and filename.partition("/")[0] in _COMPRESSED_KINDS):
+        payload = zstandard.ZstdCompressor(level=3).compress(payload)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            os.fchmod(f.fileno(), 0o644)  # mkstemp creates 0600; keep the usual data-file mode
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    return written
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+# Parsed (and migrated) whole-file data keyed by filename -> ((mtime_ns, size), data).
+# Shared by every thread, so a cached parse is never modified: load_* copy out of it, and a
+# successful save replaces the slot with a new object.
+_RAW_CACHE = {}
+
+
+# Per-thread { filename: (data, published) } of saves deferred by batch_saves(); None outside a batch
+_batch = threading.local()
+
+
+@contextmanager
+def batch_saves():
+    """
+    Defer this thread's save_* writes inside the block to its end, writing (and fsyncing) each
+    file once however many times it was saved. Loads inside the block see the pending data.
+    If the block raises, the pending saves are dropped. Nested blocks join the outermost one.
+    Shared files (people, student PINs, audio categories) are not deferred: save_* writes them
+    at once under their file lock, so another thread's save can't be overwritten, and a raise
+    does not undo them.
+    """
+    if getattr(_batch, "pending", None) is not None:
+        yield
+        return
+    _batch.pending = {}
+    try:
+        yield
+        pending = _batch.pending
+    finally:
+        _batch.pending = None
+    for filename, (data, published) in pending.items():
+        _save_raw_cached(filename, data, published=published)
+
+
+# { filename: data } loaded during the current request_scope(); None outside one
+_request_files = contextvars.ContextVar("tenant_request_files", default=None)
+
+
+@contextmanager
+def request_scope():
+    """
+    Within the block, each file is stat'ed and looked up at most once: repeated loads of it (auth,
+    handler and view code each calling load_people, say) reuse the first result. Saves update it.
+    """
+    token = _request_files.set({})
+    try:
+        yield
+    finally:
+        _request_files.reset(token)
+
+
+def _load_raw_cached(filename, default, migrate):
+    """
+    migrate(_load_raw(filename, default)), reparsed only when the file's mtime or size changes.
+    The result is shared: read it or copy out of it, never modify it.
+    """
+    pending = getattr(_batch, "pending", None)
+    if pending and filename in pending:
+        data, published = pending[filename]
+        return data if published is None else published
+    request = _request_files.get()
+    if request is not None and filename in request:
+        return request[filename]
+    path = DATA_DIR / filename
+    stamp = _stamp(path)
+    hit = _RAW_CACHE.get(filename)
+    if stamp is not None and hit is not None and hit[0] == stamp:
+        raw = hit[1]
+    else:
+        raw = migrate(_load_raw(filename, default))
+        if stamp is not None:
+            _RAW_CACHE[filename] = (stamp, raw)
+    if request is not None:
+        request[filename] = raw
+    return raw
+
+
+def _save_raw_cached(filename, data, payload=None, published=None):
+    """
+    _save_raw, then publish the file's new cached parse (deferred inside batch_saves). That is a
+    fresh parse of the bytes written, not data itself, which the caller may go on editing; or
+    published, an object the caller built for the cache and will not touch again.
+    """
+    pending = getattr(_batch, "pending", None)
+    if pending is not None:
+        pending[filename] = (data, published)
+        return
+    try:
+        written = _save_raw(filename, data, payload)
+    except BaseException:
+        _SHARED_FRAGMENTS.pop(filename, None)
+        raise
+    _publish(filename, _parse(written) if published is None else published)
+
+
+def _publish(filename, data):
+    """Make data the cached parse of filename, which has just been written."""
+    _RAW_CACHE[filename] = (_stamp(DATA_DIR / filename), data)
+    request = _request_files.get()
+    if request is not None:
+        request[filename] = data
+
+
+# Save locks for the files shared by all tenants: save_* reads the whole file, replaces one tenant's
+# slice and writes it back, so two tenants saving at once must not interleave. Loads take no lock;
+# _save_raw replaces files atomically, so a reader sees the old or the new version, never a mix.
+_SHARED_FILE_LOCKS = {
+    "people.json": threading.Lock(),
+    "student_pins.json": threading.Lock(),
+    "audio_categories.json": threading.Lock(),
+}
+
+
+# Compact JSON of each tenant's slice of a shared file: filename -> (the cached parse the fragments
+# were dumped from, { teacher_id: bytes }). A save re-dumps only the saving tenant's slice and
+# splices the file together from the rest; a new parse (another process wrote) starts over.
+_SHARED_FRAGMENTS = {}
+
+
+def _save_shared(filename, teacher_id, data, migrate):
+    """Set teacher_id's slice of the shared file filename to data and write the file."""
+    teacher_id = int(teacher_id)
+    with _SHARED_FILE_LOCKS[filename]:
+        request = _request_files.get()
+        if request is not None:
+            request.pop(filename, None)  # splice into the current file, not this request's first read
+        raw = _load_raw_cached(filename, {}, migrate)
+        # A new top-level dict: readers may be iterating the cached one. The other tenants' slices
+        # are shared between the two, which is fine since cached data is never modified.
+        new_raw = dict(raw)
+        if PRETTY_JSON:
+            _SHARED_FRAGMENTS.pop(filename, None)
+            new_raw[teacher_id] = _clone(data)
+            payload = fragments = None
+        else:
+            owner, fragments = _SHARED_FRAGMENTS.get(filename, (None, None))
+            if owner is not raw:
+                fragments = {tid: None if tid == teacher_id else _dumps(slice_) for tid, slice_ in raw.items()}
+            fragments[teacher_id] = fragment = _dumps(data)
+            new_raw[teacher_id] = _parse(fragment)
+            payload = b"{" + b",".join(b'"%d":%s' % item for item in fragments.items()) + b"}"
+        # Written now, under the lock, even inside batch_saves: a deferred write would land after
+        # the lock is released and could overwrite another thread's save of this file
+        try:
+            _save_raw(filename, new_raw, payload)
+        except BaseException:
+            _SHARED_FRAGMENTS.pop(filename, None)
+            raise
+        _publish(filename, new_raw)
+        if fragments is not None:
+            _SHARED_FRAGMENTS[filename] = (new_raw, fragments)
 
 
 def _is_tenant_key(k):
@@ -34,6 +273,45 @@ def _is_tenant_key(k):
     return isinstance(k, str) and k.isdigit()
 
 
+def _by_tenant_id(raw):
+    """
+    Re-key a shared { "teacher_id": data } parse by int teacher id, once per parse, so lookups
+    skip str(teacher_id). Both JSON writers turn the int keys back into strings on save.
+    """
+    return {int(k): v for k, v in raw.items() if _is_tenant_key(k)}
+
+
+# Kinds stored one file per tenant (DATA_DIR/<kind>/<teacher_id>.json), so a save rewrites only
+# that tenant's data. Nothing reads these across tenants; people, PINs and categories stay shared.
+_PER_TENANT_KINDS = ("attendance", "practice_log", "assignments", "scheduled_events", "parent_profiles")
+
+
+def _tenant_file(kind, teacher_id):
+    return f"{kind}/{teacher_id}.json"
+
+
+def _as_is(raw):
+    return raw
+
+
+def _load_tenant(kind, teacher_id, default):
+    """teacher_id's <kind> data from its own file (the shared cached parse: don't modify it)."""
+    return _load_raw_cached(_tenant_file(kind, teacher_id), default, _as_is)
+
+
+def _save_tenant(kind, teacher_id, data):
+    (DATA_DIR / kind).mkdir(exist_ok=True)
+    _save_raw_cached(_tenant_file(kind, teacher_id), data)
+
+
+def data_path(filename, teacher_id=None):
+    """Path of the file holding filename's data (e.g. "attendance.json") for teacher_id."""
+    kind, _, ext = filename.partition(".")
+    if teacher_id is not None and kind in _PER_TENANT_KINDS:
+        return DATA_DIR / kind / f"{teacher_id}.{ext}"
+    return DATA_DIR / filename
+
+
 def _migrate_attendance_legacy(raw):
     """If raw is legacy { date: {...} }, return { "1": raw } else return raw."""
     if not raw or not isinstance(raw, dict):
@@ -49,6 +327,18 @@ def _migrate_attendance_legacy(raw):
 # Attendance
 # ---------------------------------------------------------------------------
 
+# record_attendance appends single dates to attendance/<teacher_id>.ndjson, one {date: entry} per
+# line, and folds the log into <teacher_id>.json once it outgrows it (or this many bytes).
+_ATTENDANCE_LOG_MIN = 64 * 1024
+# teacher_id -> (cached base parse, log stamp, base with the log replayed over it). The merged
+# dict is cached data like the base: copied out of, never modified.
+_attendance_merged = {}
+
+
+def _attendance_log(teacher_id):
+    return DATA_DIR / "attendance" / f"{teacher_id}.ndjson"
+
+
 def load_attendance(teacher_id):
     """
     Load attendance for the given teacher.
@@ -56,19 +346,86 @@ def load_attendance(teacher_id):
     """
     if teacher_id is None:
         return {}
-    raw = _load_raw("attendance.json", {})
-    raw = _migrate_attendance_legacy(raw)
-    return raw.get(str(teacher_id), {})
+    return _clone(_load_attendance_merged(teacher_id))
+
+
+def _load_attendance_merged(teacher_id):
+    """The teacher's attendance file with its log replayed over it (cached; don't modify it)."""
+    base = _load_tenant("attendance", teacher_id, {})
+    log = _attendance_log(teacher_id)
+    stamp = _stamp(log)
+    if stamp is None:
+        return base
+    hit = _attendance_merged.get(teacher_id)
+    if hit is not None and hit[0] is base and hit[1] == stamp:
+        return hit[2]
+    merged = dict(base)
+    with open(log, "rb") as f:
+        for line in f:
+            try:
+                merged.update(_parse(line))
+            except ValueError:
+                pass  # blank line, or the torn tail of an append cut short by a crash
+    _attendance_merged[teacher_id] = (base, stamp, merged)
+    return merged
 
 
 def save_attendance(teacher_id, data):
-    """Save attendance for the given teacher. Merges into file by teacher key."""
+    """Save attendance for the given teacher (rewrites only that teacher's file)."""
     if teacher_id is None:
         return
-    raw = _load_raw("attendance.json", {})
-    raw = _migrate_attendance_legacy(raw)
-    raw[str(teacher_id)] = data
-    _save_raw("attendance.json", raw)
+    (DATA_DIR / "attendance").mkdir(exist_ok=True)
+    filename = _tenant_file("attendance", teacher_id)
+    # Written now even inside batch_saves, since the log it supersedes is removed now too
+    _publish(filename, _parse(_save_raw(filename, data)))
+    try:
+        os.unlink(_attendance_log(teacher_id))
+    except FileNotFoundError:
+        pass
+
+
+def record_attendance(teacher_id, date_str, entry):
+    """
+    Set one date's attendance entry. Appends it to the teacher's attendance log instead of
+    rewriting the whole history; save_attendance folds the log in once it grows past the file.
+    """
+    if teacher_id is None:
+        return
+    base_stamp = _stamp(DATA_DIR / _tenant_file("attendance", teacher_id))
+    if base_stamp is None:
+        data = load_attendance(teacher_id)
+        data[date_str] = entry
+        save_attendance(teacher_id, data)
+        return
+    log = _attendance_log(teacher_id)
+    if orjson is not None:
+        line = orjson.dumps({date_str: entry})
+    else:
+        line = _JSON_COMPACT({date_str: entry}).encode("utf-8")
+    before = _stamp(log)
+    with open(log, "a+b") as f:
+        record = line + b"\n"
+        end = f.seek(0, os.SEEK_END)
+        if end:
+            f.seek(end - 1)
+            if f.read(1) != b"\n":
+                # A crash tore the last append: end that line so this record gets a line of its own
+                record = b"\n" + record
+        f.write(record)
+        f.flush()
+        os.fsync(f.fileno())
+    stamp = _stamp(log)
+    base = _load_tenant("attendance", teacher_id, {})
+    hit = _attendance_merged.get(teacher_id)
+    if hit is not None and hit[0] is base and hit[1] == before:
+        # Extend the cached merge by the one line just written instead of replaying the log
+        merged = dict(hit[2])
+        merged.update(_parse(line))
+        _attendance_merged[teacher_id] = (base, stamp, merged)
+    else:
+        merged = _load_attendance_merged(teacher_id)
+    if stamp[1] > max(base_stamp[1], _ATTENDANCE_LOG_MIN):
+        save_attendance(teacher_id, merged)
 
 
 # ---------------------------------------------------------------------------
@@ -85,6 +442,10 @@ def _migrate_practice_log_legacy(raw):
     return raw
 
 
+# teacher_id -> the cached practice log parse last scanned for the old format; a new parse is rescanned
+_practice_log_checked = {}
+
+
 def load_practice_log(teacher_id):
     """
     Load practice log for the given teacher.
@@ -93,31 +454,27 @@ def load_practice_log(teacher_id):
     """
     if teacher_id is None:
         return {}
-    raw = _load_raw("practice_log.json", {})
-    raw = _migrate_practice_log_legacy(raw)
-    data = raw.get(str(teacher_id), {})
-    out = {}
-    migrated = False
-    for student, entries in list(data.items()):
-        if entries and isinstance(entries[0], str):
-            out[student] = [{"date": d, "duration": 0, "items": ""} for d in entries]
-            migrated = True
-        else:
-            out[student] = entries
-    if migrated:
-        save_practice_log(teacher_id, out)
-        return out
-    return data
+    data = _load_tenant("practice_log", teacher_id, {})
+    if _practice_log_checked.get(teacher_id) is data:
+        return _clone(data)  # same cached parse as last time: already in the new format
+    # Old format: a student's entries are bare date strings. Build a new dict only if any are.
+    if any(entries and isinstance(entries[0], str) for entries in data.values()):
+        data = {
+            student: [{"date": d, "duration": 0, "items": ""} for d in entries]
+            if entries and isinstance(entries[0], str) else _clone(entries)
+            for student, entries in data.items()
+        }
+        save_practice_log(teacher_id, data)
+        return data
+    _practice_log_checked[teacher_id] = data
+    return _clone(data)
 
 
 def save_practice_log(teacher_id, data):
     """Save practice log for the given teacher."""
     if teacher_id is None:
         return
-    raw = _load_raw("practice_log.json", {})
-    raw = _migrate_practice_log_legacy(raw)
-    raw[str(teacher_id)] = data
-    _save_raw("practice_log.json", raw)
+    _save_tenant("practice_log", teacher_id, data)
 
 
 # ---------------------------------------------------------------------------
@@ -135,19 +492,26 @@ def load_assignments(teacher_id):
     """Load assignments for the given teacher. Returns list of assignment dicts."""
     if teacher_id is None:
         return []
-    raw = _load_raw("assignments.json", [])
-    raw = _migrate_assignments_legacy(raw)
-    return raw.get(str(teacher_id), [])
+    return _clone(_load_tenant("assignments", teacher_id, []))
 
 
 def save_assignments(teacher_id, data):
     """Save assignments for the given teacher."""
     if teacher_id is None:
         return
-    raw = _load_raw("assignments.json", [])
-    raw = _migrate_assignments_legacy(raw)
-    raw[str(teacher_id)] = data
-    _save_raw("assignments.json", raw)
+    _save_tenant("assignments", teacher_id, data)
+
+
+def add_assignment(teacher_id, assignment):
+    """
+    Append one assignment for the given teacher, giving it the next id ("a<n>_<timestamp>").
+    Returns the new assignment's position in the teacher's list.
+    """
+    assignments = load_assignments(teacher_id)
+    assignment["id"] = f"a{len(assignments)+1}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    assignments.append(assignment)
+    _save_tenant("assignments", teacher_id, assignments)
+    return len(assignments) - 1
 
 
 # ---------------------------------------------------------------------------
@@ -165,19 +529,14 @@ def load_scheduled_events(teacher_id):
     """Load scheduled events for the given teacher. Returns list of event dicts."""
     if teacher_id is None:
         return []
-    raw = _load_raw("scheduled_events.json", [])
-    raw = _migrate_events_legacy(raw)
-    return raw.get(str(teacher_id), [])
+    return _clone(_load_tenant("scheduled_events", teacher_id, []))
 
 
 def save_scheduled_events(teacher_id, data):
     """Save scheduled events for the given teacher."""
     if teacher_id is None:
         return
-    raw = _load_raw("scheduled_events.json", [])
-    raw = _migrate_events_legacy(raw)
-    raw[str(teacher_id)] = data
-    _save_raw("scheduled_events.json", raw)
+    _save_tenant("scheduled_events", teacher_id, data)
 
 
 # ---------------------------------------------------------------------------
@@ -185,39 +544,46 @@ def save_scheduled_events(teacher_id, data):
 # ---------------------------------------------------------------------------
 
 def _migrate_people_legacy(raw):
-    """If raw has keys like teacher/students/families (not tenant ids), return { "1": raw }."""
+    """If raw has keys like teacher/students/families (not tenant ids), return { 1: raw }, else key it by int teacher id."""
     if not raw or not isinstance(raw, dict):
         return raw
     first = next(iter(raw.keys()), None)
     if first and not _is_tenant_key(first):
-        return {"1": raw}
-    return raw
+        return {1: raw}
+    return _by_tenant_id(raw)
 
 
 def load_people(teacher_id):
-    """Load people (teacher, students, families) for the given teacher."""
+    """
+    Load people (teacher, students, families) for the given teacher.
+    The parsed file is cached until it changes on disk; the result is the caller's own copy.
+    """
     if teacher_id is None:
         return {}
-    raw = _load_raw("people.json", {})
-    raw = _migrate_people_legacy(raw)
-    return raw.get(str(teacher_id), {})
+    raw = _load_raw_cached("people.json", {}, _migrate_people_legacy)
+    return _clone(raw.get(int(teacher_id), {}))
 
 
 def save_people(teacher_id, data):
     """Save people for the given teacher."""
     if teacher_id is None:
         return
-    raw = _load_raw("people.json", {})
-    raw = _migrate_people_legacy(raw)
-    raw[str(teacher_id)] = data
-    _save_raw("people.json", raw)
+    _save_shared("people.json", teacher_id, data, _migrate_people_legacy)
+
+
+# (people.json parse, teacher ids). Cached parses are never modified, so the same object has the same ids.
+_teacher_ids = (None, [])
 
 
 def get_teacher_ids():
     """Return list of teacher ids that have data in people.json (for PIN lookup across tenants)."""
-    raw = _load_raw("people.json", {})
-    raw = _migrate_people_legacy(raw)
-    return [int(k) for k in raw.keys() if _is_tenant_key(k)]
+    global _teacher_ids
+    raw = _load_raw_cached("people.json", {}, _migrate_people_legacy)
+    cached_raw, ids = _teacher_ids
+    if cached_raw is not raw:
+        ids = list(raw)
+        _teacher_ids = (raw, ids)
+    return list(ids)
 
 
 # ---------------------------------------------------------------------------
@@ -225,32 +591,36 @@ def get_teacher_ids():
 # ---------------------------------------------------------------------------
 
 def _migrate_student_pins_legacy(raw):
-    """If raw has non-tenant keys, return { "1": raw } else return raw."""
+    """If raw has non-tenant keys, return { 1: raw }, else key it by int teacher id."""
     if not raw or not isinstance(raw, dict):
         return raw
     first = next(iter(raw.keys()), None)
     if first and not _is_tenant_key(first):
-        return {"1": raw}
-    return raw
+        return {1: raw}
+    return _by_tenant_id(raw)
 
 
 def load_student_pins(teacher_id):
     """Load student PIN hashes for the given teacher. Returns dict student_name -> pin_hash."""
     if teacher_id is None:
         return {}
-    raw = _load_raw("student_pins.json", {})
-    raw = _migrate_student_pins_legacy(raw)
-    return raw.get(str(teacher_id), {})
+    raw = _load_raw_cached("student_pins.json", {}, _migrate_student_pins_legacy)
+    return _clone(raw.get(int(teacher_id), {}))
+
+
+def load_all_student_pins():
+    """
+    Load student PIN hashes for every teacher. Returns dict teacher_id (int) -> { student_name: pin_hash }.
+    The result is the shared cached parse; read it, don't modify it.
+    """
+    return _load_raw_cached("student_pins.json", {}, _migrate_student_pins_legacy) or {}
 
 
 def save_student_pins(teacher_id, data):
     """Save student PIN hashes for the given teacher. data: dict student_name -> pin_hash."""
     if teacher_id is None:
         return
-    raw = _load_raw("student_pins.json", {})
-    raw = _migrate_student_pins_legacy(raw)
-    raw[str(teacher_id)] = data
-    _save_raw("student_pins.json", raw)
+    _save_shared("student_pins.json", teacher_id, data, _migrate_student_pins_legacy)
 
 
 # ---------------------------------------------------------------------------
@@ -258,32 +628,28 @@ def save_student_pins(teacher_id, data):
 # ---------------------------------------------------------------------------
 
 def _migrate_categories_legacy(raw):
-    """If raw has non-numeric top-level keys (filenames), return { "1": raw }."""
+    """If raw has non-numeric top-level keys (filenames), return { 1: raw }, else key it by int teacher id."""
     if not raw or not isinstance(raw, dict):
         return raw
     first = next(iter(raw.keys()), None)
     if first and not _is_tenant_key(first):
-        return {"1": raw}
-    return raw
+        return {1: raw}
+    return _by_tenant_id(raw)
 
 
 def load_audio_categories(teacher_id):
-    """Load audio categories for the given teacher."""
+    """Load audio categories for the given teacher (the caller's own copy of the cached parse)."""
     if teacher_id is None:
         return {}
-    raw = _load_raw("audio_categories.json", {})
-    raw = _migrate_categories_legacy(raw)
-    return raw.get(str(teacher_id), {})
+    raw = _load_raw_cached("audio_categories.json", {}, _migrate_categories_legacy)
+    return _clone(raw.get(int(teacher_id), {}))
 
 
 def save_audio_categories(teacher_id, data):
     """Save audio categories for the given teacher."""
     if teacher_id is None:
         return
-    raw = _load_raw("audio_categories.json", {})
-    raw = _migrate_categories_legacy(raw)
-    raw[str(teacher_id)] = data
-    _save_raw("audio_categories.json", raw)
+    _save_shared("audio_categories.json", teacher_id, data, _migrate_categories_legacy)
 
 
 # ---------------------------------------------------------------------------
@@ -304,16 +670,42 @@ def load_parent_profiles(teacher_id):
     """Load parent profiles for the given teacher."""
     if teacher_id is None:
         return {}
-    raw = _load_raw("parent_profiles.json", {})
-    raw = _migrate_parent_profiles_legacy(raw)
-    return raw.get(str(teacher_id), {})
+    return _clone(_load_tenant("parent_profiles", teacher_id, {}))
 
 
 def save_parent_profiles(teacher_id, data):
     """Save parent profiles for the given teacher."""
     if teacher_id is None:
         return
-    raw = _load_raw("parent_profiles.json", {})
-    raw = _migrate_parent_profiles_legacy(raw)
-    raw[str(teacher_id)] = data
-    _save_raw("parent_profiles.json", raw)
+    _save_tenant("parent_profiles", teacher_id, data)
+
+
+# ---------------------------------------------------------------------------
+# One-time split of the old all-tenants files
+# ---------------------------------------------------------------------------
+
+_LEGACY_MIGRATIONS = {
+    "attendance": _migrate_attendance_legacy,
+    "practice_log": _migrate_practice_log_legacy,
+    "assignments": _migrate_assignments_legacy,
+    "scheduled_events": _migrate_events_legacy,
+    "parent_profiles": _migrate_parent_profiles_legacy,
+}
+
+
+def split_legacy_files():
+    """
+    Move each <kind>.json ({ "teacher_id": data, ... } or legacy single-tenant) into per-tenant
+    files, then rename it to <kind>.legacy.bak. Tenant files that already exist are left alone.
+    Run once by the server at startup (app.main), not on import, since it renames data files.
+    """
+    for kind in _PER_TENANT_KINDS:
+        path = DATA_DIR / f"{kind}.json"
+        if not path.exists():
+            continue
+        raw = _LEGACY_MIGRATIONS[kind](_load_raw(path.name, {})) or {}
+        (DATA_DIR / kind).mkdir(exist_ok=True)
+        for tid, data in raw.items():
+            if _is_tenant_key(tid) and not (DATA_DIR / _tenant_file(kind, tid)).exists():
+                _save_raw(_tenant_file(kind, tid), data)
+        path.replace(path.with_suffix(".legacy.bak"))
@@ -1,14 +1,21 @@
 import os
-import google.generativeai as genai
 from dotenv import load_dotenv
 
-load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=api_key)
 
-try:
-    model = genai.GenerativeModel("gemini-1.5-flash")
-    response = model.generate_content("Hello, can you hear me?")
-    print(response.text)
-except Exception as e:
-    print(f"Error: {e}")
+def main():
+    load_dotenv()
+    api_key = os.getenv("GOOGLE_API_KEY")
+
+    try:
+        # Imported here: google.generativeai pulls in gRPC and protobuf, which importing this module shouldn't
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel("gemini-1.5-flash")
+        response = model.generate_content("Hello, can you hear me?")
+        print(response.text)
+    except Exception as e:
+        print(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
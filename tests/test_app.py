@@ -0,0 +1,24 @@
+"""Tests for app's helpers. Run: python -m unittest discover tests"""
+
+import sys
+import unittest
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import app
+
+
+class CompositionSummaryTest(unittest.TestCase):
+    def test_known_types_in_alphabetical_order(self):
+        types = Counter({"Taan": 1, "Alaap": 2, "Unknown": 3})
+        self.assertEqual(app._composition_summary(types), "2 Alaap, 1 Taan, 3 Unknown")
+
+    def test_type_outside_list_sorts_alphabetically_before_unknown(self):
+        types = Counter({"Unknown": 1, "Taan": 1, "Dhrupad": 2, "Alaap": 1})
+        self.assertEqual(app._composition_summary(types), "1 Alaap, 2 Dhrupad, 1 Taan, 1 Unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""Tests for auth's password and PIN hashing. Run: python -m unittest discover tests"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import auth
+import db
+import tenant_data
+
+
+def _close_pooled_connections():
+    while not db._POOL.empty():
+        db._POOL.get_nowait().close()
+
+
+class TeacherPasswordTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        # Pooled connections point at the old DB file, so close them on the way in and out
+        _close_pooled_connections()
+        self.addCleanup(_close_pooled_connections)
+        for name, value in (("DATA_DIR", Path(tmp.name)), ("DB_PATH", Path(tmp.name) / "music_class.db"),
+                            ("_schema_ready", False)):
+            self.addCleanup(setattr, db, name, getattr(db, name))
+            setattr(db, name, value)
+
+    def _add_teacher(self, email, password_hash):
+        with db.get_connection() as conn:
+            return conn.execute("INSERT INTO teachers (email, password_hash) VALUES (?, ?)",
+                                (email, password_hash)).lastrowid
+
+    def _stored_hash(self, teacher_id):
+        with db.get_connection() as conn:
+            return conn.execute("SELECT password_hash FROM teachers WHERE id = ?", (teacher_id,)).fetchone()[0]
+
+    def test_scrypt_round_trip(self):
+        stored = auth.hash_password("correct horse")
+        self.assertTrue(stored.startswith("scrypt$"))
+        self.assertNotEqual(stored, auth.hash_password("correct horse"))  # salted
+        teacher_id = self._add_teacher("a@example.com", stored)
+        self.assertEqual(auth.verify_teacher(" A@example.com ", "correct horse"), teacher_id)
+        self.assertEqual(self._stored_hash(teacher_id), stored)
+
+    def test_legacy_sha256_password_logs_in_and_is_rehashed(self):
+        teacher_id = self._add_teacher("b@example.com", hashlib.sha256(b"old secret").hexdigest())
+        self.assertEqual(auth.verify_teacher("b@example.com", "old secret"), teacher_id)
+        stored = self._stored_hash(teacher_id)
+        self.assertTrue(stored.startswith("scrypt$"))
+        self.assertEqual(auth.verify_teacher("b@example.com", "old secret"), teacher_id)
+
+    def test_wrong_password_is_rejected(self):
+        legacy_id = self._add_teacher("c@example.com", hashlib.sha256(b"old secret").hexdigest())
+        self._add_teacher("d@example.com", auth.hash_password("correct horse"))
+        self.assertIsNone(auth.verify_teacher("c@example.com", "wrong"))
+        self.assertIsNone(auth.verify_teacher("d@example.com", "wrong"))
+        self.assertIsNone(auth.verify_teacher("nobody@example.com", "correct horse"))
+        self.assertFalse(self._stored_hash(legacy_id).startswith("scrypt$"))
+
+
+class StudentPinTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(setattr, tenant_data, "DATA_DIR", tenant_data.DATA_DIR)
+        tenant_data.DATA_DIR = Path(tmp.name)
+        tenant_data._RAW_CACHE.clear()
+        tenant_data._SHARED_FRAGMENTS.clear()
+        patcher = mock.patch.dict(os.environ, {"PIN_PEPPER": "test-pepper"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        auth._pin_pepper.cache_clear()
+        self.addCleanup(auth._pin_pepper.cache_clear)
+        auth._pin_index = (None, {})
+
+    def test_legacy_sha256_pin_logs_in_and_is_rehashed(self):
+        tenant_data.save_student_pins(1, {"Asha": hashlib.sha256(b"4321").hexdigest()})
+
+        self.assertEqual(auth.verify_student_pin(1, "4321"), "Asha")
+
+        stored = tenant_data.load_student_pins(1)["Asha"]
+        expected = hashlib.blake2b(b"4321", key=b"test-pepper", digest_size=auth._PIN_DIGEST_SIZE).hexdigest()
+        self.assertEqual(stored, expected)
+        self.assertEqual(auth.resolve_student_by_pin("4321"), (1, "Asha"))
+
+    def test_wrong_pin_is_rejected(self):
+        auth.set_student_pin(1, "Asha", "4321")
+        self.assertIsNone(auth.verify_student_pin(1, "1234"))
+        self.assertIsNone(auth.resolve_student_by_pin("1234"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""Tests for the HTTP server's keep-alive framing. Run: python -m unittest discover tests"""
+
+import http.client
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import app
+import auth
+import tenant_data
+
+
+class KeepAliveTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        (root / "data").mkdir()
+        (root / "static" / "css").mkdir(parents=True)
+        (root / "static" / "css" / "main.css").write_text("body { color: black; }\n")
+        for target, name, value in ((tenant_data, "DATA_DIR", root / "data"),
+                                    (app, "DATA_DIR_STR", os.fspath(root / "data")),
+                                    (app, "BASE_DIR", root)):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        tenant_data._RAW_CACHE.clear()
+        app._PAGE_CACHE.clear()
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), app.AppHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+        self.addCleanup(self.conn.close)
+        cookie = auth.session_cookie_header_value(auth.create_session("teacher", teacher_id=1))
+        self.cookie = cookie.split(";", 1)[0]
+
+    def get(self, path, headers=None):
+        self.conn.request("GET", path, headers=headers or {})
+        response = self.conn.getresponse()
+        return response, response.read()
+
+    def test_requests_share_one_connection(self):
+        # First render streams chunked; the now-cached page is sent with a Content-Length
+        response, page = self.get("/", {"Cookie": self.cookie})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Transfer-Encoding"), "chunked")
+        self.assertIn(b"</html>", page)
+        sock = self.conn.sock
+        self.assertIsNotNone(sock)
+
+        response, cached = self.get("/", {"Cookie": self.cookie})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Length"), str(len(cached)))
+        self.assertEqual(cached, page)
+        self.assertIs(self.conn.sock, sock)
+
+        response, css = self.get("/static/css/main.css")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(css, b"body { color: black; }\n")
+        etag = response.getheader("ETag")
+        self.assertIs(self.conn.sock, sock)
+
+        response, body = self.get("/static/css/main.css", {"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b"")
+        self.assertIs(self.conn.sock, sock)
+
+        # The 304 carried no body, so the next response on the connection still parses
+        response, css = self.get("/static/css/main.css")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(css, b"body { color: black; }\n")
+        self.assertIs(self.conn.sock, sock)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+"""Tests for tenant_data. Run: python -m unittest discover tests"""
+
+import json
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import tenant_data
+
+
+class DataDirTest(unittest.TestCase):
+    """Points tenant_data at an empty temporary data directory with empty caches."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(setattr, tenant_data, "DATA_DIR", tenant_data.DATA_DIR)
+        tenant_data.DATA_DIR = Path(tmp.name)
+        self.clear_caches()
+
+    def clear_caches(self):
+        tenant_data._RAW_CACHE.clear()
+        tenant_data._SHARED_FRAGMENTS.clear()
+        tenant_data._attendance_merged.clear()
+        tenant_data._practice_log_checked.clear()
+
+
+class AttendanceLogTest(DataDirTest):
+    def test_record_after_torn_tail_is_kept(self):
+        tenant_data.record_attendance(1, "2026-01-01", {"students": ["Asha"], "notes": ""})
+        tenant_data.record_attendance(1, "2026-01-02", {"students": ["Ravi"], "notes": ""})
+        log = tenant_data.DATA_DIR / "attendance" / "1.ndjson"
+        # A crash mid-append leaves a partial last line with no newline
+        with open(log, "ab") as f:
+            f.write(b'{"2026-01-03": {"stud')
+        tenant_data.record_attendance(1, "2026-01-04", {"students": ["Asha"], "notes": "x"})
+
+        self.clear_caches()
+        attendance = tenant_data.load_attendance(1)
+        self.assertEqual(sorted(attendance), ["2026-01-01", "2026-01-02", "2026-01-04"])
+        self.assertEqual(attendance["2026-01-04"], {"students": ["Asha"], "notes": "x"})
+
+
+class SharedFileTest(DataDirTest):
+    def test_save_in_batch_keeps_other_thread_save(self):
+        tenant_data.save_people(1, {"students": ["Asha"]})
+        saved_in_batch = threading.Event()
+        other_saved = threading.Event()
+
+        def batch_writer():
+            with tenant_data.batch_saves():
+                tenant_data.save_people(1, {"students": ["Asha", "Ravi"]})
+                saved_in_batch.set()
+                other_saved.wait(5)
+
+        def other_writer():
+            saved_in_batch.wait(5)
+            tenant_data.save_people(2, {"students": ["Meera"]})
+            other_saved.set()
+
+        threads = [threading.Thread(target=batch_writer), threading.Thread(target=other_writer)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(10)
+
+        on_disk = json.loads((tenant_data.DATA_DIR / "people.json").read_text())
+        self.assertEqual(on_disk, {"1": {"students": ["Asha", "Ravi"]}, "2": {"students": ["Meera"]}})
+
+
+class SplitLegacyFilesTest(DataDirTest):
+    def write(self, name, data):
+        (tenant_data.DATA_DIR / name).write_text(json.dumps(data))
+
+    def read(self, name):
+        return json.loads((tenant_data.DATA_DIR / name).read_text())
+
+    def test_split_moves_each_tenant_to_its_own_file(self):
+        assignments = [{"id": "a1", "student": "Asha", "status": "active"}]  # legacy single-tenant list
+        practice = {"1": {"Asha": [{"date": "2026-01-01", "duration": 10, "items": ""}]},
+                    "2": {"Meera": [{"date": "2026-01-02", "duration": 5, "items": ""}]}}
+        people = {"1": {"students": ["Asha"]}, "2": {"students": ["Meera"]}}
+        self.write("assignments.json", assignments)
+        self.write("practice_log.json", practice)
+        self.write("people.json", people)
+
+        tenant_data.split_legacy_files()
+
+        data_dir = tenant_data.DATA_DIR
+        self.assertEqual(self.read("assignments/1.json"), assignments)
+        self.assertEqual(self.read("practice_log/1.json"), practice["1"])
+        self.assertEqual(self.read("practice_log/2.json"), practice["2"])
+        self.assertFalse((data_dir / "assignments.json").exists())
+        self.assertEqual(json.loads((data_dir / "assignments.legacy.bak").read_text()), assignments)
+        self.assertFalse((data_dir / "practice_log.json").exists())
+        # Shared kinds stay in their one file
+        self.assertEqual(self.read("people.json"), people)
+        self.assertFalse((data_dir / "people").exists())
+
+        self.clear_caches()
+        self.assertEqual(tenant_data.load_assignments(1), assignments)
+        self.assertEqual(tenant_data.load_people(2), {"students": ["Meera"]})
+
+    def test_rerun_is_a_no_op(self):
+        self.write("assignments.json", [{"id": "a1"}])
+        tenant_data.split_legacy_files()
+        tenant_data.save_assignments(1, [{"id": "a1"}, {"id": "a2"}])
+        before = sorted(p.relative_to(tenant_data.DATA_DIR) for p in tenant_data.DATA_DIR.rglob("*"))
+
+        tenant_data.split_legacy_files()
+
+        after = sorted(p.relative_to(tenant_data.DATA_DIR) for p in tenant_data.DATA_DIR.rglob("*"))
+        self.assertEqual(after, before)
+        self.assertEqual(self.read("assignments/1.json"), [{"id": "a1"}, {"id": "a2"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,42 +1,39 @@
 """Quick verification: unauthenticated GET/POST to API should return 401."""
 import urllib.request
 import urllib.error
+from concurrent.futures import ThreadPoolExecutor
 
-def main():
-    base = "http://127.0.0.1:8000"
-    ok = True
-    # GET /api/categories
-    try:
-        r = urllib.request.urlopen(urllib.request.Request(f"{base}/api/categories"), timeout=5)
-        print(f"GET /api/categories: {r.status} (expected 401)")
-        ok = False
-    except urllib.error.HTTPError as e:
-        print(f"GET /api/categories: {e.code} (expected 401)")
-        if e.code != 401:
-            ok = False
-    except Exception as e:
-        print(f"GET /api/categories error: {e}")
-        ok = False
-    # POST /api/update-file
+BASE = "http://127.0.0.1:8000"
+
+
+def _probe(method, path, body=None):
+    """Send one unauthenticated request; True if it was rejected with 401."""
+    label = f"{method} {path}"
+    headers = {"Content-Type": "application/json"} if body is not None else {}
     try:
         r = urllib.request.urlopen(
-            urllib.request.Request(
-                f"{base}/api/update-file",
-                data=b"{}",
-                method="POST",
-                headers={"Content-Type": "application/json"},
-            ),
+            urllib.request.Request(f"{BASE}{path}", data=body, method=method, headers=headers),
             timeout=5,
         )
-        print(f"POST /api/update-file: {r.status} (expected 401)")
-        ok = False
+        print(f"{label}: {r.status} (expected 401)")
+        return False
     except urllib.error.HTTPError as e:
-        print(f"POST /api/update-file: {e.code} (expected 401)")
-        if e.code != 401:
-            ok = False
+        print(f"{label}: {e.code} (expected 401)")
+        return e.code == 401
     except Exception as e:
-        print(f"POST /api/update-file error: {e}")
-        ok = False
+        print(f"{label} error: {e}")
+        return False
+
+
+def main():
+    probes = [
+        ("GET", "/api/categories", None),
+        ("POST", "/api/update-file", b"{}"),
+    ]
+    # The probes are independent, so run them at the same time rather than one RTT after another
+    with ThreadPoolExecutor(max_workers=len(probes)) as pool:
+        results = list(pool.map(lambda p: _probe(*p), probes))
+    ok = all(results)
     print("Verification OK." if ok else "Verification FAILED.")
     return 0 if ok else 1
 